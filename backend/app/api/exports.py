@@ -0,0 +1,88 @@
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app.api.records import (
+    render_student_summary, render_subject_summary, student_summary_filename, subject_summary_filename
+)
+from app.core.database import get_db
+from app.schemas.schemas import ExportJobStatus, RecordFilter
+from app.utils.etag import RECORDS, STUDENTS, data_versions
+from app.utils.export_formats import EXPORT_FORMATS, media_type_for, require_export_format
+from app.utils.export_jobs import ExportJob, ExportQueueFull, export_jobs
+
+router = APIRouter()
+
+
+def _job_status(job: ExportJob) -> dict:
+    status = job.to_dict()
+    if job.status == 'done':
+        status["download_url"] = f"/exports/{job.id}/download"
+    return status
+
+
+def _submit(db: Session, kind: str, render, filter: RecordFilter, export_format: str, filename: str) -> dict:
+    # 学生或作业记录有写入后（包括其他进程的写入），相同条件的导出需要重新生成
+    version = tuple(sorted(data_versions(db, RECORDS, STUDENTS).items()))
+    try:
+        job = export_jobs.submit(
+            kind, render, {"filter": filter.dict(), "format": export_format}, filename,
+            version=version, extension=EXPORT_FORMATS[export_format].extension
+        )
+    except ExportQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return _job_status(job)
+
+
+@router.post("/summary", response_model=ExportJobStatus, status_code=202)
+def create_student_summary_export(
+    filter: RecordFilter,
+    format: Optional[str] = Query(None, description="导出格式：xlsx、csv、jsonl、parquet，默认根据Accept头选择"),
+    accept: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """提交学生成绩汇总导出任务，返回任务ID"""
+    export_format = require_export_format(format, accept)
+    return _submit(db, 'summary', render_student_summary, filter, export_format, student_summary_filename(export_format))
+
+
+@router.post("/subject-summary", response_model=ExportJobStatus, status_code=202)
+def create_subject_summary_export(
+    filter: RecordFilter,
+    format: Optional[str] = Query(None, description="导出格式：xlsx、csv、jsonl、parquet，默认根据Accept头选择"),
+    accept: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """提交学科作业汇总导出任务，返回任务ID"""
+    if not filter.subject:
+        raise HTTPException(status_code=400, detail="必须指定学科")
+    export_format = require_export_format(format, accept)
+    return _submit(
+        db, 'subject-summary', render_subject_summary, filter, export_format,
+        subject_summary_filename(filter, export_format)
+    )
+
+
+@router.get("/{job_id}", response_model=ExportJobStatus)
+def get_export_job(job_id: str):
+    """查询导出任务状态，完成后返回下载地址"""
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"导出任务 {job_id} 不存在或已过期")
+    return _job_status(job)
+
+
+@router.get("/{job_id}/download")
+def download_export(job_id: str):
+    """下载已完成的导出文件"""
+    job = export_jobs.get(job_id)
+    if job is None or (job.status == 'done' and not os.path.exists(job.path)):
+        raise HTTPException(status_code=404, detail=f"导出任务 {job_id} 不存在或已过期")
+    if job.status == 'failed':
+        raise HTTPException(status_code=500, detail=f"导出失败: {job.error}")
+    if job.status != 'done':
+        raise HTTPException(status_code=409, detail="导出任务尚未完成")
+    return FileResponse(job.path, media_type=media_type_for(job.filename), filename=job.filename)
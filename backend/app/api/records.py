@@ -1,43 +1,109 @@
 from datetime import date, datetime, timedelta
-from typing import List, Optional, Dict, Any
+from itertools import chain, groupby
+from typing import List, Literal, Optional, Dict, Any, Union
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
-from starlette.background import BackgroundTask
-from fastapi.responses import FileResponse
-from sqlalchemy import func, and_, or_, select
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Header, Request, Response
+from sqlalchemy import Float, func, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+import openpyxl
 import pandas as pd
 import os
+import shutil
 import tempfile
 
-from app.core.database import get_db
-from app.models.models import Record, Student, Teacher
+from app.core.config import EXPORT_FETCH_SIZE, IMPORT_MAX_UPLOAD_BYTES, RECORDS_BULK_MAX_ROWS, RECORDS_MAX_PAGE_SIZE, RECORDS_PAGE_SIZE, SUMMARY_PAGE_SIZE
+from app.core.database import SessionLocal, get_async_db, get_db
+from app.models.models import RECORD_NATURAL_KEY_INDEX_NAME, STATS_VERSION, Record, RecordDailyStat, Student, Teacher
 from app.schemas.schemas import Record as RecordSchema
-from app.schemas.schemas import RecordCreate, RecordFilter, StudentScoreSummary, SubjectScoreSummary, ExcelImportResponse, ExcelExportRequest
+from app.schemas.schemas import CursorPage, RecordCreate, RecordFilter, StudentScoreSummary, SubjectScoreSummary, ExcelImportResponse, ExcelExportRequest, ImportProgress
+from app.schemas.schemas import RecordBulkCreate, RecordBulkDelete, RecordBulkResponse, RecordBulkUpdate, StudentRanking, SummaryPage
 from app.utils.grade_calculator import GradeCalculator
-from openpyxl.styles import PatternFill
+from app.utils.aggregates import apply_stats_deltas, record_stats_deltas, stat_score_column
+from app.utils.bulk_import import REQUIRED_COLUMNS, import_record_chunks, iter_frame_chunks, read_csv_chunks, read_xlsx_chunks
+from app.utils.bulk_records import WriteMode, bulk_create_records, bulk_delete_records, bulk_update_records, write_records
+from app.utils.cache import lookup_cache
+from app.utils.etag import RECORDS, STUDENTS, adata_versions, check_not_modified, data_versions
+from app.utils.export_formats import export_filename, export_response, require_export_format, write_export
+from app.utils.fast_json import fast_json_response, serialize_rows, table_layout
+from app.utils.import_progress import import_progress
+from app.utils.pagination import count_stmt, decode_cursor, keyset_page_stmt, split_page
+from app.utils.pivot import load_pivot, pivot_object
+from app.utils.score_index import score_index
+from app.utils.upload_limit import upload_too_large
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# 新增或修改后与已有记录的学号、学科、日期、批次相同时的错误信息
+NATURAL_KEY_CONFLICT = "已存在学号、学科、日期、批次都相同的作业记录"
+# 汇总和排名由日汇总表计算，ETag取决于作业记录、学生和日汇总表的版本号，同步和异步接口都用这组表
+SUMMARY_VERSION_TABLES = (RECORDS, STUDENTS, STATS_VERSION)
+# 新增记录的写入模式参数
+WRITE_MODE_QUERY = Query('insert', description="insert：学号、学科、日期、批次相同的记录已存在时失败；upsert：更新已有记录")
 
-@router.get("/", response_model=List[RecordSchema])
+
+def _records_stmt(filter_params: RecordFilter):
+    """构建作业记录列表查询，返回records表的数据行而不是ORM对象"""
+    stmt = select(*Record.__table__.c)
+    if any([filter_params.grade, filter_params.class_name, filter_params.group]):
+        stmt = stmt.join(Student)
+        if filter_params.grade:
+            stmt = stmt.where(Student.grade == filter_params.grade)
+        if filter_params.class_name:
+            stmt = stmt.where(Student.class_name == filter_params.class_name)
+        if filter_params.group:
+            stmt = stmt.where(Student.group == filter_params.group)
+    
+    if filter_params.subject:
+        stmt = stmt.where(Record.subject == filter_params.subject)
+    if filter_params.start_date:
+        stmt = stmt.where(Record.date >= filter_params.start_date)
+    if filter_params.end_date:
+        stmt = stmt.where(Record.date <= filter_params.end_date)
+    return stmt
+
+
+# 作业记录列表的分页排序键
+RECORD_PAGE_KEYS = (Record.date, Record.id)
+
+
+def _record_cursor(cursor: Optional[str]):
+    return decode_cursor(cursor, (date.fromisoformat, int)) if cursor else None
+
+
+def _record_page_key(record):
+    return record.date, record.id
+
+
+@router.get("/", response_model=Union[List[RecordSchema], CursorPage[RecordSchema]])
 def read_records(
+    request: Request,
+    response: Response,
     grade: Optional[str] = None,
     class_name: Optional[str] = None,
     group: Optional[str] = None,
     subject: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=RECORDS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    with_total: bool = False,
     db: Session = Depends(get_db)
 ):
-    """获取作业记录列表，支持筛选"""
+    """
+    获取作业记录列表，支持筛选
+
+    传入limit或cursor时按(日期, ID)游标分页，返回items和next_cursor，with_total为True时同时返回总数；
+    否则返回全部匹配记录的列表。响应带ETag，数据未变化时对If-None-Match返回304
+    """
+    paged = limit is not None or cursor is not None
     try:
         # 如果任何参数为None，返回空列表
         if any(param is None for param in [grade, start_date, end_date]):
-            return []
+            return {"items": []} if paged else []
 
         filter_params = RecordFilter(
             grade=grade,
@@ -48,25 +114,20 @@ def read_records(
             end_date=end_date
         )
 
-        stmt = select(Record)
-        if any([filter_params.grade, filter_params.class_name, filter_params.group]):
-            stmt = stmt.join(Student)
-            if filter_params.grade:
-                stmt = stmt.where(Student.grade == filter_params.grade)
-            if filter_params.class_name:
-                stmt = stmt.where(Student.class_name == filter_params.class_name)
-            if filter_params.group:
-                stmt = stmt.where(Student.group == filter_params.group)
-        
-        if filter_params.subject:
-            stmt = stmt.where(Record.subject == filter_params.subject)
-        if filter_params.start_date:
-            stmt = stmt.where(Record.date >= filter_params.start_date)
-        if filter_params.end_date:
-            stmt = stmt.where(Record.date <= filter_params.end_date)
-        
-        records = db.execute(stmt).scalars().all()
-        return records
+        not_modified = check_not_modified(request, response, data_versions(db, RECORDS, STUDENTS))
+        if not_modified:
+            return not_modified
+
+        stmt = _records_stmt(filter_params)
+        if not paged:
+            return fast_json_response(serialize_rows(RecordSchema, db.execute(stmt).all()), response)
+
+        limit = limit or RECORDS_PAGE_SIZE
+        page_stmt = keyset_page_stmt(stmt, RECORD_PAGE_KEYS, _record_cursor(cursor), limit)
+        items, next_cursor = split_page(db.execute(page_stmt).all(), limit, _record_page_key)
+        total = db.execute(count_stmt(stmt)).scalar() if with_total else None
+        return fast_json_response(
+            {"items": serialize_rows(RecordSchema, items), "next_cursor": next_cursor, "total": total}, response)
     except SQLAlchemyError as e:
         logger.error(f"查询记录失败: {str(e)}")
         raise HTTPException(status_code=500, detail="数据库查询失败")
@@ -75,8 +136,12 @@ def read_records(
         raise HTTPException(status_code=422, detail=str(e))
 
 @router.post("/records", response_model=RecordSchema)
-def create_record(record: RecordCreate, db: Session = Depends(get_db)):
-    """创建新的作业记录"""
+def create_record(record: RecordCreate, mode: WriteMode = WRITE_MODE_QUERY, db: Session = Depends(get_db)):
+    """
+    创建作业记录
+
+    学号、学科、日期、批次相同的记录已存在时，默认返回409；mode=upsert时更新该记录
+    """
     try:
         # 检查学生是否存在
         student = db.query(Student).filter(Student.student_id == record.student_id).first()
@@ -88,13 +153,17 @@ def create_record(record: RecordCreate, db: Session = Depends(get_db)):
         if not teacher:
             raise HTTPException(status_code=404, detail=f"教师ID {record.teacher_id} 不存在")
         
-        db_record = Record(**record.dict())
-        db.add(db_record)
         try:
+            written = write_records(db, [record.dict()], mode)
+            record_id, outcome = written["ids"][0], written["outcomes"][0]
+            if outcome == 'conflict':
+                db.rollback()
+                raise HTTPException(status_code=409, detail=NATURAL_KEY_CONFLICT)
             db.commit()
-            db.refresh(db_record)
-            logger.info(f"成功创建记录: ID={db_record.id}")
-            return db_record
+            if outcome != 'unchanged':
+                lookup_cache.invalidate('records')
+            logger.info(f"成功写入记录: ID={record_id} ({outcome})")
+            return db.get(Record, record_id)
         except SQLAlchemyError as e:
             db.rollback()
             logger.error(f"创建记录失败: {str(e)}")
@@ -110,8 +179,10 @@ def create_record(record: RecordCreate, db: Session = Depends(get_db)):
 def get_all_batches(db: Session = Depends(get_db)):
     """获取所有批次"""
     try:
-        batches = db.query(Record.batch).distinct().all()
-        return [batch[0] for batch in batches]
+        def load():
+            batches = db.query(Record.batch).distinct().all()
+            return [batch[0] for batch in batches if batch[0] is not None]
+        return lookup_cache.get_or_load('records', ('batches',), load)
     except SQLAlchemyError as e:
         logger.error(f"Error getting all batches: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -120,12 +191,104 @@ def get_all_batches(db: Session = Depends(get_db)):
 def get_batches(db: Session = Depends(get_db)):
     """获取批次列表"""
     try:
-        batches = db.query(Record.batch).distinct().all()
-        return [batch[0] for batch in batches]
+        def load():
+            batches = db.query(Record.batch).distinct().all()
+            return [batch[0] for batch in batches if batch[0] is not None]
+        return lookup_cache.get_or_load('records', ('batches',), load)
     except SQLAlchemyError as e:
         logger.error(f"Error getting batches: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def _check_bulk_size(count: int):
+    if count > RECORDS_BULK_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"单次最多处理 {RECORDS_BULK_MAX_ROWS} 条记录")
+
+
+def _is_natural_key_conflict(e: IntegrityError) -> bool:
+    """违反的是records的自然键唯一索引，而不是外键、非空等其他约束"""
+    message = str(e.orig)
+    return RECORD_NATURAL_KEY_INDEX_NAME in message or "UNIQUE constraint failed: records." in message
+
+
+def _integrity_error(e: IntegrityError, prefix: str) -> HTTPException:
+    """自然键冲突返回409，其他约束错误返回400并给出数据库的原因"""
+    if _is_natural_key_conflict(e):
+        return HTTPException(status_code=409, detail=prefix + NATURAL_KEY_CONFLICT)
+    return HTTPException(status_code=400, detail=f"{prefix}违反数据约束: {e.orig}")
+
+
+def _run_bulk(db: Session, action: str, operation) -> Dict[str, Any]:
+    """在一个事务中执行批量操作，汇总逐行结果"""
+    try:
+        results = operation()
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        logger.error(f"批量{action}记录失败: {str(e)}")
+        raise _integrity_error(e, f"批量{action}记录失败：")
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"批量{action}记录失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"批量{action}记录失败")
+    succeeded = sum(result["success"] for result in results)
+    if succeeded:
+        lookup_cache.invalidate('records')
+    failed = len(results) - succeeded
+    logger.info(f"批量{action}记录: 成功 {succeeded} 条, 失败 {failed} 条")
+    message = f"成功{action} {succeeded} 条记录"
+    statuses = [result["status"] for result in results if result.get("status")]
+    if statuses:
+        message += (f"（新增 {statuses.count('inserted')} 条，更新 {statuses.count('updated')} 条，"
+                    f"未变化 {statuses.count('unchanged')} 条）")
+    return {
+        "success": failed == 0,
+        "message": message + (f"，{failed} 条失败" if failed else ""),
+        "succeeded": succeeded,
+        "failed": failed,
+        "results": results
+    }
+
+
+# 批量接口需要定义在/{record_id}之前，否则bulk会被当作记录ID
+@router.post("/bulk", response_model=RecordBulkResponse)
+def bulk_create(request: RecordBulkCreate, mode: WriteMode = WRITE_MODE_QUERY, db: Session = Depends(get_db)):
+    """
+    批量创建作业记录，学生或教师不存在的行跳过，其余行在同一事务中写入
+
+    学号、学科、日期、批次相同的记录已存在时，默认该行失败；mode=upsert时更新已有记录
+    """
+    _check_bulk_size(len(request.records))
+    records = [record.dict() for record in request.records]
+    return _run_bulk(db, "创建", lambda: bulk_create_records(db, records, mode))
+
+
+@router.patch("/bulk", response_model=RecordBulkResponse)
+def bulk_update(request: RecordBulkUpdate, db: Session = Depends(get_db)):
+    """批量修改作业记录，每行只更新给出的字段"""
+    _check_bulk_size(len(request.records))
+    patches = [patch.dict(exclude_unset=True) for patch in request.records]
+    return _run_bulk(db, "更新", lambda: bulk_update_records(db, patches))
+
+
+@router.delete("/bulk", response_model=RecordBulkResponse)
+def bulk_delete(request: RecordBulkDelete, db: Session = Depends(get_db)):
+    """
+    批量删除作业记录，按ID列表或筛选条件删除
+
+    按筛选条件删除时至少需要一个筛选条件，结果中每行对应一条被删除的记录
+    """
+    if (request.ids is None) == (request.filter is None):
+        raise HTTPException(status_code=400, detail="请提供ids或filter中的一个")
+    if request.ids is not None:
+        ids = request.ids
+    else:
+        if not any(request.filter.dict().values()):
+            raise HTTPException(status_code=400, detail="筛选条件不能为空")
+        ids = db.execute(_records_stmt(request.filter).with_only_columns(Record.id)).scalars().all()
+    _check_bulk_size(len(ids))
+    return _run_bulk(db, "删除", lambda: bulk_delete_records(db, ids))
+
+
 @router.get("/{record_id}", response_model=RecordSchema)
 def read_record(record_id: int, db: Session = Depends(get_db)):
     """
@@ -156,14 +319,21 @@ def update_record(record_id: int, record: RecordCreate, db: Session = Depends(ge
             raise HTTPException(status_code=404, detail=f"教师ID {record.teacher_id} 不存在")
         
         try:
-            # 更新记录
+            # 更新记录，同时从汇总表中减去旧值、加上新值
+            old_values = {key: getattr(db_record, key) for key in ('student_id', 'subject', 'date', 'score')}
             for key, value in record.dict().items():
                 setattr(db_record, key, value)
+            apply_stats_deltas(db, record_stats_deltas([old_values], sign=-1) + record_stats_deltas([record.dict()]))
             
             db.commit()
+            lookup_cache.invalidate('records')
             db.refresh(db_record)
             logger.info(f"成功更新记录: ID={record_id}")
             return db_record
+        except IntegrityError as e:
+            db.rollback()
+            logger.error(f"更新记录失败: {str(e)}")
+            raise _integrity_error(e, "")
         except SQLAlchemyError as e:
             db.rollback()
             logger.error(f"更新记录失败: {str(e)}")
@@ -183,8 +353,11 @@ def delete_record(record_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail=f"作业记录ID {record_id} 不存在")
         
         try:
+            old_values = {key: getattr(db_record, key) for key in ('student_id', 'subject', 'date', 'score')}
             db.delete(db_record)
+            apply_stats_deltas(db, record_stats_deltas([old_values], sign=-1))
             db.commit()
+            lookup_cache.invalidate('records')
             logger.info(f"成功删除记录: ID={record_id}")
             return {"message": f"作业记录ID {record_id} 已删除"}
         except SQLAlchemyError as e:
@@ -198,92 +371,141 @@ def delete_record(record_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="服务器内部错误")
 
 
+# 允许导入的文件类型
+IMPORT_EXTENSIONS = ('.xls', '.xlsx', '.csv')
+# 复制上传文件时每次读取的字节数
+IMPORT_UPLOAD_COPY_BYTES = 1024 * 1024
+
+
+def _upload_size(file: UploadFile) -> int:
+    """上传文件的大小，上传内容已由Starlette分块写入临时文件（超过1MB时在磁盘上）"""
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    size = file.file.seek(0, os.SEEK_END)
+    file.file.seek(position)
+    return size
+
+
 @router.post("/import", response_model=ExcelImportResponse)
-def import_records_from_excel(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """从Excel导入作业记录"""
-    # 检查文件名是否以.xls或.xlsx结尾
-    if not (file.filename and (file.filename.endswith('.xls') or file.filename.endswith('.xlsx'))):
-        raise HTTPException(status_code=400, detail="请上传Excel文件(.xls或.xlsx)")
+def import_records_from_excel(
+    file: UploadFile = File(...),
+    import_id: Optional[str] = Query(None, description="客户端生成的导入ID，用于查询导入进度"),
+    mode: WriteMode = WRITE_MODE_QUERY,
+    db: Session = Depends(get_db)
+):
+    """
+    从Excel或CSV导入作业记录
+
+    学号、学科、日期、批次相同的记录已存在时，默认该行计为失败；mode=upsert时更新已有记录。
+
+    文件按IMPORT_COMMIT_ROWS行分块校验和写入，每块单独提交，某块写入失败只回滚该块，已提交的块不受之后的错误影响。
+    CSV和.xlsx直接从上传的临时文件中边读边导入，内存占用与文件大小无关；.xls仍由pandas整表读取。
+    """
+    filename = (file.filename or '').lower()
+    if not filename.endswith(IMPORT_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="请上传Excel文件(.xls或.xlsx)或CSV文件(.csv)")
+    
+    # 超大的请求体已由UploadLimitMiddleware在读取时拒绝，这里按文件本身的大小再检查一次
+    upload_size = _upload_size(file)
+    if upload_size > IMPORT_MAX_UPLOAD_BYTES:
+        raise upload_too_large(IMPORT_MAX_UPLOAD_BYTES)
     
     temp_file_path = None
+    workbook = None
     try:
-        # 创建临时文件保存上传的Excel
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-            temp_file.write(file.file.read())
-            temp_file_path = temp_file.name
-        
-        # 读取Excel文件
-        df = pd.read_excel(temp_file_path)
+        if filename.endswith('.csv'):
+            chunks = read_csv_chunks(file.file)
+            total_count = None
+        elif filename.endswith('.xlsx'):
+            # 只读模式逐行解析，读完第一块即可开始写入
+            workbook = openpyxl.load_workbook(file.file, read_only=True, data_only=True)
+            sheet = workbook.active
+            total_count = sheet.max_row - 1 if sheet.max_row else None
+            chunks = read_xlsx_chunks(sheet)
+        else:
+            # .xls只能由pandas整表读取，先分块复制到临时文件
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.xls') as temp_file:
+                shutil.copyfileobj(file.file, temp_file, IMPORT_UPLOAD_COPY_BYTES)
+                temp_file_path = temp_file.name
+            df = pd.read_excel(temp_file_path)
+            chunks = iter_frame_chunks(df)
+            total_count = len(df)
         
         # 检查必要的列是否存在
-        required_columns = ['学号', '姓名', '学科', '日期', '教师ID']
-        for col in required_columns:
-            if col not in df.columns:
-                raise HTTPException(status_code=400, detail=f"Excel文件缺少必要的列: {col}")
-        
-        # 转换日期列
-        df['日期'] = pd.to_datetime(df['日期']).dt.date
+        first_chunk = next(chunks, None)
+        columns = first_chunk.columns if first_chunk is not None else []
+        for col in REQUIRED_COLUMNS:
+            if col not in columns:
+                raise HTTPException(status_code=400, detail=f"导入文件缺少必要的列: {col}")
         
-        # 导入记录
-        imported_count = 0
-        failed_records = []
+        def on_progress(result):
+            # 每块已单独提交，批次列表的缓存随之失效
+            lookup_cache.invalidate('records')
+            if import_id:
+                import_progress.update(
+                    import_id,
+                    processed_count=result["processed_count"],
+                    imported_count=result["imported_count"],
+                    inserted_count=result["inserted_count"],
+                    updated_count=result["updated_count"],
+                    unchanged_count=result["unchanged_count"],
+                    failed_count=len(result["failed_records"]),
+                    failed_chunks=result["failed_chunks"],
+                    bytes_read=file.file.tell() if total_count is None else upload_size
+                )
         
+        if import_id:
+            import_progress.start(import_id, file.filename, total_bytes=upload_size, total_count=total_count)
         try:
-            for _, row in df.iterrows():
-                try:
-                    # 检查学生是否存在
-                    student = db.query(Student).filter(Student.student_id == row['学号']).first()
-                    if not student:
-                        failed_records.append({"学号": row['学号'], "原因": "学生不存在"})
-                        continue
-                    
-                    # 检查教师是否存在
-                    teacher = db.query(Teacher).filter(Teacher.teacher_id == row['教师ID']).first()
-                    if not teacher:
-                        failed_records.append({"学号": row['学号'], "原因": "教师不存在"})
-                        continue
-                    
-                    # 创建记录
-                    record_data = {
-                        'student_id': row['学号'],
-                        'name': row['姓名'],
-                        'subject': row['学科'],
-                        'date': row['日期'],
-                        'teacher_id': row['教师ID'],
-                        'score': row.get('分数'),
-                        'type': row.get('类型'),
-                        'batch': row.get('批次')
-                    }
-                    
-                    db_record = Record(**record_data)
-                    db.add(db_record)
-                    imported_count += 1
-                    
-                except Exception as e:
-                    failed_records.append({"学号": row['学号'], "原因": str(e)})
-                    logger.error(f"导入记录失败: {str(e)}")
-                    continue
-            
-            db.commit()
-            logger.info(f"成功导入 {imported_count} 条记录")
-            
-            return {
-                "success": True,
-                "message": f"成功导入 {imported_count} 条记录，失败 {len(failed_records)} 条",
-                "imported_count": imported_count,
-                "failed_records": failed_records
-            }
-            
+            result = import_record_chunks(db, chain([first_chunk], chunks), on_progress, mode=mode)
         except SQLAlchemyError as e:
             db.rollback()
             logger.error(f"批量导入记录失败: {str(e)}")
+            if import_id:
+                import_progress.finish(import_id, "failed", "批量导入记录失败")
             raise HTTPException(status_code=500, detail="批量导入记录失败")
+        
+        lookup_cache.invalidate('records')
+        imported_count = result["imported_count"]
+        failed_records = result["failed_records"]
+        logger.info(f"成功导入 {imported_count} 条记录")
+        message = (
+            f"成功导入 {imported_count} 条记录（新增 {result['inserted_count']} 条，更新 {result['updated_count']} 条，"
+            f"未变化 {result['unchanged_count']} 条），失败 {len(failed_records)} 条"
+        )
+        if result["failed_chunks"]:
+            message += f"，其中 {result['failed_chunks']} 块写入数据库失败"
+        if result["error"]:
+            message += f"；{result['error']}，后续内容未导入"
+        if import_id:
+            import_progress.finish(import_id, "failed" if result["error"] else "done", message)
+        
+        return {
+            "success": result["error"] is None,
+            "message": message,
+            "imported_count": imported_count,
+            "failed_records": failed_records,
+            "processed_count": result["processed_count"],
+            "failed_chunks": result["failed_chunks"],
+            "inserted_count": result["inserted_count"],
+            "updated_count": result["updated_count"],
+            "unchanged_count": result["unchanged_count"]
+        }
             
+    except HTTPException:
+        raise
+    except pd.errors.EmptyDataError:
+        raise HTTPException(status_code=400, detail="导入文件为空")
     except Exception as e:
-        logger.error(f"处理Excel文件失败: {str(e)}")
+        logger.error(f"处理导入文件失败: {str(e)}")
+        if import_id:
+            import_progress.finish(import_id, "failed", str(e))
         raise HTTPException(status_code=500, detail=str(e))
         
     finally:
+        if workbook is not None:
+            workbook.close()
         # 确保临时文件被删除
         if temp_file_path and os.path.exists(temp_file_path):
             try:
@@ -292,333 +514,608 @@ def import_records_from_excel(file: UploadFile = File(...), db: Session = Depend
                 logger.error(f"删除临时文件失败: {str(e)}")
 
 
+@router.get("/import/progress/{import_id}", response_model=ImportProgress)
+def get_import_progress(import_id: str):
+    """查询导入进度"""
+    progress = import_progress.get(import_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="导入任务不存在或已过期")
+    return progress
+
+
+def _template_stmt(request: ExcelExportRequest):
+    """构建作业模板中的学生查询"""
+    stmt = select(Student.student_id, Student.name, Student.class_name)
+    if request.grade:
+        stmt = stmt.where(Student.grade == request.grade)
+    if request.class_name and len(request.class_name) > 0:
+        stmt = stmt.where(Student.class_name.in_(request.class_name))
+    return stmt
+
+
+def _iter_template_rows(request: ExcelExportRequest):
+    """逐行生成作业模板数据，在导出线程中使用独立的会话"""
+    today = datetime.now().date()
+    db = SessionLocal()
+    try:
+        for r in db.execute(_template_stmt(request), execution_options={"yield_per": EXPORT_FETCH_SIZE}):
+            yield [r.student_id, r.name, r.class_name, "", None, today, ""]
+    finally:
+        db.close()
+
+
 @router.post("/export-template")
-def export_student_template(request: ExcelExportRequest, db: Session = Depends(get_db)):
+def export_student_template(
+    request: ExcelExportRequest,
+    format: Optional[str] = Query(None, description="导出格式：xlsx、csv、jsonl、parquet，默认根据Accept头选择"),
+    accept: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     """
     导出学生信息模板，用于作业数据录入
     """
-    query = db.query(Student)
-    
-    # 应用筛选条件
-    if request.grade:
-        query = query.filter(Student.grade == request.grade)
-    
-    if request.class_name and len(request.class_name) > 0:
-        query = query.filter(Student.class_name.in_(request.class_name))
-    
-    students = query.all()
-    
-    if not students:
+    export_format = require_export_format(format, accept)
+    if db.execute(_template_stmt(request).limit(1)).first() is None:
         raise HTTPException(status_code=404, detail="未找到符合条件的学生")
-    
-    # 创建DataFrame
-    data = []
-    for student in students:
-        data.append({
-            "学号": student.student_id,
-            "姓名": student.name,
-            "班级": student.class_name,
-            "学科": "",
-            "分数": None,
-            "日期": datetime.now().date(),
-            "批次": ""
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # 创建临时文件保存Excel
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-        df.to_excel(temp_file.name, index=False)
-        temp_file_path = temp_file.name
-    
-    # 创建后台任务用于删除临时文件
-    background_task = BackgroundTask(os.unlink, temp_file_path)
-    
-    # 返回文件，并设置后台任务
-    return FileResponse(
-        temp_file_path,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=f"学生作业模板_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx",
-        background=background_task
+
+    filename = export_filename(f"学生作业模板_{datetime.now().strftime('%Y%m%d%H%M%S')}", export_format)
+    return export_response(export_format, filename, {
+        "sheet_title": 'Sheet1',
+        "header": ["学号", "姓名", "班级", "学科", "分数", "日期", "批次"],
+        "rows": _iter_template_rows(request)
+    })
+
+
+def _filter_stats(stmt, filter: RecordFilter):
+    """对关联了学生表的日汇总表查询应用筛选条件"""
+    if filter.grade:
+        stmt = stmt.where(Student.grade == filter.grade)
+    if filter.class_name:
+        stmt = stmt.where(Student.class_name == filter.class_name)
+    if filter.group:
+        stmt = stmt.where(Student.group == filter.group)
+    if filter.subject:
+        stmt = stmt.where(RecordDailyStat.subject == filter.subject)
+    if filter.start_date:
+        stmt = stmt.where(RecordDailyStat.date >= filter.start_date)
+    if filter.end_date:
+        stmt = stmt.where(RecordDailyStat.date <= filter.end_date)
+    return stmt
+
+
+def _pivot_keys_stmt(column, filter: RecordFilter):
+    """查询筛选范围内出现过的学科或日期，作为汇总表的透视列"""
+    stmt = select(column).join_from(RecordDailyStat, Student)
+    return _filter_stats(stmt, filter).distinct().order_by(column)
+
+
+def _student_summary_stmt(filter: RecordFilter):
+    """构建按学生、学科分组的平均分查询，数据来自日汇总表"""
+    stmt = select(
+        Student.student_id,
+        Student.name,
+        Student.grade,
+        Student.class_name,
+        Student.group,
+        RecordDailyStat.subject,
+        (func.sum(RecordDailyStat.score_sum) / func.nullif(func.sum(RecordDailyStat.score_count), 0)).label("avg_score")
+    ).join(Student)
+
+    # 应用筛选条件
+    stmt = _filter_stats(stmt, filter)
+
+    return stmt.group_by(
+        Student.student_id,
+        Student.name,
+        Student.grade,
+        Student.class_name,
+        Student.group,
+        RecordDailyStat.subject
     )
 
 
+def _student_summary_pivot_stmt(filter: RecordFilter):
+    """构建每个学生一行的成绩汇总查询，各学科的分数之和与次数透视为JSON对象"""
+    student_columns = (Student.student_id, Student.name, Student.grade, Student.class_name, Student.group)
+    per_subject = _filter_stats(
+        select(
+            *student_columns,
+            RecordDailyStat.subject,
+            func.sum(RecordDailyStat.score_sum).label("score_sum"),
+            func.sum(RecordDailyStat.score_count).label("score_count")
+        ).join_from(RecordDailyStat, Student),
+        filter
+    ).group_by(*student_columns, RecordDailyStat.subject).subquery()
+
+    keys = [per_subject.c[column.key] for column in student_columns]
+    return select(
+        *keys,
+        pivot_object(
+            per_subject.c.subject,
+            func.json_array(per_subject.c.score_sum, per_subject.c.score_count)
+        ).label("scores"),
+        # 总分为各学科平均分之和，在SQL中计算以便按总分排序分页
+        func.coalesce(
+            func.sum(per_subject.c.score_sum / func.nullif(per_subject.c.score_count, 0)), 0
+        ).label("total_score")
+    ).group_by(*keys)
+
+
+# 汇总接口的返回格式：objects为每个学生一个对象；table为columns + rows，每行不再重复键名，体积约为前者的四分之一
+SummaryLayout = Literal["objects", "table"]
+# table格式中排在前面的固定列，其余为透视出的学科或日期列
+STUDENT_SUMMARY_COLUMNS = ("id", "student_id", "name", "grade", "class_name", "group", "total_score", "grade_color")
+SUBJECT_SUMMARY_COLUMNS = ("id", "student_id", "name", "grade", "class_name", "total_score", "count")
+
+
+def _summary_response(
+    summary: List[Dict[str, Any]],
+    layout: SummaryLayout,
+    columns,
+    response: Response,
+    paging: Optional[Dict[str, Any]] = None
+):
+    """按layout返回汇总行；分页时paging为{"next_cursor", "total"}，objects格式的汇总行放在items中"""
+    if layout == "table":
+        content = {**table_layout(summary, columns), **(paging or {})}
+    else:
+        content = summary if paging is None else {"items": summary, **paging}
+    return fast_json_response(content, response)
+
+
+def _summary_page_stmts(stmt, page: SummaryPage):
+    """
+    对每个学生一行的汇总查询按page排序、分页，返回(本页查询, 总数查询或None, 本页第一行的序号)
+
+    排序键相同时按学号排序。游标中保存排序方式、最后一行的排序键、学号和序号，翻页后id仍然是
+    该学生在完整排序结果中的位置
+    """
+    summary = stmt.subquery()
+    sort_key = summary.c[page.sort_by]
+    if page.sort_by == "group":
+        # 小组可能为空，按空字符串参与排序和游标比较
+        sort_key = func.coalesce(sort_key, "")
+    keys = (sort_key, summary.c.student_id)
+    descending = page.order == "desc"
+    stmt = select(summary, sort_key.label("sort_key"))
+    paged = page.limit is not None or page.cursor is not None
+    total_stmt = count_stmt(stmt) if paged and page.with_total else None
+
+    if page.cursor is not None:
+        try:
+            sort_by, order, *after, position = decode_cursor(
+                page.cursor, (str, str, float if page.sort_by == "total_score" else str, str, int))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if (sort_by, order) != (page.sort_by, page.order):
+            raise HTTPException(status_code=422, detail="分页游标与排序方式不一致")
+        return keyset_page_stmt(stmt, keys, tuple(after), page.limit or SUMMARY_PAGE_SIZE, descending), total_stmt, position + 1
+
+    stmt = stmt.order_by(*[key.desc() if descending else key for key in keys])
+    if page.limit is not None:
+        stmt = stmt.limit(page.limit + 1)
+    if page.offset:
+        stmt = stmt.offset(page.offset)
+    return stmt, total_stmt, page.offset + 1
+
+
+def _summary_page_response(build, results, page: SummaryPage, start: int, total: Optional[int],
+                           layout: SummaryLayout, columns, response: Response):
+    """用build(results, start)生成汇总行并返回，分页时去掉多取的一行并生成下一页游标"""
+    if page.limit is None and page.cursor is None:
+        return _summary_response(build(results, start), layout, columns, response)
+    limit = page.limit or SUMMARY_PAGE_SIZE
+    results, next_cursor = split_page(
+        results, limit, lambda r: (page.sort_by, page.order, r.sort_key, r.student_id, start + limit - 1))
+    return _summary_response(build(results, start), layout, columns, response,
+                             {"next_cursor": next_cursor, "total": total})
+
+
+def _indexed_summary_rows(db: Session, filter: RecordFilter, page: SummaryPage, versions: Dict[str, int], rows):
+    """
+    不分页时从成绩索引计算汇总行并按page排序（与SQL的排序规则相同），索引不可用或正在后台构建时返回None
+
+    rows为GradeScoreIndex上生成数据行的方法名。分页请求的游标依赖SQL计算的排序键，仍然查询数据库
+    """
+    if page.limit is not None or page.cursor is not None:
+        return None
+    index = score_index.get(db, filter.grade, versions)
+    if index is None:
+        return None
+    results = getattr(index, rows)(filter)
+    if page.sort_by == "group":
+        key = lambda r: (r.group or "", r.student_id)
+    else:
+        key = lambda r: (getattr(r, page.sort_by), r.student_id)
+    return sorted(results, key=key, reverse=page.order == "desc")
+
+
+def _add_grades(summary: List[Dict[str, Any]], start: int = 1) -> List[Dict[str, Any]]:
+    """为汇总行编号（从start开始），并批量计算等级和颜色"""
+    grades, colors = GradeCalculator.calculate_grades([score["total_score"] for score in summary])
+    for i, (score, grade, color) in enumerate(zip(summary, grades, colors), start):
+        score["id"] = i
+        score["grade"] = grade
+        score["grade_color"] = color
+    return summary
+
+
+def _build_student_summary(results, start: int = 1) -> List[Dict[str, Any]]:
+    """把透视查询结果转换为接口返回的汇总行，平均分在这里由分数之和与次数计算，id从start开始编号"""
+    summary = []
+    for r in results:
+        scores = {
+            subject: score_sum / score_count if score_count else None
+            for subject, (score_sum, score_count) in load_pivot(r.scores).items()
+        }
+        summary.append({
+            "student_id": r.student_id,
+            "name": r.name,
+            "grade": r.grade,
+            "class_name": r.class_name,
+            "group": r.group,
+            "total_score": r.total_score,
+            **scores
+        })
+    return _add_grades(summary, start)
+
+
 @router.post("/summary")
-def get_student_score_summary(filter: RecordFilter, db: Session = Depends(get_db)):
-    """获取学生成绩汇总"""
-    try:
-        # 构建查询
-        stmt = select(
-            Student.student_id,
-            Student.name,
-            Student.grade,
-            Student.class_name,
-            Student.group,
-            Record.subject,
-            func.avg(Record.score).label("avg_score")
-        ).join(Student)
-
-        # 应用筛选条件
-        if filter.grade:
-            stmt = stmt.where(Student.grade == filter.grade)
-        if filter.class_name:
-            stmt = stmt.where(Student.class_name == filter.class_name)
-        if filter.group:
-            stmt = stmt.where(Student.group == filter.group)
-        if filter.subject:
-            stmt = stmt.where(Record.subject == filter.subject)
-        if filter.start_date:
-            stmt = stmt.where(Record.date >= filter.start_date)
-        if filter.end_date:
-            stmt = stmt.where(Record.date <= filter.end_date)
-
-        stmt = stmt.group_by(
-            Student.student_id,
-            Student.name,
-            Student.grade,
-            Student.class_name,
-            Student.group,
-            Record.subject
-        )
+def get_student_score_summary(
+    filter: RecordFilter,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    layout: SummaryLayout = "objects",
+    page: SummaryPage = Depends()
+):
+    """
+    获取学生成绩汇总，layout=table时返回columns + rows格式，数据未变化时对If-None-Match返回304
 
-        results = db.execute(stmt).all()
-
-        # 处理结果
-        student_scores = {}
-        for r in results:
-            if r.student_id not in student_scores:
-                student_scores[r.student_id] = {
-                    "student_id": r.student_id,
-                    "name": r.name,
-                    "grade": r.grade,
-                    "class_name": r.class_name,
-                    "group": r.group,
-                    "total_score": 0
-                }
-            student_scores[r.student_id][r.subject] = r.avg_score
-            student_scores[r.student_id]["total_score"] += r.avg_score or 0
-
-        # 计算等级并添加颜色
-        summary = []
-        for i, (_, score) in enumerate(student_scores.items(), 1):
-            score["id"] = i
-            grade = GradeCalculator.calculate_grade(score["total_score"])
-            score["grade"] = grade
-            score["grade_color"] = GradeCalculator.get_grade_color(grade)
-            summary.append(score)
-
-        return summary
+    按sort_by（学号、班级、小组、总分）和order在SQL中排序；给出limit或cursor时分页返回items和next_cursor，
+    id为学生在完整排序结果中的位置。指定年级且不分页时由成绩索引计算，不再聚合日汇总表
+    """
+    try:
+        versions = data_versions(db, *SUMMARY_VERSION_TABLES)
+        not_modified = check_not_modified(request, response, versions, filter.dict())
+        if not_modified:
+            return not_modified
+        results = _indexed_summary_rows(db, filter, page, versions, "student_summary_rows")
+        if results is not None:
+            return _summary_response(_build_student_summary(results), layout, STUDENT_SUMMARY_COLUMNS, response)
+        page_stmt, total_stmt, start = _summary_page_stmts(_student_summary_pivot_stmt(filter), page)
+        results = db.execute(page_stmt).all()
+        total = db.execute(total_stmt).scalar() if total_stmt is not None else None
+        return _summary_page_response(_build_student_summary, results, page, start, total,
+                                      layout, STUDENT_SUMMARY_COLUMNS, response)
     except SQLAlchemyError as e:
         logger.error(f"查询记录失败: {str(e)}")
         raise HTTPException(status_code=500, detail="数据库查询失败")
 
 
-@router.post("/export-summary")
-def export_student_score_summary_to_excel_v2(filter: RecordFilter, db: Session = Depends(get_db)):
-    """导出学生成绩汇总到Excel"""
+def _iter_student_summary_rows(filter: RecordFilter, subjects: List[str]):
+    """按学号顺序逐个学生生成汇总行，在导出线程中使用独立的会话"""
+    stmt = _student_summary_stmt(filter).order_by(Student.student_id)
+    db = SessionLocal()
+
+    def with_grades(batch):
+        # 每攒够一批学生统一计算等级
+        grades, _ = GradeCalculator.calculate_grades([row[-1] for row in batch])
+        for row, grade in zip(batch, grades):
+            row.append(grade)
+        return batch
+
     try:
-        # 获取汇总数据
-        summary = get_student_score_summary(filter, db)
-        
-        # 创建DataFrame
-        df = pd.DataFrame(summary)
-        
-        # 重新排列列顺序
-        columns = [
-            'student_id', 'name', 'grade', 'class_name', 'group',
-            '语文', '数学', '英语',  # 固定学科列
-            'total_score', 'grade'  # 总分和等级
-        ]
-        
-        # 确保所有必要的列都存在
-        for col in columns:
-            if col not in df.columns and col not in ['语文', '数学', '英语']:
-                df[col] = None
-        
-        # 重命名列
-        column_names = {
-            'student_id': '学号',
-            'name': '姓名',
-            'grade': '年级',
-            'class_name': '班级',
-            'group': '小组',
-            'total_score': '总分'
-        }
-        df = df.rename(columns=column_names)
-        
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-            # 使用ExcelWriter以便设置单元格样式
-            with pd.ExcelWriter(temp_file.name, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='成绩汇总')
-                
-                # 获取工作表
-                worksheet = writer.sheets['成绩汇总']
-                
-                # 设置等级列的背景颜色
-                for idx, row in df.iterrows():
-                    grade = row.get('grade')
-                    if grade:
-                        # 获取grade列的索引位置并转换为整数
-                        grade_col_idx = df.columns.get_loc('grade')
-                        if isinstance(grade_col_idx, (int, float)):
-                            # 将索引转换为整数后再进行加法运算
-                            cell = worksheet.cell(row=int(idx) + 2, column=int(grade_col_idx) + 1)
-                        else:
-                            # 如果get_loc返回的不是整数，则抛出异常
-                            raise ValueError("无法获取grade列的索引位置")
-                        # 导入openpyxl模块
-                        cell.fill = PatternFill(
-                            start_color=GradeCalculator.get_grade_color(grade).lstrip('#'),
-                            end_color=GradeCalculator.get_grade_color(grade).lstrip('#'),
-                            fill_type='solid'
-                        )
-            
-            return FileResponse(
-                temp_file.name,
-                media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                filename='student_score_summary.xlsx',
-                background=BackgroundTask(lambda: os.unlink(temp_file.name))
-            )
-    
-    except Exception as e:
-        logger.error(f"导出学生成绩汇总失败: {str(e)}")
-        raise HTTPException(status_code=500, detail="导出失败")
+        results = db.execute(stmt, execution_options={"yield_per": EXPORT_FETCH_SIZE})
+        batch = []
+        for i, (_, rows) in enumerate(groupby(results, key=lambda r: r.student_id), 1):
+            rows = list(rows)
+            scores = {r.subject: r.avg_score for r in rows}
+            total_score = sum(score or 0 for score in scores.values())
+            first = rows[0]
+            batch.append([
+                i, first.student_id, first.name, first.grade, first.class_name, first.group,
+                *[scores.get(subject) for subject in subjects],
+                total_score
+            ])
+            if len(batch) >= EXPORT_FETCH_SIZE:
+                yield from with_grades(batch)
+                batch = []
+        yield from with_grades(batch)
+    finally:
+        db.close()
+
+
+def student_summary_filename(export_format: str) -> str:
+    return export_filename('student_score_summary', export_format)
+
+
+def _student_summary_sheet(db: Session, filter: RecordFilter) -> Dict[str, Any]:
+    """学生成绩汇总的导出参数（见export_formats），行数据在写入时才逐批查询"""
+    subjects = db.execute(_pivot_keys_stmt(RecordDailyStat.subject, filter)).scalars().all()
+    header = ["ID", "学号", "姓名", "年级", "班级", "小组", *subjects, "总分", "等级"]
+    return {
+        "sheet_title": '成绩汇总',
+        "header": header,
+        "rows": _iter_student_summary_rows(filter, subjects),
+        "fills": {len(header) - 1: GradeCalculator.get_grade_color}
+    }
+
+
+def render_student_summary(params: Dict[str, Any], fileobj):
+    """后台导出任务：在导出进程中把学生成绩汇总按params["format"]写入fileobj"""
+    with SessionLocal() as db:
+        sheet = _student_summary_sheet(db, RecordFilter(**params["filter"]))
+    write_export(params["format"], fileobj, **sheet)
 
 
 @router.post("/export-summary")
-def export_student_score_summary_to_excel(filter: RecordFilter, db: Session = Depends(get_db)):
-    """
-    导出学生成绩汇总为Excel
-    """
-    # 获取汇总数据
-    summary = get_student_score_summary(filter, db)
-    
-    if not summary:
-        raise HTTPException(status_code=404, detail="未找到符合条件的记录")
-    
-    # 创建DataFrame
-    df = pd.DataFrame(summary)
-    
-    # 创建临时文件保存Excel
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-        df.to_excel(temp_file.name, index=False)
-        temp_file_path = temp_file.name
-    
-    # 返回文件
-    response = FileResponse(
-        temp_file_path,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=f"学生成绩汇总_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
-    )
-    
-    # 设置回调函数，在响应发送后删除临时文件
-    response.background = BackgroundTask(os.unlink, temp_file_path)
-    
-    return response
+def export_student_score_summary(
+    filter: RecordFilter,
+    format: Optional[str] = Query(None, description="导出格式：xlsx、csv、jsonl、parquet，默认根据Accept头选择"),
+    accept: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """导出学生成绩汇总"""
+    export_format = require_export_format(format, accept)
+    try:
+        sheet = _student_summary_sheet(db, filter)
+    except SQLAlchemyError as e:
+        logger.error(f"导出学生成绩汇总失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="导出失败")
+    return export_response(export_format, student_summary_filename(export_format), sheet)
 
 
-@router.post("/subject-summary")
-def get_subject_score_summary_by_date(filter: RecordFilter, db: Session = Depends(get_db)):
-    """
-    获取指定学科的作业记录汇总，按日期分组
-    """
-    if not filter.subject:
-        raise HTTPException(status_code=400, detail="必须指定学科")
-    
-    # 构建基础查询
-    query = db.query(
-        Record.student_id,
+def _subject_summary_stmt(filter: RecordFilter):
+    """构建指定学科每个学生每天分数的查询，数据来自日汇总表"""
+    stmt = select(
+        RecordDailyStat.student_id,
         Student.name,
         Student.grade,
         Student.class_name,
-        Record.date,
-        Record.score
+        RecordDailyStat.date,
+        stat_score_column().label("score"),
+        RecordDailyStat.score_count
     ).join(Student)
     
     # 应用筛选条件
-    query = query.filter(Record.subject == filter.subject)
+    stmt = stmt.where(RecordDailyStat.subject == filter.subject)
     if filter.grade:
-        query = query.filter(Student.grade == filter.grade)
+        stmt = stmt.where(Student.grade == filter.grade)
     if filter.class_name:
-        query = query.filter(Student.class_name == filter.class_name)
+        stmt = stmt.where(Student.class_name == filter.class_name)
     if filter.group:
-        query = query.filter(Student.group == filter.group)
+        stmt = stmt.where(Student.group == filter.group)
     if filter.start_date:
-        query = query.filter(Record.date >= filter.start_date)
+        stmt = stmt.where(RecordDailyStat.date >= filter.start_date)
     if filter.end_date:
-        query = query.filter(Record.date <= filter.end_date)
-    
-    # 执行查询
-    results = query.all()
-    
-    # 如果没有记录，返回空列表
-    if not results:
-        return []
-    
-    # 获取所有日期
-    dates = sorted(set(r.date for r in results))
+        stmt = stmt.where(RecordDailyStat.date <= filter.end_date)
     
-    # 按学生ID分组结果
-    student_scores = {}
-    for r in results:
-        if r.student_id not in student_scores:
-            student_scores[r.student_id] = {
-                "student_id": r.student_id,
-                "name": r.name,
-                "grade": r.grade,
-                "class_name": r.class_name,
-                "total_score": 0,
-                "count": 0
-            }
-        
-        # 添加日期分数
-        date_str = r.date.strftime("%Y-%m-%d")
-        student_scores[r.student_id][date_str] = r.score
-        
-        # 更新总分和计数
-        if r.score is not None:
-            student_scores[r.student_id]["total_score"] += r.score
-            student_scores[r.student_id]["count"] += 1
-    
-    # 转换为列表并添加ID
-    summary = []
-    for i, (_, score) in enumerate(student_scores.items(), 1):
-        score["id"] = i
-        summary.append(score)
-    
-    return summary
+    return stmt
 
 
-@router.post("/export-subject-summary")
-def export_subject_score_summary_to_excel(filter: RecordFilter, db: Session = Depends(get_db)):
+def _subject_summary_pivot_stmt(filter: RecordFilter):
+    """构建指定学科每个学生一行的汇总查询，各日期的分数透视为JSON对象"""
+    student_columns = (Student.student_id, Student.name, Student.grade, Student.class_name, Student.group)
+    stmt = select(
+        *student_columns,
+        pivot_object(RecordDailyStat.date, stat_score_column()).label("scores"),
+        func.coalesce(func.sum(stat_score_column()), 0).label("total_score"),
+        func.coalesce(func.sum(RecordDailyStat.score_count), 0).label("count")
+    ).join_from(RecordDailyStat, Student)
+    return _filter_stats(stmt, filter).group_by(*student_columns)
+
+
+def _build_subject_summary(results, start: int = 1) -> List[Dict[str, Any]]:
+    """把透视查询结果转换为接口返回的汇总行，日期列为YYYY-MM-DD格式，id从start开始编号"""
+    return [
+        {
+            "student_id": r.student_id,
+            "name": r.name,
+            "grade": r.grade,
+            "class_name": r.class_name,
+            "total_score": r.total_score,
+            "count": r.count,
+            **load_pivot(r.scores),
+            "id": i
+        }
+        for i, r in enumerate(results, start)
+    ]
+
+
+@router.post("/subject-summary")
+def get_subject_score_summary_by_date(
+    filter: RecordFilter,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    layout: SummaryLayout = "objects",
+    page: SummaryPage = Depends()
+):
     """
-    导出学科作业记录汇总为Excel
+    获取指定学科的作业记录汇总，按日期分组，layout=table时返回columns + rows格式，
+    数据未变化时对If-None-Match返回304。排序和分页参数与学生成绩汇总相同，指定年级且不分页时由成绩索引计算
+
+    日期列为该学生当天该学科的分数之和（由日汇总表计算）：同一天有多个批次的记录时是这些批次分数的合计，
+    不再是其中某一条记录的分数，各日期列之和与total_score一致。当天的记录都没有分数时为null。
     """
-    # 获取汇总数据
-    summary = get_subject_score_summary_by_date(filter, db)
-    
-    if not summary:
+    if not filter.subject:
+        raise HTTPException(status_code=400, detail="必须指定学科")
+
+    versions = data_versions(db, *SUMMARY_VERSION_TABLES)
+    not_modified = check_not_modified(request, response, versions, filter.dict())
+    if not_modified:
+        return not_modified
+
+    results = _indexed_summary_rows(db, filter, page, versions, "subject_summary_rows")
+    if results is not None:
+        return _summary_response(_build_subject_summary(results), layout, SUBJECT_SUMMARY_COLUMNS, response)
+
+    # 执行查询，日期列在SQL中透视
+    page_stmt, total_stmt, start = _summary_page_stmts(_subject_summary_pivot_stmt(filter), page)
+    results = db.execute(page_stmt).all()
+    total = db.execute(total_stmt).scalar() if total_stmt is not None else None
+    return _summary_page_response(_build_subject_summary, results, page, start, total,
+                                  layout, SUBJECT_SUMMARY_COLUMNS, response)
+
+
+def _iter_subject_summary_rows(filter: RecordFilter, dates: List[date]):
+    """按学号顺序逐个学生生成学科日期汇总行，在导出线程中使用独立的会话"""
+    stmt = _subject_summary_stmt(filter).order_by(RecordDailyStat.student_id, RecordDailyStat.date)
+    db = SessionLocal()
+    try:
+        results = db.execute(stmt, execution_options={"yield_per": EXPORT_FETCH_SIZE})
+        for i, (_, rows) in enumerate(groupby(results, key=lambda r: r.student_id), 1):
+            rows = list(rows)
+            scores = {}
+            total_score = 0
+            count = 0
+            for r in rows:
+                scores[r.date] = r.score
+                if r.score is not None:
+                    total_score += r.score
+                    count += r.score_count
+            first = rows[0]
+            yield [
+                i, first.student_id, first.name, first.grade, first.class_name,
+                *[scores.get(d) for d in dates],
+                total_score, count
+            ]
+    finally:
+        db.close()
+
+
+def subject_summary_filename(filter: RecordFilter, export_format: str) -> str:
+    return export_filename(f"{filter.subject}学科作业汇总_{datetime.now().strftime('%Y%m%d%H%M%S')}", export_format)
+
+
+def _subject_summary_sheet(db: Session, filter: RecordFilter) -> Dict[str, Any]:
+    """学科日期汇总的导出参数（见export_formats），没有记录时抛出404"""
+    dates = db.execute(_pivot_keys_stmt(RecordDailyStat.date, filter)).scalars().all()
+    if not dates:
         raise HTTPException(status_code=404, detail="未找到符合条件的记录")
+    header = ["ID", "学号", "姓名", "年级", "班级", *[d.strftime("%Y-%m-%d") for d in dates], "总分", "次数"]
+    return {
+        "sheet_title": 'Sheet1',
+        "header": header,
+        "rows": _iter_subject_summary_rows(filter, dates)
+    }
+
+
+def render_subject_summary(params: Dict[str, Any], fileobj):
+    """后台导出任务：在导出进程中把学科日期汇总按params["format"]写入fileobj"""
+    with SessionLocal() as db:
+        sheet = _subject_summary_sheet(db, RecordFilter(**params["filter"]))
+    write_export(params["format"], fileobj, **sheet)
+
+
+@router.post("/export-subject-summary")
+def export_subject_score_summary(
+    filter: RecordFilter,
+    format: Optional[str] = Query(None, description="导出格式：xlsx、csv、jsonl、parquet，默认根据Accept头选择"),
+    accept: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    导出学科作业记录汇总，日期列为当天各批次的分数之和（同/records/subject-summary）
+    """
+    if not filter.subject:
+        raise HTTPException(status_code=400, detail="必须指定学科")
+    export_format = require_export_format(format, accept)
+    return export_response(
+        export_format, subject_summary_filename(filter, export_format), _subject_summary_sheet(db, filter)
+    )
+
+
+def _ranking_stmt(filter: RecordFilter):
+    """
+    构建学生在班级和年级内排名的查询，总分与学生成绩汇总相同（各学科平均分之和）
+
+    名次和百分位用窗口函数在SQL中计算。按班级、小组筛选时只筛选返回的学生，年级排名仍按整个年级计算
+    """
+    student_columns = (Student.student_id, Student.name, Student.grade, Student.class_name, Student.group)
+    per_subject = _filter_stats(
+        select(
+            *student_columns,
+            (func.sum(RecordDailyStat.score_sum) / func.nullif(func.sum(RecordDailyStat.score_count), 0)).label("avg_score")
+        ).join_from(RecordDailyStat, Student),
+        filter.model_copy(update={"class_name": None, "group": None})
+    ).group_by(*student_columns, RecordDailyStat.subject).subquery()
+
+    keys = [per_subject.c[column.key] for column in student_columns]
+    totals = select(
+        *keys,
+        func.coalesce(func.sum(per_subject.c.avg_score), 0).label("total_score")
+    ).group_by(*keys).subquery()
+
+    # 平均分相加的顺序不同会产生微小的浮点误差，按保留6位小数的总分排名，使相同的总分名次相同
+    score = func.round(totals.c.total_score, 6)
+    in_class = (totals.c.grade, totals.c.class_name)
+    ranked = select(
+        totals,
+        func.rank().over(partition_by=in_class, order_by=score.desc()).label("class_rank"),
+        func.count().over(partition_by=in_class).label("class_size"),
+        func.percent_rank(type_=Float).over(partition_by=in_class, order_by=score).label("class_percentile"),
+        func.rank().over(partition_by=totals.c.grade, order_by=score.desc()).label("grade_rank"),
+        func.count().over(partition_by=totals.c.grade).label("grade_size"),
+        func.percent_rank(type_=Float).over(partition_by=totals.c.grade, order_by=score).label("grade_percentile")
+    ).subquery()
+
+    stmt = select(ranked)
+    if filter.class_name:
+        stmt = stmt.where(ranked.c.class_name == filter.class_name)
+    if filter.group:
+        stmt = stmt.where(ranked.c.group == filter.group)
+    return stmt.order_by(ranked.c.grade, ranked.c.class_name, ranked.c.class_rank, ranked.c.student_id)
+
+
+@router.post("/ranking", response_model=List[StudentRanking])
+def get_student_ranking(
+    filter: RecordFilter,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """
+    获取学生在班级和年级内的名次和百分位，一次查询返回，按年级、班级、班级名次排序
+
+    数据未变化时对If-None-Match返回304
+    """
+    try:
+        versions = data_versions(db, *SUMMARY_VERSION_TABLES)
+        not_modified = check_not_modified(request, response, versions, filter.dict())
+        if not_modified:
+            return not_modified
+        rows = db.execute(_ranking_stmt(filter)).all()
+        return fast_json_response(serialize_rows(StudentRanking, rows), response)
+    except SQLAlchemyError as e:
+        logger.error(f"查询排名失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="数据库查询失败")
+
+
+def _grades_stmt(start_date: Optional[date], end_date: Optional[date]):
+    """构建日期范围内有作业记录的年级查询"""
+    stmt = select(Student.grade).distinct()
+    stmt = stmt.join(Record)
     
-    # 创建DataFrame
-    df = pd.DataFrame(summary)
-    
-    # 创建临时文件保存Excel
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-        df.to_excel(temp_file.name, index=False)
-        temp_file_path = temp_file.name
-    
-    # 创建后台任务用于删除临时文件
-    background_task = BackgroundTask(os.unlink, temp_file_path)
+    if start_date:
+        stmt = stmt.where(Record.date >= start_date)
+    if end_date:
+        stmt = stmt.where(Record.date <= end_date)
+    return stmt
+
+
+def _classes_stmt(grade: str, start_date: Optional[date], end_date: Optional[date]):
+    """构建指定年级在日期范围内有作业记录的班级查询"""
+    stmt = select(Student.class_name).distinct()
+    stmt = stmt.join(Record)
+    stmt = stmt.where(Student.grade == grade)
     
-    # 返回文件，并设置后台任务
-    return FileResponse(
-        temp_file_path,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=f"{filter.subject}学科作业汇总_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx",
-        background=background_task
-    )
+    if start_date:
+        stmt = stmt.where(Record.date >= start_date)
+    if end_date:
+        stmt = stmt.where(Record.date <= end_date)
+    return stmt
 
 
 @router.get("/grades", response_model=List[str])
@@ -629,15 +1126,7 @@ def get_grades_by_date_range(
 ):
     """根据日期范围获取年级列表"""
     try:
-        stmt = select(Student.grade).distinct()
-        stmt = stmt.join(Record)
-        
-        if start_date:
-            stmt = stmt.where(Record.date >= start_date)
-        if end_date:
-            stmt = stmt.where(Record.date <= end_date)
-            
-        grades = db.execute(stmt).scalars().all()
+        grades = db.execute(_grades_stmt(start_date, end_date)).scalars().all()
         return [grade for grade in grades if grade is not None]
     except SQLAlchemyError as e:
         logger.error(f"获取年级列表失败: {str(e)}")
@@ -652,17 +1141,174 @@ def get_classes_by_grade_and_date(
 ):
     """根据年级和日期范围获取班级列表"""
     try:
-        stmt = select(Student.class_name).distinct()
-        stmt = stmt.join(Record)
-        stmt = stmt.where(Student.grade == grade)
-        
-        if start_date:
-            stmt = stmt.where(Record.date >= start_date)
-        if end_date:
-            stmt = stmt.where(Record.date <= end_date)
-            
-        classes = db.execute(stmt).scalars().all()
+        classes = db.execute(_classes_stmt(grade, start_date, end_date)).scalars().all()
         return [class_name for class_name in classes if class_name is not None]
     except SQLAlchemyError as e:
         logger.error(f"获取班级列表失败: {str(e)}")
-        raise HTTPException(status_code=500, detail="数据库查询失败")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="数据库查询失败")
+
+
+# 异步接口：与上面的同名接口返回相同的数据，使用aiosqlite异步会话，不占用线程池
+async_router = APIRouter()
+
+
+@async_router.get("/", response_model=Union[List[RecordSchema], CursorPage[RecordSchema]])
+async def read_records_async(
+    request: Request,
+    response: Response,
+    grade: Optional[str] = None,
+    class_name: Optional[str] = None,
+    group: Optional[str] = None,
+    subject: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=RECORDS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    with_total: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取作业记录列表，支持筛选和游标分页"""
+    paged = limit is not None or cursor is not None
+    try:
+        # 如果任何参数为None，返回空列表
+        if any(param is None for param in [grade, start_date, end_date]):
+            return {"items": []} if paged else []
+
+        filter_params = RecordFilter(
+            grade=grade,
+            class_name=class_name,
+            group=group,
+            subject=subject,
+            start_date=start_date,
+            end_date=end_date
+        )
+        not_modified = check_not_modified(request, response, await adata_versions(db, RECORDS, STUDENTS))
+        if not_modified:
+            return not_modified
+
+        stmt = _records_stmt(filter_params)
+        if not paged:
+            return fast_json_response(serialize_rows(RecordSchema, (await db.execute(stmt)).all()), response)
+
+        limit = limit or RECORDS_PAGE_SIZE
+        page_stmt = keyset_page_stmt(stmt, RECORD_PAGE_KEYS, _record_cursor(cursor), limit)
+        items, next_cursor = split_page((await db.execute(page_stmt)).all(), limit, _record_page_key)
+        total = (await db.execute(count_stmt(stmt))).scalar() if with_total else None
+        return fast_json_response(
+            {"items": serialize_rows(RecordSchema, items), "next_cursor": next_cursor, "total": total}, response)
+    except SQLAlchemyError as e:
+        logger.error(f"查询记录失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="数据库查询失败")
+    except ValueError as e:
+        logger.error(f"参数验证失败: {str(e)}")
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@async_router.get("/batches", response_model=List[str])
+@async_router.get("/batches/all", response_model=List[str])
+async def get_batches_async(db: AsyncSession = Depends(get_async_db)):
+    """获取批次列表"""
+    try:
+        async def load():
+            batches = (await db.execute(select(Record.batch).distinct())).scalars().all()
+            return [batch for batch in batches if batch is not None]
+        return await lookup_cache.aget_or_load('records', ('batches',), load)
+    except SQLAlchemyError as e:
+        logger.error(f"Error getting batches: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@async_router.post("/summary")
+async def get_student_score_summary_async(
+    filter: RecordFilter,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    layout: SummaryLayout = "objects",
+    page: SummaryPage = Depends()
+):
+    """获取学生成绩汇总"""
+    try:
+        not_modified = check_not_modified(request, response, await adata_versions(db, *SUMMARY_VERSION_TABLES), filter.dict())
+        if not_modified:
+            return not_modified
+        page_stmt, total_stmt, start = _summary_page_stmts(_student_summary_pivot_stmt(filter), page)
+        results = (await db.execute(page_stmt)).all()
+        total = (await db.execute(total_stmt)).scalar() if total_stmt is not None else None
+        return _summary_page_response(_build_student_summary, results, page, start, total,
+                                      layout, STUDENT_SUMMARY_COLUMNS, response)
+    except SQLAlchemyError as e:
+        logger.error(f"查询记录失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="数据库查询失败")
+
+
+@async_router.post("/subject-summary")
+async def get_subject_score_summary_by_date_async(
+    filter: RecordFilter,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    layout: SummaryLayout = "objects",
+    page: SummaryPage = Depends()
+):
+    """获取指定学科的作业记录汇总，按日期分组，日期列为当天各批次的分数之和（同/records/subject-summary）"""
+    if not filter.subject:
+        raise HTTPException(status_code=400, detail="必须指定学科")
+    not_modified = check_not_modified(request, response, await adata_versions(db, *SUMMARY_VERSION_TABLES), filter.dict())
+    if not_modified:
+        return not_modified
+    page_stmt, total_stmt, start = _summary_page_stmts(_subject_summary_pivot_stmt(filter), page)
+    results = (await db.execute(page_stmt)).all()
+    total = (await db.execute(total_stmt)).scalar() if total_stmt is not None else None
+    return _summary_page_response(_build_subject_summary, results, page, start, total,
+                                  layout, SUBJECT_SUMMARY_COLUMNS, response)
+
+
+@async_router.post("/ranking", response_model=List[StudentRanking])
+async def get_student_ranking_async(
+    filter: RecordFilter,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取学生在班级和年级内的名次和百分位"""
+    try:
+        not_modified = check_not_modified(request, response, await adata_versions(db, *SUMMARY_VERSION_TABLES), filter.dict())
+        if not_modified:
+            return not_modified
+        rows = (await db.execute(_ranking_stmt(filter))).all()
+        return fast_json_response(serialize_rows(StudentRanking, rows), response)
+    except SQLAlchemyError as e:
+        logger.error(f"查询排名失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="数据库查询失败")
+
+
+@async_router.get("/grades", response_model=List[str])
+async def get_grades_by_date_range_async(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """根据日期范围获取年级列表"""
+    try:
+        grades = (await db.execute(_grades_stmt(start_date, end_date))).scalars().all()
+        return [grade for grade in grades if grade is not None]
+    except SQLAlchemyError as e:
+        logger.error(f"获取年级列表失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="数据库查询失败")
+
+
+@async_router.get("/classes", response_model=List[str])
+async def get_classes_by_grade_and_date_async(
+    grade: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """根据年级和日期范围获取班级列表"""
+    try:
+        classes = (await db.execute(_classes_stmt(grade, start_date, end_date))).scalars().all()
+        return [class_name for class_name in classes if class_name is not None]
+    except SQLAlchemyError as e:
+        logger.error(f"获取班级列表失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="数据库查询失败")
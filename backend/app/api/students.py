@@ -1,59 +1,105 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.models.models import Student, Record
 from app.schemas.schemas import Student as StudentSchema
 from app.schemas.schemas import StudentCreate, PaginatedResponse
+from app.utils.cache import lookup_cache
+from app.utils.etag import STUDENTS, adata_versions, check_not_modified, data_versions
+from app.utils.fast_json import fast_json_response, serialize_rows
+from app.utils.pagination import count_stmt, decode_cursor, keyset_page_stmt, split_page
 
 router = APIRouter()
 
 
-@router.get("/", response_model=PaginatedResponse[StudentSchema])
-def read_students(
+def _students_stmt(
     grade: Optional[str] = None,
     class_name: Optional[str] = None,
     group: Optional[str] = None,
     student_id: Optional[str] = None,
-    name: Optional[str] = None,
-    page: Optional[int] = Query(1, ge=1),
-    page_size: Optional[int] = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    name: Optional[str] = None
 ):
-    """获取学生列表，支持筛选和分页"""
-    query = db.query(Student)
+    """构建学生列表查询，返回stuInfo表的数据行而不是ORM对象"""
+    stmt = select(*Student.__table__.c)
     
     # 应用筛选条件
     if grade:
-        query = query.filter(Student.grade == grade)
+        stmt = stmt.where(Student.grade == grade)
     if class_name:
-        query = query.filter(Student.class_name == class_name)
+        stmt = stmt.where(Student.class_name == class_name)
     if group:
-        query = query.filter(Student.group == group)
+        stmt = stmt.where(Student.group == group)
     if student_id:
-        query = query.filter(Student.student_id == student_id)
+        stmt = stmt.where(Student.student_id == student_id)
     if name:
-        query = query.filter(Student.name == name)
+        stmt = stmt.where(Student.name == name)
+    return stmt
+
+
+def _student_page_key(student):
+    return (student.student_id,)
+
+
+def _students_page_stmt(stmt, page: int, page_size: int, cursor: Optional[str]):
+    """按学号排序取一页学生，有游标时从游标之后开始，否则按页码跳过"""
+    try:
+        after = decode_cursor(cursor, (str,)) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if after is None:
+        stmt = stmt.offset((page - 1) * page_size)
+    return keyset_page_stmt(stmt, (Student.student_id,), after, page_size)
+
+
+@router.get("/", response_model=PaginatedResponse[StudentSchema])
+def read_students(
+    request: Request,
+    response: Response,
+    grade: Optional[str] = None,
+    class_name: Optional[str] = None,
+    group: Optional[str] = None,
+    student_id: Optional[str] = None,
+    name: Optional[str] = None,
+    page: Optional[int] = Query(1, ge=1),
+    page_size: Optional[int] = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+    db: Session = Depends(get_db)
+):
+    """
+    获取学生列表，支持筛选和分页
+
+    结果按学号排序，每页都返回next_cursor；传入cursor时从游标位置继续（忽略page），深翻页不再需要OFFSET。
+    响应带ETag，数据未变化时对If-None-Match返回304
+    """
+    not_modified = check_not_modified(request, response, data_versions(db, STUDENTS))
+    if not_modified:
+        return not_modified
+
+    stmt = _students_stmt(grade, class_name, group, student_id, name)
     
     # 计算总记录数
-    total = query.count()
+    total = db.execute(count_stmt(stmt)).scalar() if with_total else None
     
     # 应用分页
     # 确保page和page_size不为None，并转换为整数
     page = int(page) if page is not None else 1
     page_size = int(page_size) if page_size is not None else 10
-    query = query.offset((page - 1) * page_size).limit(page_size)
-    students = query.all()
+    page_stmt = _students_page_stmt(stmt, page, page_size, cursor)
+    students, next_cursor = split_page(db.execute(page_stmt).all(), page_size, _student_page_key)
     
-    return {
-        "items": students,
+    return fast_json_response({
+        "items": serialize_rows(StudentSchema, students),
         "total": total,
         "page": page,
-        "page_size": page_size
-    }
+        "page_size": page_size,
+        "next_cursor": next_cursor
+    }, response)
 
 
 @router.post("/", response_model=StudentSchema)
@@ -69,6 +115,7 @@ def create_student(student: StudentCreate, db: Session = Depends(get_db)):
     db_student = Student(**student.dict())
     db.add(db_student)
     db.commit()
+    lookup_cache.invalidate('students')
     db.refresh(db_student)
     return db_student
 
@@ -104,6 +151,7 @@ def update_student(student_id: str, student: StudentCreate, db: Session = Depend
         setattr(db_student, key, value)
     
     db.commit()
+    lookup_cache.invalidate('students')
     db.refresh(db_student)
     return db_student
 
@@ -124,6 +172,7 @@ def delete_student(student_id: str, db: Session = Depends(get_db)):
     
     db.delete(db_student)
     db.commit()
+    lookup_cache.invalidate('students')
     return {"message": f"学号 {student_id} 已删除"}
 
 
@@ -132,8 +181,10 @@ def get_all_grades(db: Session = Depends(get_db)):
     """
     获取所有年级列表
     """
-    grades = db.query(Student.grade).distinct().all()
-    return [grade[0] for grade in grades if grade[0] is not None]
+    def load():
+        grades = db.query(Student.grade).distinct().all()
+        return [grade[0] for grade in grades if grade[0] is not None]
+    return lookup_cache.get_or_load('students', ('grades',), load)
 
 
 @router.get("/classes/by-grade/{grade}")
@@ -141,8 +192,10 @@ def get_classes_by_grade(grade: str, db: Session = Depends(get_db)):
     """
     获取指定年级的班级列表
     """
-    classes = db.query(Student.class_name).filter(Student.grade == grade).distinct().all()
-    return [class_name[0] for class_name in classes]
+    def load():
+        classes = db.query(Student.class_name).filter(Student.grade == grade).distinct().all()
+        return [class_name[0] for class_name in classes]
+    return lookup_cache.get_or_load('students', ('classes', grade), load)
 
 
 @router.get("/groups/by-class/{class_name}")
@@ -150,5 +203,77 @@ def get_groups_by_class(class_name: str, db: Session = Depends(get_db)):
     """
     获取指定班级的小组列表
     """
-    groups = db.query(Student.group).filter(Student.class_name == class_name).distinct().all()
-    return [group[0] for group in groups if group[0] is not None]
\ No newline at end of file
+    def load():
+        groups = db.query(Student.group).filter(Student.class_name == class_name).distinct().all()
+        return [group[0] for group in groups if group[0] is not None]
+    return lookup_cache.get_or_load('students', ('groups', class_name), load)
+
+
+# 异步接口：与上面的同名接口返回相同的数据，使用aiosqlite异步会话，不占用线程池
+async_router = APIRouter()
+
+
+@async_router.get("/", response_model=PaginatedResponse[StudentSchema])
+async def read_students_async(
+    request: Request,
+    response: Response,
+    grade: Optional[str] = None,
+    class_name: Optional[str] = None,
+    group: Optional[str] = None,
+    student_id: Optional[str] = None,
+    name: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取学生列表，支持筛选、分页和游标分页"""
+    not_modified = check_not_modified(request, response, await adata_versions(db, STUDENTS))
+    if not_modified:
+        return not_modified
+    stmt = _students_stmt(grade, class_name, group, student_id, name)
+    total = (await db.execute(count_stmt(stmt))).scalar() if with_total else None
+    page_stmt = _students_page_stmt(stmt, page, page_size, cursor)
+    students, next_cursor = split_page((await db.execute(page_stmt)).all(), page_size, _student_page_key)
+    return fast_json_response({
+        "items": serialize_rows(StudentSchema, students),
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "next_cursor": next_cursor
+    }, response)
+
+
+@async_router.get("/grades/all", response_model=List[str])
+async def get_all_grades_async(db: AsyncSession = Depends(get_async_db)):
+    """
+    获取所有年级列表
+    """
+    async def load():
+        grades = (await db.execute(select(Student.grade).distinct())).scalars().all()
+        return [grade for grade in grades if grade is not None]
+    return await lookup_cache.aget_or_load('students', ('grades',), load)
+
+
+@async_router.get("/classes/by-grade/{grade}")
+async def get_classes_by_grade_async(grade: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    获取指定年级的班级列表
+    """
+    async def load():
+        stmt = select(Student.class_name).where(Student.grade == grade).distinct()
+        return list((await db.execute(stmt)).scalars().all())
+    return await lookup_cache.aget_or_load('students', ('classes', grade), load)
+
+
+@async_router.get("/groups/by-class/{class_name}")
+async def get_groups_by_class_async(class_name: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    获取指定班级的小组列表
+    """
+    async def load():
+        stmt = select(Student.group).where(Student.class_name == class_name).distinct()
+        groups = (await db.execute(stmt)).scalars().all()
+        return [group for group in groups if group is not None]
+    return await lookup_cache.aget_or_load('students', ('groups', class_name), load)
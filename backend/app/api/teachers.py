@@ -1,41 +1,56 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.models.models import Teacher, Record
 from app.schemas.schemas import Teacher as TeacherSchema
 from app.schemas.schemas import TeacherCreate, PaginatedResponse
+from app.utils.cache import lookup_cache
+from app.utils.etag import TEACHERS, adata_versions, check_not_modified, data_versions
+from app.utils.fast_json import fast_json_response, serialize_rows
 
 router = APIRouter()
 
 
+def _teachers_stmt(subject: Optional[str] = None):
+    """构建教师列表查询，返回teacherInfo表的数据行而不是ORM对象"""
+    stmt = select(*Teacher.__table__.c)
+    if subject:
+        stmt = stmt.where(Teacher.subject == subject)
+    return stmt
+
+
 @router.get("/", response_model=PaginatedResponse[TeacherSchema])
 def read_teachers(
+    request: Request,
+    response: Response,
     subject: Optional[str] = None,
     page: Optional[int] = Query(1, ge=1),
     page_size: Optional[int] = Query(10, ge=1, le=100),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Teacher)
-    
-    if subject:
-        query = query.filter(Teacher.subject == subject)
+    not_modified = check_not_modified(request, response, data_versions(db, TEACHERS))
+    if not_modified:
+        return not_modified
+
+    stmt = _teachers_stmt(subject)
     
-    total = query.count()
+    total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar()
     # 确保 page 和 page_size 为整数类型
     offset = (int(page) - 1) * int(page_size) if page and page_size else 0
     limit = int(page_size) if page_size else 10
-    teachers = query.offset(offset).limit(limit).all()
+    teachers = db.execute(stmt.offset(offset).limit(limit)).all()
     
-    return {
-        "items": teachers,
+    return fast_json_response({
+        "items": serialize_rows(TeacherSchema, teachers),
         "total": total,
         "page": page,
         "page_size": page_size
-    }
+    }, response)
 
 
 @router.post("/", response_model=TeacherSchema)
@@ -51,6 +66,7 @@ def create_teacher(teacher: TeacherCreate, db: Session = Depends(get_db)):
     db_teacher = Teacher(**teacher.dict())
     db.add(db_teacher)
     db.commit()
+    lookup_cache.invalidate('teachers')
     db.refresh(db_teacher)
     return db_teacher
 
@@ -86,6 +102,7 @@ def update_teacher(teacher_id: str, teacher: TeacherCreate, db: Session = Depend
         setattr(db_teacher, key, value)
     
     db.commit()
+    lookup_cache.invalidate('teachers')
     db.refresh(db_teacher)
     return db_teacher
 
@@ -106,6 +123,7 @@ def delete_teacher(teacher_id: str, db: Session = Depends(get_db)):
     
     db.delete(db_teacher)
     db.commit()
+    lookup_cache.invalidate('teachers')
     return {"message": f"教师ID {teacher_id} 已删除"}
 
 
@@ -114,5 +132,45 @@ def get_subjects(db: Session = Depends(get_db)):
     """
     获取所有学科列表
     """
-    subjects = db.query(Teacher.subject).distinct().all()
-    return [subject[0] for subject in subjects if subject[0] is not None]
\ No newline at end of file
+    def load():
+        subjects = db.query(Teacher.subject).distinct().all()
+        return [subject[0] for subject in subjects if subject[0] is not None]
+    return lookup_cache.get_or_load('teachers', ('subjects',), load)
+
+
+# 异步接口：与上面的同名接口返回相同的数据，使用aiosqlite异步会话，不占用线程池
+async_router = APIRouter()
+
+
+@async_router.get("/", response_model=PaginatedResponse[TeacherSchema])
+async def read_teachers_async(
+    request: Request,
+    response: Response,
+    subject: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    not_modified = check_not_modified(request, response, await adata_versions(db, TEACHERS))
+    if not_modified:
+        return not_modified
+    stmt = _teachers_stmt(subject)
+    total = (await db.execute(select(func.count()).select_from(stmt.subquery()))).scalar()
+    teachers = (await db.execute(stmt.offset((page - 1) * page_size).limit(page_size))).all()
+    return fast_json_response({
+        "items": serialize_rows(TeacherSchema, teachers),
+        "total": total,
+        "page": page,
+        "page_size": page_size
+    }, response)
+
+
+@async_router.get("/subjects/", response_model=List[str])
+async def get_subjects_async(db: AsyncSession = Depends(get_async_db)):
+    """
+    获取所有学科列表
+    """
+    async def load():
+        subjects = (await db.execute(select(Teacher.subject).distinct())).scalars().all()
+        return [subject for subject in subjects if subject is not None]
+    return await lookup_cache.aget_or_load('teachers', ('subjects',), load)
@@ -1,4 +1,10 @@
-from typing import Dict
+import os
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# 从.env文件加载环境变量
+load_dotenv()
 
 # 学科满分配置
 SUBJECT_MAX_SCORES: Dict[str, float] = {
@@ -13,4 +19,89 @@ GRADE_THRESHOLDS = {
     'B': 70,  # 良好：70% - 90%
     'C': 50,  # 合格：50% - 70%
     'D': 0    # 不合格：< 50%
-}
\ No newline at end of file
+}
+
+# Excel导入时每批写入数据库的记录数
+IMPORT_CHUNK_SIZE: int = 1000
+
+# 导入文件每次读取、校验的行数，每块在独立的事务中写入并提交，某块失败只回滚该块
+IMPORT_COMMIT_ROWS: int = int(os.getenv('IMPORT_COMMIT_ROWS', '20000'))
+# 导入文件的大小上限（字节）
+IMPORT_MAX_UPLOAD_BYTES: int = int(os.getenv('IMPORT_MAX_UPLOAD_BYTES', str(200 * 1024 * 1024)))
+# 导入进度在导入结束后保留的时间（秒）
+IMPORT_PROGRESS_TTL: float = float(os.getenv('IMPORT_PROGRESS_TTL', '3600'))
+
+# 流式导出时每次从数据库游标读取的行数
+EXPORT_FETCH_SIZE: int = 1000
+
+# 作业记录游标分页的默认和最大每页条数
+RECORDS_PAGE_SIZE: int = 100
+RECORDS_MAX_PAGE_SIZE: int = 1000
+
+# 成绩汇总分页时的默认和最大每页学生数
+SUMMARY_PAGE_SIZE: int = 100
+SUMMARY_MAX_PAGE_SIZE: int = 1000
+
+# 批量新增、修改、删除作业记录时单次请求的最多行数
+RECORDS_BULK_MAX_ROWS: int = int(os.getenv('RECORDS_BULK_MAX_ROWS', '50000'))
+
+# 后台导出任务：同时渲染的进程数、排队上限、完成后文件保留时间（秒）和保存目录（为空时使用临时目录）
+EXPORT_MAX_WORKERS: int = int(os.getenv('EXPORT_MAX_WORKERS', '2'))
+EXPORT_MAX_PENDING_JOBS: int = int(os.getenv('EXPORT_MAX_PENDING_JOBS', '20'))
+EXPORT_JOB_TTL: float = float(os.getenv('EXPORT_JOB_TTL', '3600'))
+EXPORT_JOB_DIR: Optional[str] = os.getenv('EXPORT_JOB_DIR') or None
+
+# 年级、班级、小组、学科、批次等下拉选项缓存的有效期（秒）
+LOOKUP_CACHE_TTL: float = 300
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# SQLite性能配置，每个新连接建立时通过PRAGMA设置，可以用同名环境变量覆盖
+SQLITE_PERFORMANCE_PROFILE: bool = _env_bool('SQLITE_PERFORMANCE_PROFILE', True)
+SQLITE_PRAGMAS: Dict[str, str] = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+    'cache_size': os.getenv('SQLITE_CACHE_SIZE', '-65536'),  # 负数表示KB，即64MB
+    'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+    'busy_timeout': os.getenv('SQLITE_BUSY_TIMEOUT', '10000'),  # 毫秒
+}
+
+# 连接池与线程池大小；FastAPI的同步接口在线程池中执行，连接池应不小于线程数
+THREADPOOL_SIZE: int = int(os.getenv('THREADPOOL_SIZE', '40'))
+DB_POOL_SIZE: int = int(os.getenv('DB_POOL_SIZE', str(THREADPOOL_SIZE)))
+# 会话在依赖项清理时才归还连接，而清理同样要排队等待线程池，连接数有上限时高并发下会互相等待直到超时，
+# 因此默认不限制溢出连接（-1），超出DB_POOL_SIZE的连接归还时直接关闭
+DB_MAX_OVERFLOW: int = int(os.getenv('DB_MAX_OVERFLOW', '-1'))
+DB_POOL_TIMEOUT: float = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+
+# 请求耗时统计（/metrics）：是否启用，以及耗时（秒）和响应大小（字节）直方图的分桶上界
+METRICS_ENABLED: bool = _env_bool('METRICS_ENABLED', True)
+METRICS_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+METRICS_SIZE_BUCKETS: Tuple[float, ...] = tuple(float(1024 * 4 ** i) for i in range(8))  # 1KB到16MB
+
+# 作业记录、学生、教师列表跳过逐条的response_model校验直接编码；为True时先用TypeAdapter整批校验
+FAST_JSON_VALIDATE: bool = _env_bool('FAST_JSON_VALIDATE', False)
+
+# 响应压缩：是否启用、压缩的最小响应大小（字节）、gzip压缩级别（1-9）和Brotli质量（0-11，需要安装brotli）。
+# 大的汇总JSON在gzip 9级时压缩耗时是6级的数倍而体积只小约四分之一，默认使用6级
+COMPRESSION_ENABLED: bool = _env_bool('COMPRESSION_ENABLED', True)
+COMPRESSION_MINIMUM_SIZE: int = int(os.getenv('COMPRESSION_MINIMUM_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL: int = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY: int = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+
+# 成绩汇总的前缀和索引：是否启用，以及最多保留的年级数
+SCORE_INDEX_ENABLED: bool = _env_bool('SCORE_INDEX_ENABLED', True)
+SCORE_INDEX_MAX_GRADES: int = int(os.getenv('SCORE_INDEX_MAX_GRADES', '8'))
+
+# SQL调试模式：统计每个请求执行的语句数并在响应头中返回，同一条SQL执行达到阈值次数时视为N+1查询写入日志
+QUERY_DEBUG: bool = _env_bool('QUERY_DEBUG', False)
+N_PLUS_ONE_THRESHOLD: int = int(os.getenv('N_PLUS_ONE_THRESHOLD', '5'))
@@ -1,23 +1,83 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import (
+    SQLITE_PERFORMANCE_PROFILE, SQLITE_PRAGMAS, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+)
 
 # 确保database目录存在
 database_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../database"))
 os.makedirs(database_dir, exist_ok=True)
 
 # 数据库URL
-DATABASE_URL = f"sqlite:///{os.path.join(database_dir, 'homework.db')}"
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(database_dir, 'homework.db')}")
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """新连接建立时设置SQLite性能参数"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _pool_options(url: str):
+    # 内存数据库使用单连接池，不支持连接池大小参数
+    if make_url(url).database in (None, '', ':memory:'):
+        return {}
+    return dict(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+
+
+def create_db_engine(url: str = DATABASE_URL, performance_profile: bool = SQLITE_PERFORMANCE_PROFILE):
+    """创建数据库引擎，performance_profile为True时启用WAL等SQLite调优参数"""
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **_pool_options(url))
+    if performance_profile:
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def create_async_db_engine(url: str = DATABASE_URL, performance_profile: bool = SQLITE_PERFORMANCE_PROFILE):
+    """创建基于aiosqlite的异步引擎，url使用同步驱动的写法即可"""
+    url = make_url(url).set(drivername="sqlite+aiosqlite")
+    pool_options = _pool_options(str(url))
+    if pool_options:
+        # aiosqlite访问文件数据库时默认不复用连接，这里改用连接池
+        pool_options["poolclass"] = AsyncAdaptedQueuePool
+    engine = create_async_engine(url, **pool_options)
+    if performance_profile:
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def begin_write_transaction(db: Session):
+    """
+    显式开始写事务，需要在事务中使用savepoint（db.begin_nested()）时在第一条写操作之前调用
+
+    pysqlite只在第一条INSERT/UPDATE/DELETE之前自动执行BEGIN，先执行的SAVEPOINT会成为最外层事务，
+    RELEASE时直接提交，之后的回滚不再生效。SQLite上执行BEGIN IMMEDIATE，同时提前拿到写锁。
+    """
+    connection = db.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
 
 # 创建SQLAlchemy引擎
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+engine = create_db_engine()
 
 # 创建会话类
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎和会话类，供异步接口使用
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # 创建Base类
 Base = declarative_base()
 
@@ -28,4 +88,10 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# 依赖项，用于获取异步数据库会话
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
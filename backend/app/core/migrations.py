@@ -0,0 +1,221 @@
+"""
+数据库结构迁移
+
+使用SQLite的PRAGMA user_version记录当前结构版本，启动时按顺序执行尚未应用的迁移步骤。
+新增迁移时在MIGRATIONS末尾追加函数，不要修改已发布的步骤。
+
+手动执行：python -m app.core.migrations
+检查重复的作业记录：python -m app.core.migrations --check
+备份并删除重复的作业记录后迁移：python -m app.core.migrations --dedupe
+"""
+import argparse
+import logging
+import warnings
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SAWarning
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.core.database import Base, engine
+from app.models import models
+from app.utils.aggregates import rebuild_stats
+
+logger = logging.getLogger(__name__)
+
+# 索引的checkfirst会反射records上的全部索引，表达式索引ux_records_natural_key无法反射，忽略对应的警告
+warnings.filterwarnings('ignore', message='Skipped unsupported reflection of expression-based index', category=SAWarning)
+
+
+def _create_tables(conn: Connection):
+    """版本1：创建基础数据表"""
+    Base.metadata.create_all(bind=conn, tables=[
+        models.Student.__table__,
+        models.Teacher.__table__,
+        models.Record.__table__
+    ])
+
+
+def _add_hot_path_indexes(conn: Connection):
+    """版本2：为汇总统计的筛选条件添加复合索引"""
+    for table in (models.Student.__table__, models.Record.__table__):
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+    conn.execute(text("ANALYZE"))
+
+
+def _create_daily_stats(conn: Connection):
+    """版本3：创建作业记录日汇总表并根据已有记录初始化"""
+    models.RecordDailyStat.__table__.create(bind=conn, checkfirst=True)
+    with Session(bind=conn) as db:
+        rebuild_stats(db)
+        db.flush()
+
+
+def _add_records_date_index(conn: Connection):
+    """版本4：为作业记录列表的游标分页添加日期索引"""
+    for index in models.Record.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+
+# 自然键重复的记录分组，每组保留ID最大（最后写入）的一条
+DUPLICATE_GROUPS_SQL = (
+    "SELECT student_id, subject, date, coalesce(batch, '') AS batch_key, "
+    "COUNT(*) AS record_count, MAX(id) AS kept_id, group_concat(id) AS ids, "
+    "group_concat(DISTINCT coalesce(type, '')) AS types "
+    "FROM records GROUP BY student_id, subject, date, coalesce(batch, '') HAVING COUNT(*) > 1"
+)
+
+# --dedupe删除的记录备份到这张表，kept_id为同一自然键下保留的记录
+DUPLICATES_BACKUP_TABLE = "records_duplicates_backup"
+
+
+class DuplicateRecordsError(RuntimeError):
+    """存在自然键重复的作业记录，无法添加唯一索引"""
+
+
+def find_duplicate_records(conn: Connection, sample_size: int = 20) -> Dict[str, Any]:
+    """统计自然键（学号、学科、日期、批次）重复的记录：重复的组数、多出的记录数和前sample_size组的明细"""
+    groups = conn.execute(text(
+        f"SELECT COUNT(*), coalesce(SUM(record_count - 1), 0) FROM ({DUPLICATE_GROUPS_SQL})"
+    )).one()
+    samples = conn.execute(text(
+        f"{DUPLICATE_GROUPS_SQL} ORDER BY student_id, subject, date LIMIT :limit"
+    ), {"limit": sample_size}).mappings().all()
+    return {"groups": groups[0], "extra": groups[1], "samples": [dict(sample) for sample in samples]}
+
+
+def format_duplicate_report(report: Dict[str, Any]) -> str:
+    lines = [f"发现 {report['groups']} 组学号、学科、日期、批次相同的作业记录，共多出 {report['extra']} 条："]
+    for sample in report["samples"]:
+        lines.append(
+            f"  学号 {sample['student_id']} 学科 {sample['subject']} 日期 {sample['date']} "
+            f"批次 {sample['batch_key'] or '（空）'}: ID {sample['ids']}，类型 {sample['types'] or '（空）'}"
+        )
+    if report["groups"] > len(report["samples"]):
+        lines.append(f"  ……其余 {report['groups'] - len(report['samples'])} 组未列出")
+    return "\n".join(lines)
+
+
+def dedupe_records(conn: Connection) -> int:
+    """
+    删除自然键重复的记录，每组只保留ID最大的一条，返回删除的记录数
+
+    被删除的记录先复制到records_duplicates_backup表，删除后重建日汇总表。这里直接在连接上执行SQL，
+    不会触发Session提交前递增版本号，需要自行递增作业记录和日汇总表的版本号，使客户端缓存的ETag失效
+    """
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {DUPLICATES_BACKUP_TABLE} ("
+        "id INTEGER NOT NULL, student_id VARCHAR NOT NULL, name VARCHAR NOT NULL, subject VARCHAR NOT NULL, "
+        "score FLOAT, type VARCHAR, date DATE NOT NULL, batch VARCHAR, teacher_id VARCHAR NOT NULL, "
+        "kept_id INTEGER NOT NULL, backed_up_at DATETIME NOT NULL)"
+    ))
+    conn.execute(text(
+        f"INSERT INTO {DUPLICATES_BACKUP_TABLE} "
+        "(id, student_id, name, subject, score, type, date, batch, teacher_id, kept_id, backed_up_at) "
+        "SELECT r.id, r.student_id, r.name, r.subject, r.score, r.type, r.date, r.batch, r.teacher_id, "
+        "d.kept_id, CURRENT_TIMESTAMP "
+        f"FROM records AS r JOIN ({DUPLICATE_GROUPS_SQL}) AS d "
+        "ON r.student_id = d.student_id AND r.subject = d.subject AND r.date = d.date "
+        "AND coalesce(r.batch, '') = d.batch_key AND r.id <> d.kept_id"
+    ))
+    removed = conn.execute(text(
+        "DELETE FROM records WHERE id NOT IN ("
+        "SELECT MAX(id) FROM records GROUP BY student_id, subject, date, coalesce(batch, ''))"
+    )).rowcount
+    if removed:
+        with Session(bind=conn) as db:
+            rebuild_stats(db)
+            db.flush()
+        # 版本6之前还没有版本号表
+        if inspect(conn).has_table(models.DataVersion.__tablename__):
+            conn.execute(
+                text("UPDATE data_versions SET version = version + 1 WHERE name IN (:records, :stats)"),
+                {"records": models.Record.__tablename__, "stats": models.STATS_VERSION}
+            )
+    return removed
+
+
+def _add_records_natural_key(conn: Connection):
+    """
+    版本5：为作业记录的(学号, 学科, 日期, 批次)添加唯一索引
+
+    已有重复记录时不做任何修改，抛出DuplicateRecordsError并列出重复的记录，由运维人员确认后
+    执行 python -m app.core.migrations --dedupe 备份并删除重复记录
+    """
+    report = find_duplicate_records(conn)
+    if report["groups"]:
+        raise DuplicateRecordsError(
+            f"{format_duplicate_report(report)}\n"
+            "无法添加唯一索引ux_records_natural_key。确认可以只保留每组ID最大的记录后，执行 "
+            f"python -m app.core.migrations --dedupe，被删除的记录会备份到{DUPLICATES_BACKUP_TABLE}表"
+        )
+    conn.execute(models.RECORD_NATURAL_KEY_INDEX)
+
+
+def _create_data_versions(conn: Connection):
+    """版本6：创建数据版本号表，版本号由Session在事务提交前递增（见models中的_bump_versions）"""
+    models.DataVersion.__table__.create(bind=conn, checkfirst=True)
+
+
+def _add_stats_version(conn: Connection):
+    """版本7：为日汇总表添加版本号，供成绩索引判断是否过期"""
+    conn.execute(
+        text("INSERT OR IGNORE INTO data_versions (name, version) VALUES (:name, 0)"),
+        {"name": models.STATS_VERSION}
+    )
+
+
+MIGRATIONS: List[Callable[[Connection], None]] = [
+    _create_tables,
+    _add_hot_path_indexes,
+    _create_daily_stats,
+    _add_records_date_index,
+    _add_records_natural_key,
+    _create_data_versions,
+    _add_stats_version,
+]
+
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+
+def run_migrations(bind: Engine = engine) -> int:
+    """执行所有未应用的迁移，返回迁移后的版本号"""
+    with bind.begin() as conn:
+        version = get_schema_version(conn)
+        for target, migration in enumerate(MIGRATIONS[version:], version + 1):
+            logger.info(f"执行数据库迁移: 版本 {target} ({migration.__name__})")
+            migration(conn)
+            conn.execute(text(f"PRAGMA user_version = {target}"))
+            version = target
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行数据库结构迁移")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--check", action="store_true", help="只列出学号、学科、日期、批次重复的作业记录，不做修改")
+    action.add_argument(
+        "--dedupe", action="store_true",
+        help=f"把重复的作业记录（每组保留ID最大的一条）备份到{DUPLICATES_BACKUP_TABLE}表并删除，然后执行迁移"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.check:
+        with engine.connect() as conn:
+            report = find_duplicate_records(conn)
+        print(format_duplicate_report(report) if report["groups"] else "没有重复的作业记录")
+        return
+    if args.dedupe:
+        with engine.begin() as conn:
+            removed = dedupe_records(conn)
+        print(f"删除了 {removed} 条重复的作业记录，已备份到{DUPLICATES_BACKUP_TABLE}表")
+    print(f"数据库结构版本: {run_migrations()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,37 @@
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+
+from app.core.config import COMPRESSION_ENABLED, IMPORT_MAX_UPLOAD_BYTES, METRICS_ENABLED, QUERY_DEBUG, THREADPOOL_SIZE
+from app.core.database import async_engine, engine
+from app.core.migrations import run_migrations
+from app.utils.cache import lookup_cache
+from app.utils.compression import CompressionMiddleware
+from app.utils.export_jobs import export_jobs
+from app.utils.metrics import CONTENT_TYPE, QUERY_HEADERS, MetricsMiddleware, instrument_engine, metrics
+from app.utils.score_index import score_index
+from app.utils.upload_limit import UploadLimitMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 同步接口运行在线程池中，线程数与数据库连接池大小保持一致
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # 启动时将已有的homework.db升级到最新结构
+    run_migrations()
+    yield
+    # 停止导出进程并清理未下载的导出文件
+    export_jobs.shutdown()
 
-app = FastAPI()
-from app.api import records, students, teachers
+
+app = FastAPI(lifespan=lifespan)
+from app.api import exports, records, students, teachers
+
+# 导入文件超过大小上限时在读取请求体之前（或读取过程中）返回413，放在CORS内层以便前端读取错误信息
+app.add_middleware(UploadLimitMiddleware, limits={'/records/import': IMPORT_MAX_UPLOAD_BYTES})
 
 # Configure CORS
 app.add_middleware(
@@ -11,10 +40,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 前端需要读取ETag以便发送条件请求
+    expose_headers=["ETag", *QUERY_HEADERS] if QUERY_DEBUG else ["ETag"],
 )
 
+# 压缩响应体，汇总接口返回的大JSON压缩后通常只有原来的十分之一左右
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# 按路由统计请求耗时、SQL耗时和响应大小，放在最外层以包含其他中间件的耗时；
+# 调试模式下同时统计每个请求的SQL语句数
+if METRICS_ENABLED or QUERY_DEBUG:
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    app.add_middleware(MetricsMiddleware, query_debug=QUERY_DEBUG)
+
 # Include routers with prefix
 app.include_router(records.router, prefix='/records')
 # app.include_router(records.router, prefix="/api")
 app.include_router(students.router, prefix='/students')
-app.include_router(teachers.router, prefix='/teachers')
\ No newline at end of file
+app.include_router(teachers.router, prefix='/teachers')
+app.include_router(exports.router, prefix='/exports')
+
+# 只读接口的异步版本
+app.include_router(records.async_router, prefix='/async/records')
+app.include_router(students.async_router, prefix='/async/students')
+app.include_router(teachers.async_router, prefix='/async/teachers')
+
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """查看下拉选项缓存的命中情况"""
+    return lookup_cache.stats()
+
+
+@app.get("/cache/score-index")
+def get_score_index_stats():
+    """查看成绩索引已构建的年级和命中情况"""
+    return score_index.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus格式的请求统计"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, CheckConstraint
-from sqlalchemy.orm import relationship
+from itertools import chain
+
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, CheckConstraint, Index, DDL, event, update
+from sqlalchemy.orm import Session, relationship
 
 from app.core.database import Base
 
@@ -7,6 +9,10 @@ from app.core.database import Base
 class Student(Base):
     """学生信息表"""
     __tablename__ = "stuInfo"
+    __table_args__ = (
+        # 按年级、班级、小组筛选学生
+        Index("ix_stuInfo_grade_class_group", "grade", "class_name", "group"),
+    )
 
     student_id = Column(String, primary_key=True, index=True, comment="学号")
     name = Column(String, nullable=False, comment="姓名")
@@ -34,6 +40,14 @@ class Teacher(Base):
 class Record(Base):
     """作业记录表"""
     __tablename__ = "records"
+    __table_args__ = (
+        # 按学科和日期范围统计，学号用于关联学生表
+        Index("ix_records_subject_date_student", "subject", "date", "student_id"),
+        # 从学生表关联作业记录并按日期范围筛选
+        Index("ix_records_student_date", "student_id", "date"),
+        # 作业记录列表按(日期, ID)游标分页
+        Index("ix_records_date", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True, comment="ID")
     student_id = Column(String, ForeignKey("stuInfo.student_id"), nullable=False, comment="学号")
@@ -48,4 +62,103 @@ class Record(Base):
     # 关系：多个作业记录对应一个学生
     student = relationship("Student", back_populates="records")
     # 关系：多个作业记录对应一个教师
-    teacher = relationship("Teacher", back_populates="records")
\ No newline at end of file
+    teacher = relationship("Teacher", back_populates="records")
+
+
+# 自然键：同一学生、学科、日期和批次只有一条记录（批次为空视为同一批次），导入时按此键更新。
+# SQLAlchemy无法反射表达式索引，index.create(checkfirst=True)对它无效，因此不放在__table_args__中，
+# 建表后以IF NOT EXISTS创建
+RECORD_NATURAL_KEY_INDEX_NAME = "ux_records_natural_key"
+RECORD_NATURAL_KEY_INDEX = DDL(
+    f"CREATE UNIQUE INDEX IF NOT EXISTS {RECORD_NATURAL_KEY_INDEX_NAME} "
+    "ON records (student_id, subject, date, coalesce(batch, ''))"
+)
+event.listen(Record.__table__, "after_create", RECORD_NATURAL_KEY_INDEX)
+
+
+class RecordDailyStat(Base):
+    """作业记录按学生、学科、日期汇总的统计表，随records的增删改同步维护"""
+    __tablename__ = "record_daily_stats"
+    __table_args__ = (
+        Index("ix_record_daily_stats_subject_date_student", "subject", "date", "student_id"),
+    )
+
+    student_id = Column(String, ForeignKey("stuInfo.student_id"), primary_key=True, comment="学号")
+    subject = Column(String, primary_key=True, comment="学科")
+    date = Column(Date, primary_key=True, comment="日期")
+    score_sum = Column(Float, nullable=False, default=0, comment="分数之和")
+    score_count = Column(Integer, nullable=False, default=0, comment="有分数的记录数")
+    record_count = Column(Integer, nullable=False, default=0, comment="记录总数")
+
+
+class DataVersion(Base):
+    """各数据表的写入版本号，每个写入该表的事务提交时递增一次，用于生成查询结果的ETag"""
+    __tablename__ = "data_versions"
+
+    name = Column(String, primary_key=True, comment="表名")
+    version = Column(Integer, nullable=False, default=0, comment="版本号")
+
+
+# 有版本号的表。日汇总表的版本号还供成绩索引判断本进程的增量能否直接应用
+VERSIONED_TABLES = (Student.__tablename__, Teacher.__tablename__, Record.__tablename__)
+STATS_VERSION = RecordDailyStat.__tablename__
+event.listen(DataVersion.__table__, "after_create", DDL(
+    "INSERT OR IGNORE INTO data_versions (name, version) VALUES "
+    + ", ".join(f"('{name}', 0)" for name in (*VERSIONED_TABLES, STATS_VERSION))
+))
+
+# 版本号由Session维护：刷新的ORM对象和Session.execute执行的INSERT/UPDATE/DELETE涉及有版本号的表时记下表名，
+# 事务提交前用一条UPDATE把这些表的版本号各加一，与写入的行数无关。不经过Session直接执行的SQL不会改变版本号
+_TRACKED_TABLES = frozenset((*VERSIONED_TABLES, STATS_VERSION))
+WRITTEN_TABLES_KEY = "data_versions_written"
+# 最近一次提交后各表的版本号，供after_commit中的成绩索引读取
+COMMITTED_VERSIONS_KEY = "data_versions_committed"
+
+
+def mark_written(session: Session, *names: str):
+    """记下本事务写入的表，提交时递增它们的版本号"""
+    session.info.setdefault(WRITTEN_TABLES_KEY, set()).update(names)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session: Session, flush_context):
+    names = {getattr(obj, "__tablename__", None) for obj in chain(session.new, session.dirty, session.deleted)}
+    if names & _TRACKED_TABLES:
+        mark_written(session, *(names & _TRACKED_TABLES))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_dml(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        name = getattr(getattr(state.statement, "table", None), "name", None)
+        if name in _TRACKED_TABLES:
+            mark_written(state.session, name)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_versions(session: Session):
+    # savepoint提交时也会触发，只在最外层事务提交时递增
+    if session.in_nested_transaction():
+        return
+    # before_commit在提交前的flush之前触发，先flush才能记下待写入的ORM对象
+    session.flush()
+    names = session.info.pop(WRITTEN_TABLES_KEY, None)
+    if not names:
+        session.info.pop(COMMITTED_VERSIONS_KEY, None)
+        return
+    # 与写入处于同一个事务，提交前不会有其他写入，返回的就是提交后的版本号
+    table = DataVersion.__table__
+    session.info[COMMITTED_VERSIONS_KEY] = dict(session.execute(
+        update(table)
+        .where(table.c.name.in_(sorted(names)))
+        .values(version=table.c.version + 1)
+        .returning(table.c.name, table.c.version)
+    ).all())
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_written(session: Session, previous_transaction):
+    # savepoint回滚后多递增一次版本号没有影响，只在整个事务回滚时清除
+    if not previous_transaction.nested:
+        session.info.pop(WRITTEN_TABLES_KEY, None)
+        session.info.pop(COMMITTED_VERSIONS_KEY, None)
@@ -1,8 +1,10 @@
-from datetime import date as date_type
-from typing import List, Optional, TypeVar, Generic
+from datetime import date as date_type, datetime
+from typing import Any, Dict, List, Literal, Optional, TypeVar, Generic
 
 import pydantic
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from app.core.config import SUMMARY_MAX_PAGE_SIZE
 
 
 # 学生模式
@@ -70,6 +72,46 @@ class ExcelImportResponse(BaseModel):
     success: bool
     message: str
     imported_count: Optional[int] = None
+    failed_records: Optional[List[Dict[str, Any]]] = None
+    processed_count: Optional[int] = None
+    failed_chunks: Optional[int] = None
+    # 按学号、学科、日期、批次匹配已有记录：新增、更新和内容未变化的行数
+    inserted_count: Optional[int] = None
+    updated_count: Optional[int] = None
+    unchanged_count: Optional[int] = None
+
+
+# 导入进度
+class ImportProgress(BaseModel):
+    import_id: str
+    filename: Optional[str] = None
+    status: str  # running / done / failed
+    message: Optional[str] = None
+    processed_count: int
+    total_count: Optional[int] = None
+    imported_count: int
+    inserted_count: int = 0
+    updated_count: int = 0
+    unchanged_count: int = 0
+    failed_count: int
+    failed_chunks: int
+    bytes_read: int
+    total_bytes: Optional[int] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+# 后台导出任务状态
+class ExportJobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str  # pending / running / done / failed
+    filename: str
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
+    download_url: Optional[str] = None
 
 
 # 用于Excel导出的模式
@@ -106,6 +148,61 @@ class RecordFilter(BaseModel):
         return v
 
 
+# 批量增删改作业记录的模式
+class RecordBulkCreate(BaseModel):
+    records: List[RecordCreate]
+
+
+class RecordPatch(BaseModel):
+    """只更新请求中给出的字段"""
+    id: int
+    student_id: Optional[str] = None
+    name: Optional[str] = None
+    subject: Optional[str] = None
+    score: Optional[float] = None
+    type: Optional[str] = None
+    date: Optional[date_type] = None
+    batch: Optional[str] = None
+    teacher_id: Optional[str] = None
+
+
+class RecordBulkUpdate(BaseModel):
+    records: List[RecordPatch]
+
+
+class RecordBulkDelete(BaseModel):
+    """按ID列表或筛选条件删除，二者只能给出一个"""
+    ids: Optional[List[int]] = None
+    filter: Optional[RecordFilter] = None
+
+
+class RecordBulkResult(BaseModel):
+    index: int  # 在请求列表中的位置
+    id: Optional[int] = None
+    success: bool
+    error: Optional[str] = None
+    status: Optional[str] = None  # 批量新增时：inserted / updated / unchanged
+
+
+class RecordBulkResponse(BaseModel):
+    success: bool
+    message: str
+    succeeded: int
+    failed: int
+    results: List[RecordBulkResult]
+
+
+# 成绩汇总的排序和分页参数（查询参数）
+class SummaryPage(BaseModel):
+    sort_by: Literal['student_id', 'class_name', 'group', 'total_score'] = 'student_id'
+    order: Literal['asc', 'desc'] = 'asc'
+    # 给出limit或cursor时分页返回，cursor为上一页返回的next_cursor，优先于offset
+    limit: Optional[int] = Field(None, ge=1, le=SUMMARY_MAX_PAGE_SIZE)
+    offset: int = Field(0, ge=0)
+    cursor: Optional[str] = None
+    with_total: bool = False
+
+
 # 用于汇总的学生成绩模式
 class StudentScoreSummary(BaseModel):
     id: int
@@ -132,12 +229,36 @@ class SubjectScoreSummary(BaseModel):
     # 动态字段（不同日期的分数）将在运行时添加
 
 
+# 学生在班级和年级内的排名
+class StudentRanking(BaseModel):
+    student_id: str
+    name: str
+    grade: str
+    class_name: str
+    group: Optional[str] = None
+    total_score: float
+    # 名次按总分从高到低，总分相同的名次相同；百分位为总分低于该学生的人数占其余人数的比例（0~1）
+    class_rank: int
+    class_size: int
+    class_percentile: float
+    grade_rank: int
+    grade_size: int
+    grade_percentile: float
+
+
 # 用于泛型的类型变量
 T = TypeVar('T')
 
 # 分页响应模式
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: Optional[int] = None
     page: int
-    page_size: int
\ No newline at end of file
+    page_size: int
+    next_cursor: Optional[str] = None
+
+# 游标分页响应模式，total仅在请求with_total时返回
+class CursorPage(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
\ No newline at end of file
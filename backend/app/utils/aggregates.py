@@ -0,0 +1,142 @@
+"""
+作业记录日汇总表（record_daily_stats）的维护
+
+所有写入records的路径都需要在同一事务中调用apply_stats_deltas，保证汇总表与明细一致。
+增量同时记在会话上，提交后应用到成绩索引（app.utils.score_index）。
+
+命令行：
+    python -m app.utils.aggregates rebuild   # 根据records重建汇总表
+    python -m app.utils.aggregates check     # 检查汇总表与records是否一致
+"""
+import sys
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.models import Record, RecordDailyStat
+from app.utils.score_index import record_index_deltas, record_index_rebuilt
+
+STAT_KEYS = ('student_id', 'subject', 'date')
+
+stats_table = RecordDailyStat.__table__
+
+
+def record_stats_deltas(records: Iterable[Mapping[str, Any]], sign: int = 1) -> List[Dict[str, Any]]:
+    """
+    把作业记录转换成汇总表增量，sign为-1表示删除这些记录
+
+    records中的元素需要包含student_id、subject、date、score
+    """
+    totals: Dict[Tuple, List[float]] = defaultdict(lambda: [0.0, 0, 0])
+    for record in records:
+        total = totals[tuple(record[key] for key in STAT_KEYS)]
+        score = record.get('score')
+        if score is not None:
+            total[0] += sign * score
+            total[1] += sign
+        total[2] += sign
+    return [
+        dict(zip(STAT_KEYS, key), score_sum=score_sum, score_count=score_count, record_count=record_count)
+        for key, (score_sum, score_count, record_count) in totals.items()
+    ]
+
+
+def apply_stats_deltas(db: Session, deltas: List[Dict[str, Any]]):
+    """把增量累加到汇总表，记录数归零的行会被删除，不提交事务"""
+    if not deltas:
+        return
+    stmt = sqlite_insert(stats_table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(STAT_KEYS),
+        set_={
+            'score_sum': stats_table.c.score_sum + stmt.excluded.score_sum,
+            'score_count': stats_table.c.score_count + stmt.excluded.score_count,
+            'record_count': stats_table.c.record_count + stmt.excluded.record_count,
+        }
+    )
+    db.execute(stmt, deltas)
+    record_index_deltas(db, deltas)
+
+    removed = [tuple(d[key] for key in STAT_KEYS) for d in deltas if d['record_count'] < 0]
+    if removed:
+        db.execute(
+            delete(stats_table)
+            .where(tuple_(*[stats_table.c[key] for key in STAT_KEYS]).in_(removed))
+            .where(stats_table.c.record_count <= 0)
+        )
+
+
+def _stats_from_records():
+    """直接从records计算的汇总结果"""
+    return select(
+        Record.student_id,
+        Record.subject,
+        Record.date,
+        func.coalesce(func.sum(Record.score), 0).label('score_sum'),
+        func.count(Record.score).label('score_count'),
+        func.count().label('record_count')
+    ).group_by(Record.student_id, Record.subject, Record.date)
+
+
+def rebuild_stats(db: Session) -> int:
+    """清空并根据records重建汇总表，返回汇总行数，不提交事务"""
+    db.execute(delete(stats_table))
+    record_index_rebuilt(db)
+    db.execute(insert(stats_table).from_select(
+        ['student_id', 'subject', 'date', 'score_sum', 'score_count', 'record_count'],
+        _stats_from_records()
+    ))
+    return db.execute(select(func.count()).select_from(stats_table)).scalar()
+
+
+def check_stats(db: Session, tolerance: float = 1e-6) -> List[Dict[str, Any]]:
+    """比较汇总表和records的实时统计结果，返回不一致的行"""
+    expected = {tuple(r[:3]): tuple(r[3:]) for r in db.execute(_stats_from_records())}
+    actual = {
+        tuple(r[:3]): tuple(r[3:])
+        for r in db.execute(select(
+            stats_table.c.student_id, stats_table.c.subject, stats_table.c.date,
+            stats_table.c.score_sum, stats_table.c.score_count, stats_table.c.record_count
+        ))
+    }
+    mismatches = []
+    for key in expected.keys() | actual.keys():
+        exp, act = expected.get(key), actual.get(key)
+        if exp is not None and act is not None and abs(exp[0] - act[0]) <= tolerance and exp[1:] == act[1:]:
+            continue
+        mismatches.append({**dict(zip(STAT_KEYS, key)), "expected": exp, "actual": act})
+    return mismatches
+
+
+def stat_score_column():
+    """汇总行对应的分数，没有有效分数时为NULL"""
+    return case((RecordDailyStat.score_count > 0, RecordDailyStat.score_sum), else_=None)
+
+
+def main(argv: List[str]) -> int:
+    command = argv[0] if argv else 'check'
+    db = SessionLocal()
+    try:
+        if command == 'rebuild':
+            count = rebuild_stats(db)
+            db.commit()
+            print(f"汇总表重建完成，共 {count} 行")
+            return 0
+        if command == 'check':
+            mismatches = check_stats(db)
+            for mismatch in mismatches[:50]:
+                print(mismatch)
+            print(f"不一致的行数: {len(mismatches)}")
+            return 1 if mismatches else 0
+        print(f"未知命令: {command}，可用命令: rebuild, check")
+        return 2
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
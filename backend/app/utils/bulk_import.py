@@ -0,0 +1,298 @@
+import codecs
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import IMPORT_CHUNK_SIZE, IMPORT_COMMIT_ROWS
+from app.core.database import begin_write_transaction
+from app.models.models import Student, Teacher
+from app.utils.bulk_records import CONFLICT_ERROR, WriteMode, write_records
+
+logger = logging.getLogger(__name__)
+
+# 导入文件必须包含的列
+REQUIRED_COLUMNS = ['学号', '姓名', '学科', '日期', '教师ID']
+
+# 与文件中后面的行自然键相同时的失败原因
+DUPLICATE_REASON = "与后面的行重复（学号、学科、日期、批次相同），以后面的行为准"
+# 写入结果中算作失败的outcome及失败原因
+OUTCOME_REASONS = {'duplicate': DUPLICATE_REASON, 'conflict': CONFLICT_ERROR}
+
+# Excel列名与records表字段的对应关系
+COLUMN_MAPPING = {
+    '学号': 'student_id',
+    '姓名': 'name',
+    '学科': 'subject',
+    '分数': 'score',
+    '类型': 'type',
+    '日期': 'date',
+    '批次': 'batch',
+    '教师ID': 'teacher_id'
+}
+
+
+def _normalize_text(series: pd.Series) -> pd.Series:
+    """将列统一转换为字符串，空值保持为None（Excel中的数字学号会被读成10001.0）"""
+    def convert(value):
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return None
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        text = str(value).strip()
+        return text or None
+    return series.map(convert).astype(object)
+
+
+def _parse_dates(series: pd.Series) -> pd.Series:
+    """
+    解析日期列，无法解析的为NaT
+
+    不指定format时pandas按第一个值推断格式，其余格式不同的值（如2025-01-05和2025/1/5混用）都会变成NaT。
+    先按ISO格式向量化解析，剩下的值再用format='mixed'逐个解析
+    """
+    dates = pd.to_datetime(series, format='ISO8601', errors='coerce')
+    retry = dates.isna() & series.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(series[retry].astype(str), format='mixed', errors='coerce')
+    return dates
+
+
+def load_known_ids(db: Session) -> Tuple[Set[str], Set[str]]:
+    """一次性加载全部学号和教师ID，用于批量校验外键"""
+    student_ids = set(db.execute(select(Student.student_id)).scalars().all())
+    teacher_ids = set(db.execute(select(Teacher.teacher_id)).scalars().all())
+    return student_ids, teacher_ids
+
+
+def validate_records_frame(
+    df: pd.DataFrame,
+    student_ids: Set[str],
+    teacher_ids: Set[str],
+    first_row: int = 2
+) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    对整张表做向量化校验，返回可写入的记录和失败记录列表
+
+    失败记录中的行号对应文件中的行号，first_row为df第一行的行号（表头为第1行）
+    """
+    frame = pd.DataFrame(index=df.index)
+    for column in ['学号', '姓名', '学科', '教师ID', '类型', '批次']:
+        if column in df.columns:
+            frame[COLUMN_MAPPING[column]] = _normalize_text(df[column])
+        else:
+            frame[COLUMN_MAPPING[column]] = None
+
+    frame['date'] = _parse_dates(df['日期']).dt.date
+    if '分数' in df.columns:
+        frame['score'] = pd.to_numeric(df['分数'], errors='coerce')
+        invalid_score = frame['score'].isna() & df['分数'].notna()
+    else:
+        frame['score'] = float('nan')
+        invalid_score = pd.Series(False, index=df.index)
+
+    # 每一行只记录第一个失败原因，校验顺序与逐行导入时保持一致
+    reasons = pd.Series(None, index=df.index, dtype=object)
+    checks = [
+        (frame[['student_id', 'name', 'subject', 'teacher_id']].isna().any(axis=1), "缺少必要字段"),
+        (frame['date'].isna(), "日期格式无效"),
+        (invalid_score, "分数格式无效"),
+        (~frame['student_id'].isin(student_ids), "学生不存在"),
+        (~frame['teacher_id'].isin(teacher_ids), "教师不存在"),
+    ]
+    for mask, reason in checks:
+        reasons = reasons.mask(mask & reasons.isna(), reason)
+
+    failed_mask = reasons.notna()
+    failed_records = [
+        {"行号": int(position) + first_row, "学号": student_id, "原因": reason}
+        for position, student_id, reason in zip(
+            pd.RangeIndex(len(df))[failed_mask.to_numpy()],
+            frame.loc[failed_mask, 'student_id'],
+            reasons[failed_mask]
+        )
+    ]
+
+    valid = frame.loc[~failed_mask, list(COLUMN_MAPPING.values())]
+    valid = valid.astype(object).where(valid.notna(), None)
+    return valid, failed_records
+
+
+def write_frame(
+    db: Session,
+    valid: pd.DataFrame,
+    mode: WriteMode = 'insert',
+    chunk_size: int = IMPORT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """写入校验通过的记录并更新汇总表，不提交事务，返回write_records的结果"""
+    # valid的列都是object类型，逐行zip比to_dict('records')逐个装箱快得多
+    columns = list(valid.columns)
+    rows = [dict(zip(columns, row)) for row in valid.itertuples(index=False, name=None)]
+    return write_records(db, rows, mode, chunk_size)
+
+
+def _row_failures(
+    df: pd.DataFrame,
+    valid: pd.DataFrame,
+    first_row: int,
+    outcomes: Optional[List[str]] = None,
+    reason: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    valid中的行对应的失败记录
+
+    给出outcomes时只取其中失败（duplicate、conflict）的行，原因见OUTCOME_REASONS；否则全部行以reason失败
+    """
+    row_numbers = df.index.get_indexer(valid.index) + first_row
+    reasons = [OUTCOME_REASONS.get(outcome) for outcome in outcomes] if outcomes is not None else [reason] * len(valid)
+    return [
+        {"行号": int(row_number), "学号": student_id, "原因": row_reason}
+        for row_number, student_id, row_reason in zip(row_numbers, valid['student_id'], reasons)
+        if row_reason
+    ]
+
+
+def bulk_import_records(
+    db: Session,
+    df: pd.DataFrame,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    mode: WriteMode = 'insert'
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    批量导入作业记录，学号、学科、日期、批次相同的记录已存在时insert模式计为失败，upsert模式更新已有记录
+
+    返回成功导入（新增、更新和内容未变化）的记录数和失败记录列表，事务由调用方提交
+    """
+    student_ids, teacher_ids = load_known_ids(db)
+    valid, failed_records = validate_records_frame(df, student_ids, teacher_ids)
+    written = write_frame(db, valid, mode, chunk_size)
+    failed_records.extend(_row_failures(df, valid, 2, written['outcomes']))
+    failed_records.sort(key=lambda record: record["行号"])
+    return written['inserted'] + written['updated'] + written['unchanged'], failed_records
+
+
+def detect_csv_encoding(fileobj, sample_size: int = 64 * 1024) -> str:
+    """根据文件开头判断CSV编码：UTF-8（可带BOM），否则按GB18030读取（中文Windows下Excel另存的CSV）"""
+    position = fileobj.tell()
+    sample = fileobj.read(sample_size)
+    fileobj.seek(position)
+    try:
+        # final=False：采样末尾被截断的多字节字符不算错误
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return 'gb18030'
+    return 'utf-8-sig'
+
+
+def read_csv_chunks(fileobj, chunk_rows: int = IMPORT_COMMIT_ROWS) -> Iterator[pd.DataFrame]:
+    """按固定行数分块读取CSV，全部列按文本读取，学号等不会被转换成数字"""
+    return iter(pd.read_csv(fileobj, chunksize=chunk_rows, dtype=str, encoding=detect_csv_encoding(fileobj)))
+
+
+def read_xlsx_chunks(sheet, chunk_rows: int = IMPORT_COMMIT_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    逐行读取openpyxl只读模式打开的工作表，第一行为表头，每chunk_rows行生成一个DataFrame
+
+    中间的空行照常返回以保持行号，表末尾的空行丢弃（只读模式下工作表记录的范围可能比实际数据大），
+    与pd.read_excel的结果一致。表中只有表头时返回一个空表以便检查表头。
+    """
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = [str(value).strip() if value is not None else f"Unnamed: {i}" for i, value in enumerate(header)]
+    width = len(columns)
+    empty_row = (None,) * width
+    buffer: List[tuple] = []
+    blank_rows = 0
+    yielded = False
+    for row in rows:
+        if all(value is None for value in row):
+            blank_rows += 1
+            continue
+        buffer.extend([empty_row] * blank_rows)
+        blank_rows = 0
+        buffer.append(tuple(row[:width]) + (None,) * (width - len(row)))
+        if len(buffer) >= chunk_rows:
+            yield pd.DataFrame(buffer, columns=columns)
+            yielded = True
+            buffer = []
+    if buffer or not yielded:
+        yield pd.DataFrame(buffer, columns=columns)
+
+
+def iter_frame_chunks(df: pd.DataFrame, chunk_rows: int = IMPORT_COMMIT_ROWS) -> Iterator[pd.DataFrame]:
+    """把已读入的整张表按行切块，空表也返回一块以便检查表头"""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def import_record_chunks(
+    db: Session,
+    chunks: Iterable[pd.DataFrame],
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    mode: WriteMode = 'insert'
+) -> Dict[str, Any]:
+    """
+    逐块校验并写入作业记录，每块在独立的写事务中执行并提交，mode的含义同write_records
+
+    每块提交后即持久化，块与块之间释放SQLite的写锁，其他请求可以在导入期间写入。某块写入数据库失败时
+    只回滚该块，块内通过校验的行计入失败记录，之后的块继续导入；读取文件出错（如CSV格式错误）时停止，
+    已提交的块保留，错误信息放在结果的error中。每提交（或回滚）一块调用一次on_progress(result)。
+    调用时会话中不能有未提交的写入。
+    """
+    student_ids, teacher_ids = load_known_ids(db)
+    result: Dict[str, Any] = {
+        "processed_count": 0,
+        "imported_count": 0,
+        "inserted_count": 0,
+        "updated_count": 0,
+        "unchanged_count": 0,
+        "failed_records": [],
+        "failed_chunks": 0,
+        "error": None
+    }
+    chunks = iter(chunks)
+    while True:
+        try:
+            chunk = next(chunks, None)
+        except (ValueError, UnicodeDecodeError) as e:
+            # pandas的ParserError是ValueError的子类
+            first_row = result["processed_count"] + 2
+            logger.error(f"读取导入文件失败（第 {first_row} 行之后）: {str(e)}")
+            result["error"] = f"读取文件失败（第 {first_row} 行之后）: {str(e)}"
+            break
+        if chunk is None:
+            break
+
+        first_row = result["processed_count"] + 2
+        valid, failed_records = validate_records_frame(chunk, student_ids, teacher_ids, first_row)
+        try:
+            begin_write_transaction(db)
+            written = write_frame(db, valid, mode, chunk_size)
+            db.commit()
+            failed_records.extend(_row_failures(chunk, valid, first_row, written['outcomes']))
+            for outcome in ('inserted', 'updated', 'unchanged'):
+                result[f"{outcome}_count"] += written[outcome]
+                result["imported_count"] += written[outcome]
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"导入第 {first_row} 至 {first_row + len(chunk) - 1} 行失败，已回滚该块: {str(e)}")
+            result["failed_chunks"] += 1
+            failed_records.extend(_row_failures(chunk, valid, first_row, reason="写入数据库失败"))
+
+        failed_records.sort(key=lambda record: record["行号"])
+        result["failed_records"].extend(failed_records)
+        result["processed_count"] += len(chunk)
+        logger.info(
+            f"已处理 {result['processed_count']} 行，新增 {result['inserted_count']} 条，"
+            f"更新 {result['updated_count']} 条，未变化 {result['unchanged_count']} 条，"
+            f"失败 {len(result['failed_records'])} 条"
+        )
+        if on_progress:
+            on_progress(result)
+    return result
@@ -0,0 +1,326 @@
+"""
+作业记录的批量新增、修改和删除
+
+外键一次性按IN查询校验，写入使用Core的executemany和DELETE ... WHERE id IN，汇总表增量合并后
+一次写入。每个函数返回与输入顺序一致的逐行结果，无效的行跳过不写入，事务由调用方提交。
+
+新增默认只插入新记录，自然键（学号、学科、日期、批次）已存在的行作为冲突返回，不修改已有记录；
+调用方显式选择upsert模式时执行INSERT ... ON CONFLICT DO UPDATE，重复提交同一条记录时更新已有记录，
+内容没有变化的行不写入。
+"""
+import json
+from typing import Any, Dict, Iterable, List, Literal, Mapping, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, bindparam, delete, func, literal_column, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import IMPORT_CHUNK_SIZE
+from app.models.models import Record, Student, Teacher
+from app.utils.aggregates import apply_stats_deltas, record_stats_deltas
+
+records_table = Record.__table__
+
+# 每条IN查询的参数个数，低于旧版SQLite单条语句999个参数的上限
+IN_CHUNK_SIZE = 900
+
+# 记录的全部可写字段
+RECORD_FIELDS = ('student_id', 'name', 'subject', 'score', 'type', 'date', 'batch', 'teacher_id')
+# 不允许为空的字段
+REQUIRED_FIELDS = ('student_id', 'name', 'subject', 'date', 'teacher_id')
+# 自然键，批次为空和空字符串视为相同
+NATURAL_KEY = ('student_id', 'subject', 'date', 'batch')
+# 按自然键更新已有记录时覆盖的字段
+UPSERT_FIELDS = ('name', 'score', 'type', 'teacher_id')
+# ON CONFLICT的目标必须与唯一索引ux_records_natural_key的定义完全一致
+NATURAL_KEY_ELEMENTS = [
+    records_table.c.student_id, records_table.c.subject, records_table.c.date, text("coalesce(batch, '')")
+]
+
+# 新增记录的写入模式：insert只插入新记录，upsert按自然键更新已有记录
+WriteMode = Literal['insert', 'upsert']
+# insert模式下自然键已存在（或与同一批中前面的行相同）时的错误信息
+CONFLICT_ERROR = "已存在学号、学科、日期、批次相同的记录，未覆盖"
+
+
+def _chunks(values: Sequence[Any], size: int = IN_CHUNK_SIZE) -> Iterable[Sequence[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _existing(db: Session, column, values: Iterable[Any]) -> Set[Any]:
+    """values中在column里存在的取值"""
+    values = list(set(values))
+    found = set()
+    for chunk in _chunks(values):
+        found.update(db.execute(select(column).where(column.in_(chunk))).scalars().all())
+    return found
+
+
+def _load_records(db: Session, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """按ID加载记录的全部字段"""
+    ids = list(set(ids))
+    rows = {}
+    for chunk in _chunks(ids):
+        for row in db.execute(select(records_table).where(records_table.c.id.in_(chunk))).mappings():
+            rows[row['id']] = dict(row)
+    return rows
+
+
+def natural_key(row: Mapping[str, Any]) -> Tuple:
+    return row['student_id'], row['subject'], row['date'], row.get('batch') or ''
+
+
+def _natural_key_lookup():
+    """
+    按自然键批量查询记录的语句，键以JSON数组通过一个参数传入，用json_each展开后逐个走唯一索引
+
+    SQLite对(a, b, c, d) IN ((...), ...)形式的行值列表会扫描全表；表达式和JSON路径写成字面量，
+    coalesce(batch, '')才能与索引定义匹配
+    """
+    keys = func.json_each(bindparam('keys')).table_valued('value', name='keys')
+
+    def part(position: int):
+        return func.json_extract(keys.c.value, literal_column(f"'$[{position}]'"))
+
+    return select(records_table).join(keys, and_(
+        records_table.c.student_id == part(0),
+        records_table.c.subject == part(1),
+        records_table.c.date == part(2),
+        func.coalesce(records_table.c.batch, literal_column("''")) == part(3)
+    ))
+
+
+NATURAL_KEY_LOOKUP = _natural_key_lookup()
+
+
+def _load_by_natural_keys(db: Session, keys: Iterable[Tuple]) -> Dict[Tuple, Dict[str, Any]]:
+    """按自然键加载已有记录"""
+    payload = json.dumps(
+        [[student_id, subject, record_date.isoformat(), batch] for student_id, subject, record_date, batch in keys],
+        ensure_ascii=False
+    )
+    result = db.execute(NATURAL_KEY_LOOKUP, {"keys": payload})
+    columns = list(result.keys())
+    rows = (dict(zip(columns, row)) for row in result)
+    return {natural_key(row): row for row in rows}
+
+
+def upsert_records(db: Session, rows: List[Dict[str, Any]], chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    按自然键写入记录：不存在的新增，已存在且字段有变化的更新，完全相同的跳过，并维护日汇总表
+
+    rows中自然键重复的行以最后一行为准。返回与rows顺序一致的ids和outcomes（inserted、updated、
+    unchanged，被后面的行覆盖的为duplicate，ID为None），以及inserted、updated、unchanged行数
+    """
+    last: Dict[Tuple, int] = {}
+    for index, row in enumerate(rows):
+        last[natural_key(row)] = index
+    existing = _load_by_natural_keys(db, last)
+
+    ids: List[Optional[int]] = [None] * len(rows)
+    outcomes = ['duplicate'] * len(rows)
+    writes, old_rows = [], []
+    for key, index in last.items():
+        row = rows[index]
+        old = existing.get(key)
+        if old is None:
+            outcomes[index] = 'inserted'
+        elif any(old[field] != row.get(field) for field in UPSERT_FIELDS):
+            outcomes[index] = 'updated'
+            old_rows.append(old)
+        else:
+            outcomes[index] = 'unchanged'
+            ids[index] = old['id']
+            continue
+        writes.append({field: row.get(field) for field in RECORD_FIELDS})
+
+    if writes:
+        stmt = sqlite_insert(records_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=NATURAL_KEY_ELEMENTS,
+            set_={field: stmt.excluded[field] for field in UPSERT_FIELDS}
+        ).returning(records_table.c.id, *(records_table.c[field] for field in NATURAL_KEY))
+        written = {}
+        for start in range(0, len(writes), chunk_size):
+            for row in db.execute(stmt, writes[start:start + chunk_size]).mappings():
+                written[natural_key(row)] = row['id']
+        for key, index in last.items():
+            ids[index] = written.get(key, ids[index])
+        apply_stats_deltas(db, record_stats_deltas(old_rows, sign=-1) + record_stats_deltas(writes))
+
+    return {
+        "ids": ids,
+        "outcomes": outcomes,
+        "inserted": outcomes.count('inserted'),
+        "updated": outcomes.count('updated'),
+        "unchanged": outcomes.count('unchanged'),
+        "conflict": 0
+    }
+
+
+def insert_records(db: Session, rows: List[Dict[str, Any]], chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    只插入自然键不存在的记录并维护日汇总表，已有记录不修改
+
+    执行INSERT ... ON CONFLICT DO NOTHING，自然键已存在的行和与同一批中前面的行自然键相同的行
+    outcome为conflict，ID为None。返回值的结构与upsert_records相同，另有conflict行数
+    """
+    first: Dict[Tuple, int] = {}
+    for index, row in enumerate(rows):
+        first.setdefault(natural_key(row), index)
+
+    ids: List[Optional[int]] = [None] * len(rows)
+    outcomes = ['conflict'] * len(rows)
+    writes = [{field: rows[index].get(field) for field in RECORD_FIELDS} for index in first.values()]
+    if writes:
+        stmt = sqlite_insert(records_table).on_conflict_do_nothing(
+            index_elements=NATURAL_KEY_ELEMENTS
+        ).returning(records_table.c.id, *(records_table.c[field] for field in NATURAL_KEY))
+        written = {}
+        for start in range(0, len(writes), chunk_size):
+            for row in db.execute(stmt, writes[start:start + chunk_size]).mappings():
+                written[natural_key(row)] = row['id']
+        for key, index in first.items():
+            if key in written:
+                ids[index], outcomes[index] = written[key], 'inserted'
+        apply_stats_deltas(db, record_stats_deltas([
+            write for write, index in zip(writes, first.values()) if outcomes[index] == 'inserted'
+        ]))
+
+    return {
+        "ids": ids,
+        "outcomes": outcomes,
+        "inserted": outcomes.count('inserted'),
+        "updated": 0,
+        "unchanged": 0,
+        "conflict": outcomes.count('conflict')
+    }
+
+
+def write_records(
+    db: Session,
+    rows: List[Dict[str, Any]],
+    mode: WriteMode = 'insert',
+    chunk_size: int = IMPORT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """按mode调用insert_records或upsert_records"""
+    if mode == 'upsert':
+        return upsert_records(db, rows, chunk_size)
+    return insert_records(db, rows, chunk_size)
+
+
+def _result(index: int, id: Optional[int] = None, error: Optional[str] = None) -> Dict[str, Any]:
+    return {"index": index, "id": id, "success": error is None, "error": error, "status": None}
+
+
+def _foreign_key_error(row: Mapping[str, Any], student_ids: Set[str], teacher_ids: Set[str]) -> Optional[str]:
+    if row['student_id'] not in student_ids:
+        return f"学生ID {row['student_id']} 不存在"
+    if row['teacher_id'] not in teacher_ids:
+        return f"教师ID {row['teacher_id']} 不存在"
+    return None
+
+
+def bulk_create_records(db: Session, records: List[Dict[str, Any]], mode: WriteMode = 'insert') -> List[Dict[str, Any]]:
+    """
+    批量写入记录，成功的行返回记录ID和status（inserted、updated、unchanged）
+
+    insert模式下自然键已存在的行失败，upsert模式下更新已有记录
+    """
+    student_ids = _existing(db, Student.student_id, (r['student_id'] for r in records))
+    teacher_ids = _existing(db, Teacher.teacher_id, (r['teacher_id'] for r in records))
+
+    results = [_result(index, error=_foreign_key_error(r, student_ids, teacher_ids)) for index, r in enumerate(records)]
+    valid = [result['index'] for result in results if result['success']]
+    if valid:
+        written = write_records(db, [records[index] for index in valid], mode)
+        for index, id, outcome in zip(valid, written['ids'], written['outcomes']):
+            if outcome == 'conflict':
+                results[index].update(success=False, error=CONFLICT_ERROR)
+            elif outcome == 'duplicate':
+                results[index].update(success=False, error="与后面的记录重复（学号、学科、日期、批次相同），以后面的为准")
+            else:
+                results[index].update(id=id, status=outcome)
+    return results
+
+
+def bulk_update_records(db: Session, patches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    批量修改记录，patches中每项包含id和需要修改的字段
+
+    同一批中修改的字段相同的行合并为一次executemany；绑定参数加下划线前缀，避免与SET子句自动生成的参数重名
+    """
+    existing = _load_records(db, (p['id'] for p in patches))
+    student_ids = _existing(db, Student.student_id, (p['student_id'] for p in patches if p.get('student_id')))
+    teacher_ids = _existing(db, Teacher.teacher_id, (p['teacher_id'] for p in patches if p.get('teacher_id')))
+
+    results = []
+    old_rows, new_rows = [], []
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    seen: Set[int] = set()
+    for index, patch in enumerate(patches):
+        id = patch['id']
+        changes = {key: value for key, value in patch.items() if key in RECORD_FIELDS}
+        old = existing.get(id)
+        if old is None:
+            results.append(_result(index, id, f"作业记录ID {id} 不存在"))
+            continue
+        if id in seen:
+            results.append(_result(index, id, f"作业记录ID {id} 重复"))
+            continue
+        empty = [key for key in REQUIRED_FIELDS if key in changes and changes[key] is None]
+        if empty:
+            results.append(_result(index, id, f"字段 {', '.join(empty)} 不能为空"))
+            continue
+        new = {**old, **changes}
+        error = _foreign_key_error(
+            new,
+            student_ids if 'student_id' in changes else {old['student_id']},
+            teacher_ids if 'teacher_id' in changes else {old['teacher_id']}
+        )
+        if error:
+            results.append(_result(index, id, error))
+            continue
+
+        seen.add(id)
+        results.append(_result(index, id))
+        old_rows.append(old)
+        new_rows.append(new)
+        groups.setdefault(tuple(sorted(changes)), []).append(
+            {'_id': id, **{f'_{key}': value for key, value in changes.items()}})
+
+    for columns, rows in groups.items():
+        if not columns:
+            continue
+        stmt = (
+            update(records_table)
+            .where(records_table.c.id == bindparam('_id'))
+            .values({column: bindparam(f'_{column}') for column in columns})
+        )
+        db.execute(stmt, rows)
+    if old_rows:
+        apply_stats_deltas(db, record_stats_deltas(old_rows, sign=-1) + record_stats_deltas(new_rows))
+    return results
+
+
+def bulk_delete_records(db: Session, ids: List[int]) -> List[Dict[str, Any]]:
+    """批量删除记录"""
+    existing = _load_records(db, ids)
+    results = []
+    removed: Dict[int, Dict[str, Any]] = {}
+    for index, id in enumerate(ids):
+        if id not in existing:
+            results.append(_result(index, id, f"作业记录ID {id} 不存在"))
+        elif id in removed:
+            results.append(_result(index, id, f"作业记录ID {id} 重复"))
+        else:
+            removed[id] = existing[id]
+            results.append(_result(index, id))
+
+    removed_ids = list(removed)
+    for chunk in _chunks(removed_ids):
+        db.execute(delete(records_table).where(records_table.c.id.in_(chunk)))
+    if removed:
+        apply_stats_deltas(db, record_stats_deltas(removed.values(), sign=-1))
+    return results
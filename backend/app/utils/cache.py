@@ -0,0 +1,91 @@
+"""
+进程内的查询结果缓存
+
+用于年级、班级、学科、批次等下拉选项接口。缓存项按标签分组，写入学生、教师、作业记录后
+调用invalidate清除对应标签的缓存；多进程部署时其他进程的缓存依靠TTL过期。
+"""
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app.core.config import LOOKUP_CACHE_TTL
+
+
+class LookupCache:
+    def __init__(self, ttl: float = LOOKUP_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[Hashable, Tuple[float, Any]]] = {}
+        self._versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _lookup(self, tag: str, key: Hashable, now: float) -> Tuple[bool, Any]:
+        """返回(是否命中, 缓存值或加载前的标签版本)"""
+        with self._lock:
+            entry = self._entries.get(tag, {}).get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, self._versions.get(tag, 0)
+
+    def _store(self, tag: str, key: Hashable, now: float, version: int, value: Any):
+        with self._lock:
+            # 加载期间发生了写入，结果可能已过时，不放入缓存
+            if self._versions.get(tag, 0) == version:
+                self._entries.setdefault(tag, {})[key] = (now + self.ttl, value)
+
+    def get_or_load(self, tag: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """返回缓存值，不存在或已过期时调用loader加载"""
+        now = time.monotonic()
+        hit, result = self._lookup(tag, key, now)
+        if hit:
+            return result
+        value = loader()
+        self._store(tag, key, now, result, value)
+        return value
+
+    async def aget_or_load(self, tag: str, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """get_or_load的异步版本，loader为返回协程的函数"""
+        now = time.monotonic()
+        hit, result = self._lookup(tag, key, now)
+        if hit:
+            return result
+        value = await loader()
+        self._store(tag, key, now, result, value)
+        return value
+
+    def invalidate(self, *tags: str):
+        """清除指定标签下的全部缓存"""
+        with self._lock:
+            for tag in tags:
+                self._entries.pop(tag, None)
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+            self.invalidations += 1
+
+    def version(self, *tags: str) -> Tuple[int, ...]:
+        """各标签当前的版本号，每次invalidate后递增，可用来判断数据是否有写入"""
+        with self._lock:
+            return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "invalidations": self.invalidations,
+                "entries": sum(len(entries) for entries in self._entries.values()),
+                "ttl": self.ttl
+            }
+
+
+# 全局缓存实例
+lookup_cache = LookupCache()
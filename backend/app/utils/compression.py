@@ -0,0 +1,117 @@
+"""
+响应压缩
+
+按请求的Accept-Encoding选择压缩方式：安装了brotli且客户端接受br时使用Brotli，否则使用gzip。
+小于COMPRESSION_MINIMUM_SIZE字节的响应和已压缩的文件格式（xlsx、parquet等）不压缩。
+gzip部分直接使用Starlette的GZipResponder，流式响应（csv、jsonl导出）按块压缩。
+"""
+from typing import Optional, Tuple
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL, COMPRESSION_MINIMUM_SIZE
+from app.utils.export_formats import EXPORT_FORMATS
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli为可选依赖
+    brotli = None
+
+# 本身已经压缩过的导出格式
+EXCLUDED_CONTENT_TYPES = DEFAULT_EXCLUDED_CONTENT_TYPES + (
+    EXPORT_FORMATS['xlsx'].media_type,
+    EXPORT_FORMATS['parquet'].media_type,
+    "application/octet-stream",
+)
+
+# 超过该大小的块在线程中压缩，避免阻塞事件循环
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+
+def parse_accept_encoding(value: str) -> dict:
+    """解析Accept-Encoding，返回{编码: q值}"""
+    encodings = {}
+    for item in value.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, number = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        encodings[name] = q
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, available: Tuple[str, ...]) -> Optional[str]:
+    """在available中（按服务端偏好排序）选出客户端接受且q值最高的编码，都不接受时返回None"""
+    encodings = parse_accept_encoding(accept_encoding)
+    best, best_q = None, 0.0
+    for name in available:
+        q = encodings.get(name, encodings.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int, *,
+                 exclude_content_types: Tuple[str, ...] = DEFAULT_EXCLUDED_CONTENT_TYPES):
+        super().__init__(app, minimum_size, exclude_content_types=exclude_content_types)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        data = self._compressor.process(body)
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = COMPRESSION_BROTLI_QUALITY,
+        exclude_content_types: Tuple[str, ...] = EXCLUDED_CONTENT_TYPES
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.exclude_content_types = exclude_content_types
+        self.encodings = ("br", "gzip") if brotli is not None else ("gzip",)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding == "br":
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality,
+                                        exclude_content_types=self.exclude_content_types)
+        elif encoding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level,
+                                      thread_minimum_size=THREAD_MINIMUM_SIZE,
+                                      exclude_content_types=self.exclude_content_types)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size, exclude_content_types=self.exclude_content_types)
+        await responder(scope, receive, send)
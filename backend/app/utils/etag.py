@@ -0,0 +1,76 @@
+"""
+查询结果的ETag与条件请求
+
+ETag由请求（方法、路径、查询参数、筛选条件）和相关数据表的版本号计算，版本号保存在data_versions表中，
+每个通过Session写入该表的事务提交时递增一次（见models），多进程部署时同样有效。客户端带If-None-Match请求且ETag未变化时
+直接返回304，不执行查询。汇总接口用POST传筛选条件，但不修改数据，这里同样按条件请求处理。
+"""
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.models import DataVersion, Record, Student, Teacher
+
+RECORDS = Record.__tablename__
+STUDENTS = Student.__tablename__
+TEACHERS = Teacher.__tablename__
+
+
+def _versions_stmt(tables: Iterable[str]):
+    return select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(list(tables)))
+
+
+def data_versions(db: Session, *tables: str) -> Dict[str, int]:
+    """一次查询读取各表当前的版本号"""
+    return dict(db.execute(_versions_stmt(tables)).all())
+
+
+async def adata_versions(db: AsyncSession, *tables: str) -> Dict[str, int]:
+    """data_versions的异步版本"""
+    return dict((await db.execute(_versions_stmt(tables))).all())
+
+
+def compute_etag(request: Request, versions: Dict[str, int], payload: Optional[Any] = None) -> str:
+    """根据请求和数据版本号生成弱ETag，payload为POST请求中的筛选条件"""
+    key = json.dumps([
+        request.method,
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        payload,
+        sorted(versions.items())
+    ], ensure_ascii=False, default=str, separators=(",", ":"))
+    return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """按弱比较判断If-None-Match是否包含etag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    versions: Dict[str, int],
+    payload: Optional[Any] = None
+) -> Optional[Response]:
+    """
+    ETag与请求的If-None-Match匹配时返回304响应，否则在response上设置ETag后返回None
+
+    版本号需要在执行查询之前读取：查询期间发生写入时ETag对应的是旧版本，客户端下次请求会重新获取
+    """
+    etag = compute_etag(request, versions, payload)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
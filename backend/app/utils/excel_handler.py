@@ -90,9 +90,8 @@ def generate_sample_data(db: Session):
             if not subject_teachers:
                 continue
             
-            # 随机选择3个日期生成记录
-            for _ in range(3):
-                record_date = random.choice(dates)
+            # 随机选择3个不同的日期生成记录（同一学科同一天同一批次只能有一条记录）
+            for record_date in random.sample(dates, 3):
                 teacher = random.choice(subject_teachers)
                 
                 record = Record(
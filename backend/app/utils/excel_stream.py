@@ -0,0 +1,131 @@
+import io
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+
+EXCEL_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# 每次发送给客户端的数据块大小
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 队列中最多缓存的数据块数，写入速度超过发送速度时阻塞生成线程
+_MAX_PENDING_CHUNKS = 16
+
+
+def _put(chunks: "queue.Queue", item: Any, cancelled: threading.Event) -> bool:
+    """队列满时每秒检查一次是否已取消，放入成功返回True，客户端断开（已取消）返回False"""
+    while not cancelled.is_set():
+        try:
+            chunks.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class _QueueWriter(io.RawIOBase):
+    """把zip输出按块写入队列的只写流，不支持seek，zipfile会自动改用数据描述符"""
+
+    def __init__(self, chunks: "queue.Queue", cancelled: threading.Event):
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= STREAM_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        chunk = bytes(self._buffer)
+        self._buffer.clear()
+        if not _put(self._chunks, chunk, self._cancelled):
+            raise IOError("客户端已断开连接")
+
+
+def content_disposition(filename: str) -> str:
+    """生成支持中文文件名的Content-Disposition头"""
+    return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+def write_xlsx(
+    fileobj,
+    sheet_title: str,
+    header: List[str],
+    rows: Iterable[List[Any]],
+    fills: Optional[Dict[int, Callable[[Any], str]]] = None
+):
+    """
+    以只写模式逐行生成xlsx并保存到fileobj
+
+    fills将列下标映射到返回单元格背景色的函数
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title)
+    ws.append(header)
+    fill_cache: Dict[str, PatternFill] = {}
+    for row in rows:
+        if fills:
+            row = list(row)
+            for index, get_color in fills.items():
+                color = get_color(row[index])
+                if not color:
+                    continue
+                if color not in fill_cache:
+                    rgb = color.lstrip('#')
+                    fill_cache[color] = PatternFill(start_color=rgb, end_color=rgb, fill_type='solid')
+                cell = WriteOnlyCell(ws, value=row[index])
+                cell.fill = fill_cache[color]
+                row[index] = cell
+        ws.append(row)
+    wb.save(fileobj)
+
+
+def iter_xlsx(
+    sheet_title: str,
+    header: List[str],
+    rows: Iterable[List[Any]],
+    fills: Optional[Dict[int, Callable[[Any], str]]] = None
+) -> Iterator[bytes]:
+    """
+    以只写模式生成xlsx并逐块返回字节
+
+    rows在后台线程中逐行消费，参数含义与write_xlsx相同
+    """
+    chunks: "queue.Queue" = queue.Queue(maxsize=_MAX_PENDING_CHUNKS)
+    cancelled = threading.Event()
+    done = object()
+
+    def build():
+        try:
+            writer = _QueueWriter(chunks, cancelled)
+            write_xlsx(writer, sheet_title, header, rows, fills)
+            writer.flush()
+        except Exception as e:
+            _put(chunks, e, cancelled)
+        finally:
+            # 客户端断开后不再有人读取队列，不能无超时地阻塞在put上
+            _put(chunks, done, cancelled)
+
+    threading.Thread(target=build, daemon=True).start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
@@ -0,0 +1,209 @@
+"""
+统一的报表导出：同一份表头和行数据可以输出为xlsx、csv、jsonl或parquet
+
+报表用_sheet函数描述为write_xlsx的参数（sheet_title、header、rows、fills），rows是逐行查询数据库的
+迭代器。csv和jsonl边读游标边编码发送；xlsx在后台线程中以只写模式生成；parquet需要pyarrow，
+列式格式要在写入前拿到整列数据，先在临时文件中生成再发送。
+
+格式由?format=指定，未指定时根据Accept头选择，都没有时为xlsx。
+"""
+import csv
+import importlib.util
+import io
+import itertools
+import json
+import tempfile
+from collections import namedtuple
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.utils.excel_stream import EXCEL_MEDIA_TYPE, STREAM_CHUNK_SIZE, content_disposition, iter_xlsx, write_xlsx
+
+ExportFormat = namedtuple('ExportFormat', ['media_type', 'extension'])
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    'xlsx': ExportFormat(EXCEL_MEDIA_TYPE, '.xlsx'),
+    'csv': ExportFormat('text/csv; charset=utf-8', '.csv'),
+    'jsonl': ExportFormat('application/x-ndjson', '.jsonl'),
+    'parquet': ExportFormat('application/vnd.apache.parquet', '.parquet'),
+}
+
+DEFAULT_EXPORT_FORMAT = 'xlsx'
+
+# Accept头中可以识别的媒体类型；application/json不在其中，浏览器和axios默认的Accept仍然得到xlsx
+ACCEPT_MEDIA_TYPES: Dict[str, str] = {
+    EXCEL_MEDIA_TYPE: 'xlsx',
+    'text/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+}
+
+
+def _accept_quality(params: str) -> float:
+    for param in params.split(';'):
+        name, _, value = param.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def negotiate_format(format: Optional[str] = None, accept: Optional[str] = None) -> str:
+    """确定导出格式，format不支持或缺少所需的库时抛出ValueError"""
+    if format:
+        chosen = format.strip().lower().lstrip('.')
+        if chosen not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {format}，可选格式: {', '.join(EXPORT_FORMATS)}")
+    else:
+        chosen, best = DEFAULT_EXPORT_FORMAT, 0.0
+        for item in (accept or '').split(','):
+            media_type, _, params = item.partition(';')
+            candidate = ACCEPT_MEDIA_TYPES.get(media_type.strip().lower())
+            quality = _accept_quality(params)
+            if candidate and quality > best:
+                chosen, best = candidate, quality
+    if chosen == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        raise ValueError("服务器未安装pyarrow，无法导出parquet格式")
+    return chosen
+
+
+def require_export_format(format: Optional[str], accept: Optional[str]) -> str:
+    """接口中使用的negotiate_format，无法满足时返回406"""
+    try:
+        return negotiate_format(format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+
+def export_filename(stem: str, format: str) -> str:
+    return stem + EXPORT_FORMATS[format].extension
+
+
+def media_type_for(filename: str) -> str:
+    """根据文件扩展名返回媒体类型，用于下载已生成的导出文件"""
+    for export_format in EXPORT_FORMATS.values():
+        if filename.endswith(export_format.extension):
+            return export_format.media_type
+    return 'application/octet-stream'
+
+
+def _text_chunks(lines: Iterable[str]) -> Iterator[bytes]:
+    """把逐行文本攒成约STREAM_CHUNK_SIZE大小的块"""
+    buffer = io.StringIO()
+    for line in lines:
+        buffer.write(line)
+        if buffer.tell() >= STREAM_CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_csv(header: List[str], rows: Iterable[List[Any]]) -> Iterator[bytes]:
+    """逐行编码为CSV，空值输出为空字符串，日期为YYYY-MM-DD"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    def lines():
+        for row in itertools.chain([header], rows):
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    return _text_chunks(lines())
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def iter_jsonl(header: List[str], rows: Iterable[List[Any]]) -> Iterator[bytes]:
+    """每行输出一个以表头为键的JSON对象"""
+    return _text_chunks(
+        json.dumps(dict(zip(header, row)), ensure_ascii=False, default=_json_default) + '\n'
+        for row in rows
+    )
+
+
+def _parquet_table(header: List[str], rows: Iterable[List[Any]]):
+    import pyarrow as pa
+
+    columns: List[List[Any]] = [[] for _ in header]
+    for row in rows:
+        for column, value in zip(columns, row):
+            column.append(value)
+    return pa.table({name: pa.array(column) for name, column in zip(header, columns)})
+
+
+def write_parquet(fileobj, header: List[str], rows: Iterable[List[Any]]):
+    """
+    按列收集全部行后写入parquet
+
+    列类型由pyarrow根据取值推断，全为空的列为null类型
+    """
+    import pyarrow.parquet as pq
+
+    pq.write_table(_parquet_table(header, rows), fileobj)
+
+
+def iter_parquet(header: List[str], rows: Iterable[List[Any]]) -> Iterator[bytes]:
+    """生成parquet后分块返回，较大的文件先写入临时文件而不是全部留在内存中"""
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as buffer:
+        write_parquet(buffer, header, rows)
+        buffer.seek(0)
+        while True:
+            chunk = buffer.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_export(
+    format: str,
+    sheet_title: str,
+    header: List[str],
+    rows: Iterable[List[Any]],
+    fills: Optional[Dict[int, Callable[[Any], str]]] = None
+) -> Iterator[bytes]:
+    """按格式逐块生成导出文件，sheet_title和fills只对xlsx有效"""
+    if format == 'xlsx':
+        return iter_xlsx(sheet_title, header, rows, fills)
+    if format == 'csv':
+        return iter_csv(header, rows)
+    if format == 'jsonl':
+        return iter_jsonl(header, rows)
+    if format == 'parquet':
+        return iter_parquet(header, rows)
+    raise ValueError(f"不支持的导出格式: {format}")
+
+
+def write_export(format: str, fileobj, **sheet):
+    """把导出文件写入fileobj，供后台导出任务使用"""
+    if format == 'xlsx':
+        write_xlsx(fileobj, **sheet)
+    elif format == 'parquet':
+        write_parquet(fileobj, sheet['header'], sheet['rows'])
+    else:
+        for chunk in iter_export(format, **sheet):
+            fileobj.write(chunk)
+
+
+def export_response(format: str, filename: str, sheet: Dict[str, Any]) -> StreamingResponse:
+    """以流式响应返回导出文件，sheet为iter_export的参数"""
+    return StreamingResponse(
+        iter_export(format, **sheet),
+        media_type=EXPORT_FORMATS[format].media_type,
+        headers={"Content-Disposition": content_disposition(filename)}
+    )
@@ -0,0 +1,205 @@
+"""
+后台导出任务
+
+导出请求提交后立即返回任务ID，工作簿在独立的进程池中渲染到磁盘，客户端轮询任务状态后再下载。
+相同类型、相同参数且期间没有数据写入的请求复用同一个任务；完成的文件保留EXPORT_JOB_TTL秒后删除。
+任务记录保存在当前进程内，多进程部署时轮询请求需要落在提交任务的同一进程上。
+"""
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from app.core.config import EXPORT_JOB_DIR, EXPORT_JOB_TTL, EXPORT_MAX_PENDING_JOBS, EXPORT_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# render(params, fileobj)：在子进程中执行，把导出结果写入fileobj，必须是模块级函数
+Renderer = Callable[[Dict[str, Any], Any], None]
+
+
+class ExportQueueFull(Exception):
+    """排队中的导出任务已达上限"""
+
+
+def _run_export(render: Renderer, params: Dict[str, Any], path: str) -> int:
+    """子进程入口：先写入临时文件，完成后再改名，返回文件大小"""
+    partial = path + '.part'
+    try:
+        with open(partial, 'wb') as f:
+            render(params, f)
+        os.replace(partial, path)
+    except Exception as e:
+        # 异常要传回主进程，HTTPException等不一定能正确序列化，只保留错误信息
+        detail = getattr(e, 'detail', None)
+        raise RuntimeError(detail if isinstance(detail, str) else str(e)) from None
+    finally:
+        if os.path.exists(partial):
+            os.unlink(partial)
+    return os.path.getsize(path)
+
+
+class ExportJob:
+    def __init__(self, kind: str, filename: str, path: str, key: Hashable):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.filename = filename
+        self.path = path
+        self.key = key
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.expires_at: Optional[float] = None
+        self.size: Optional[int] = None
+        self.error: Optional[str] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is None:
+            return 'running' if self.future is not None and self.future.running() else 'pending'
+        return 'failed' if self.error is not None else 'done'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "filename": self.filename,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "size": self.size,
+            "error": self.error
+        }
+
+
+class ExportJobManager:
+    def __init__(
+        self,
+        max_workers: int = EXPORT_MAX_WORKERS,
+        max_pending: int = EXPORT_MAX_PENDING_JOBS,
+        ttl: float = EXPORT_JOB_TTL,
+        directory: Optional[str] = EXPORT_JOB_DIR
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._directory = directory
+        self._owns_directory = directory is None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, ExportJob] = {}
+        self._by_key: Dict[Hashable, str] = {}
+
+    def _ensure_started(self):
+        if self._executor is None:
+            # 使用spawn启动子进程，避免在多线程的服务进程中fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='homework_exports_')
+        os.makedirs(self._directory, exist_ok=True)
+
+    def _purge_expired(self, now: float):
+        for job_id, job in list(self._jobs.items()):
+            if job.expires_at is not None and job.expires_at <= now:
+                self._forget(job)
+                if os.path.exists(job.path):
+                    os.unlink(job.path)
+
+    def _forget(self, job: ExportJob):
+        self._jobs.pop(job.id, None)
+        if self._by_key.get(job.key) == job.id:
+            del self._by_key[job.key]
+
+    def _finish(self, job: ExportJob, future: Future, executor: ProcessPoolExecutor):
+        broken = None
+        with self._lock:
+            if self._jobs.get(job.id) is not job:
+                # 已经shutdown，任务记录和导出目录都已清除
+                return
+            job.finished_at = datetime.now()
+            job.expires_at = time.monotonic() + self.ttl
+            if future.cancelled():
+                job.error = "任务已取消"
+            elif future.exception() is not None:
+                job.error = str(future.exception())
+                if isinstance(future.exception(), BrokenProcessPool) and executor is self._executor:
+                    # 导出进程异常退出后进程池不可再用，下次提交时重新创建
+                    broken, self._executor = executor, None
+                logger.error(f"导出任务失败: {job.kind} {job.id}: {job.error}")
+            else:
+                job.size = future.result()
+            # 失败的任务不再复用，相同请求会重新提交
+            if job.error is not None and self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+        if broken is not None:
+            # 在锁外关闭旧进程池：取消排队的任务会同步调用它们的_finish
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(
+        self,
+        kind: str,
+        render: Renderer,
+        params: Dict[str, Any],
+        filename: str,
+        version: Hashable = None,
+        extension: str = '.xlsx'
+    ) -> ExportJob:
+        """
+        提交导出任务，已有相同请求的任务时直接返回该任务
+
+        version为数据版本，版本变化后相同参数的请求会重新导出；extension为导出文件的扩展名，
+        与导出格式一致；排队任务过多时抛出ExportQueueFull
+        """
+        key = (kind, json.dumps(params, sort_keys=True, default=str), version)
+        with self._lock:
+            now = time.monotonic()
+            self._purge_expired(now)
+            existing = self._jobs.get(self._by_key.get(key))
+            if existing is not None:
+                return existing
+
+            active = sum(1 for job in self._jobs.values() if job.status in ('pending', 'running'))
+            if active >= self.max_pending:
+                raise ExportQueueFull(f"排队中的导出任务已达上限({self.max_pending})，请稍后再试")
+
+            self._ensure_started()
+            job = ExportJob(kind, filename, '', key)
+            job.path = os.path.join(self._directory, f"{job.id}{extension}")
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            executor = self._executor
+            job.future = executor.submit(_run_export, render, params, job.path)
+        job.future.add_done_callback(lambda future: self._finish(job, future, executor))
+        return job
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return self._jobs.get(job_id)
+
+    def shutdown(self):
+        """取消排队中的任务并删除导出文件"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._jobs.clear()
+            self._by_key.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if self._owns_directory and self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+
+export_jobs = ExportJobManager()
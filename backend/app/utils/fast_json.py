@@ -0,0 +1,85 @@
+"""
+大列表响应的快速序列化
+
+作业记录、学生、教师列表直接用Core select()读取数据行，转换为字典后用orjson编码，不再逐个创建ORM对象，
+也不再经过response_model逐条校验。数据行来自本表的列，类型由表结构保证；设置FAST_JSON_VALIDATE=1时
+先用TypeAdapter整批校验再编码。未安装orjson时使用标准库json。
+"""
+import json
+from datetime import date
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.engine import Row
+
+from app.core.config import FAST_JSON_VALIDATE
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson为可选依赖
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """编码为UTF-8的JSON，日期按ISO格式输出，与response_model的结果一致"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def row_dicts(rows: Sequence[Row]) -> List[dict]:
+    """Core查询返回的数据行转换为字典列表"""
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+
+def serialize_rows(schema: Type[BaseModel], rows: Sequence[Row], validate: bool = FAST_JSON_VALIDATE) -> List[dict]:
+    """数据行转换为可直接编码的字典列表，validate为True时按schema整批校验"""
+    items = row_dicts(rows)
+    if validate:
+        adapter = list_adapter(schema)
+        items = adapter.dump_python(adapter.validate_python(items), mode="json")
+    return items
+
+
+def table_layout(rows: Sequence[dict], leading: Sequence[str]) -> dict:
+    """
+    把字典列表转换为{"columns": [...], "rows": [[...], ...]}的紧凑格式，每行不再重复键名
+
+    leading中的列排在最前面，其余的列（学科、日期等透视列）按名称排序，某行没有的列为null
+    """
+    others = set().union(*rows).difference(leading) if rows else set()
+    columns = [*leading, *sorted(others)]
+    return {"columns": columns, "rows": [[row.get(column) for column in columns] for row in rows]}
+
+
+def fast_json_response(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """返回FastJSONResponse，response为接口注入的Response时带上其中设置的响应头（如ETag）"""
+    headers = {}
+    if response is not None:
+        # 长度和类型由新的响应计算
+        headers = {key: value for key, value in response.headers.items() if key not in ("content-length", "content-type")}
+    return FastJSONResponse(content, headers=headers)
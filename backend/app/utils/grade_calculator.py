@@ -1,18 +1,41 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
 from app.core.config import SUBJECT_MAX_SCORES, GRADE_THRESHOLDS
 
+# 等级按阈值从低到高排列，相邻等级之间的分界为较高等级的阈值（百分比）
+_LEVELS = sorted(GRADE_THRESHOLDS.items(), key=lambda item: item[1])
+_LEVEL_GRADES = np.array([grade for grade, _ in _LEVELS], dtype=object)
+_LEVEL_EDGES = np.array([threshold for _, threshold in _LEVELS[1:]], dtype=float)
+
+GRADE_COLORS: Dict[str, str] = {
+    'A': '#90EE90',  # 浅绿色
+    'B': '#87CEEB',  # 天蓝色
+    'C': '#FFB6C1',  # 浅粉色
+    'D': '#FFB6C1'   # 浅红色
+}
+_LEVEL_COLORS = np.array([GRADE_COLORS.get(grade, '') for grade in _LEVEL_GRADES], dtype=object)
+
+ScoreArray = Union[np.ndarray, pd.Series, Sequence[float]]
+
+
 class GradeCalculator:
+    # 满分总和只与配置有关，导入时计算一次
+    TOTAL_MAX_SCORE: float = sum(SUBJECT_MAX_SCORES.values())
+
     @staticmethod
     def calculate_total_max_score() -> float:
         """计算所有学科满分总和"""
-        return sum(SUBJECT_MAX_SCORES.values())
-    
+        return GradeCalculator.TOTAL_MAX_SCORE
+
     @staticmethod
     def calculate_grade(total_score: float) -> str:
         """根据总分计算等级"""
-        max_total = GradeCalculator.calculate_total_max_score()
+        max_total = GradeCalculator.TOTAL_MAX_SCORE
         score_percentage = (total_score / max_total) * 100
-        
+
         if score_percentage >= GRADE_THRESHOLDS['A']:
             return 'A'
         elif score_percentage >= GRADE_THRESHOLDS['B']:
@@ -21,14 +44,26 @@ class GradeCalculator:
             return 'C'
         else:
             return 'D'
-    
+
     @staticmethod
     def get_grade_color(grade: str) -> str:
         """获取等级对应的颜色"""
-        grade_colors = {
-            'A': '#90EE90',  # 浅绿色
-            'B': '#87CEEB',  # 天蓝色
-            'C': '#FFB6C1',  # 浅粉色
-            'D': '#FFB6C1'   # 浅红色
-        }
-        return grade_colors.get(grade, '')
\ No newline at end of file
+        return GRADE_COLORS.get(grade, '')
+
+    @staticmethod
+    def calculate_grades(total_scores: ScoreArray) -> Tuple[ScoreArray, ScoreArray]:
+        """
+        批量计算等级和颜色，结果与逐个调用calculate_grade、get_grade_color一致
+
+        传入pandas Series时返回两个索引相同的Series，否则返回两个numpy数组；
+        总分为空（NaN）时按最低等级处理
+        """
+        scores = np.asarray(total_scores, dtype=float)
+        percentages = (scores / GradeCalculator.TOTAL_MAX_SCORE) * 100
+        levels = np.searchsorted(_LEVEL_EDGES, percentages, side='right')
+        levels[np.isnan(percentages)] = 0
+        grades, colors = _LEVEL_GRADES[levels], _LEVEL_COLORS[levels]
+        if isinstance(total_scores, pd.Series):
+            return (pd.Series(grades, index=total_scores.index, name='grade'),
+                    pd.Series(colors, index=total_scores.index, name='grade_color'))
+        return grades, colors
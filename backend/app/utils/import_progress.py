@@ -0,0 +1,71 @@
+"""
+导入进度
+
+上传文件时在查询参数中带上客户端生成的import_id，导入过程中每处理完一块更新一次进度，
+可以通过GET /records/import/progress/{import_id}轮询。进度保存在当前进程内，导入结束
+IMPORT_PROGRESS_TTL秒后删除。
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.config import IMPORT_PROGRESS_TTL
+
+
+class ImportProgressRegistry:
+    def __init__(self, ttl: float = IMPORT_PROGRESS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _purge(self):
+        now = time.monotonic()
+        for import_id in [key for key, expires_at in self._expires.items() if expires_at <= now]:
+            self._items.pop(import_id, None)
+            self._expires.pop(import_id, None)
+
+    def start(self, import_id: str, filename: Optional[str], total_bytes: Optional[int] = None,
+              total_count: Optional[int] = None):
+        with self._lock:
+            self._purge()
+            self._expires.pop(import_id, None)
+            self._items[import_id] = {
+                "import_id": import_id,
+                "filename": filename,
+                "status": "running",
+                "message": None,
+                "processed_count": 0,
+                "total_count": total_count,
+                "imported_count": 0,
+                "inserted_count": 0,
+                "updated_count": 0,
+                "unchanged_count": 0,
+                "failed_count": 0,
+                "failed_chunks": 0,
+                "bytes_read": 0,
+                "total_bytes": total_bytes,
+                "started_at": datetime.now(),
+                "finished_at": None
+            }
+
+    def update(self, import_id: str, **fields):
+        with self._lock:
+            if import_id in self._items:
+                self._items[import_id].update(fields)
+
+    def finish(self, import_id: str, status: str, message: str, **fields):
+        with self._lock:
+            if import_id in self._items:
+                self._items[import_id].update(fields, status=status, message=message, finished_at=datetime.now())
+                self._expires[import_id] = time.monotonic() + self.ttl
+
+    def get(self, import_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._purge()
+            item = self._items.get(import_id)
+            return dict(item) if item is not None else None
+
+
+import_progress = ImportProgressRegistry()
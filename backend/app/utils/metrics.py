@@ -0,0 +1,233 @@
+"""
+请求耗时统计，以Prometheus文本格式在/metrics输出
+
+MetricsMiddleware按路由模板（如/records/{record_id}）记录每个请求的总耗时、状态码和响应大小；
+SQL耗时通过SQLAlchemy的before_cursor_execute/after_cursor_execute事件累加到当前请求上，
+总耗时减去SQL耗时即为Python端（序列化、pandas处理等）的耗时。
+
+同步接口在线程池中执行，contextvars会随调用复制过去，因此SQL耗时能归到发起它的请求；
+导出时自行创建的线程和进程中执行的SQL不计入请求。
+
+开启query_debug时还会记录每个请求执行的语句（见query_debug模块），在响应头中返回语句数和SQL耗时。
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import METRICS_LATENCY_BUCKETS, METRICS_SIZE_BUCKETS
+from app.utils.query_debug import QueryLog
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 调试模式下返回的响应头：语句数、SQL耗时（毫秒）、疑似N+1的语句数
+QUERY_HEADERS = ["X-Query-Count", "X-Query-Time-Ms", "X-Query-Repeated"]
+
+# 没有匹配到路由的请求（404等）统一使用该标签，避免任意路径产生大量时间序列
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """单个请求执行过程中累计的数据库耗时，queries仅在调试模式下记录"""
+    __slots__ = ("sql_time", "queries")
+
+    def __init__(self, queries: Optional[QueryLog] = None):
+        self.sql_time = 0.0
+        self.queries = queries
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """当前请求的统计对象，不在请求中时为None"""
+    return _current_request.get()
+
+
+class Histogram:
+    """按标签分组的直方图，各桶只记录落入该区间的次数，输出时再累加"""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[Tuple[str, str], ...], List] = {}
+
+    def observe(self, labels: Tuple[Tuple[str, str], ...], value: float):
+        series = self._series.get(labels)
+        if series is None:
+            # [各桶计数（最后一个为+Inf）, 总和, 次数]
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    def __init__(self, latency_buckets: Sequence[float] = METRICS_LATENCY_BUCKETS,
+                 size_buckets: Sequence[float] = METRICS_SIZE_BUCKETS):
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[Tuple[str, str], ...], int] = {}
+        self.duration = Histogram(
+            "http_request_duration_seconds", "请求总耗时（包括响应体发送）", latency_buckets)
+        self.sql_duration = Histogram(
+            "http_request_sql_duration_seconds", "请求中执行SQL的耗时", latency_buckets)
+        self.python_duration = Histogram(
+            "http_request_python_duration_seconds", "请求总耗时减去SQL耗时", latency_buckets)
+        self.response_size = Histogram(
+            "http_response_size_bytes", "响应体大小", size_buckets)
+
+    def observe(self, method: str, route: str, status: int, duration: float, stats: RequestStats, size: int):
+        labels = (("method", method), ("route", route))
+        with self._lock:
+            key = labels + (("status", str(status)),)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self.duration.observe(labels, duration)
+            self.sql_duration.observe(labels, stats.sql_time)
+            self.python_duration.observe(labels, max(duration - stats.sql_time, 0.0))
+            self.response_size.observe(labels, size)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = ["# HELP http_requests_total 请求数", "# TYPE http_requests_total counter"]
+            lines += [f"http_requests_total{_format_labels(labels)} {count}"
+                      for labels, count in sorted(self._requests.items())]
+            for histogram in (self.duration, self.sql_duration, self.python_duration, self.response_size):
+                lines += histogram.render()
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI中间件，不包装响应对象，流式响应按发送完最后一块数据计时"""
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None, query_debug: bool = False):
+        self.app = app
+        self.registry = registry or metrics
+        self.query_debug = query_debug
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(QueryLog() if self.query_debug else None)
+        token = _current_request.set(stats)
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if stats.queries is not None:
+                    # 流式响应在发送响应头之后执行的语句不计入
+                    message = {**message, "headers": list(message.get("headers", [])) + _query_headers(stats)}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            route = route_template(scope)
+            self.registry.observe(scope["method"], route, status, time.perf_counter() - start, stats, size)
+            if stats.queries is not None:
+                for statement, times, call_site in stats.queries.repeated():
+                    logger.warning(f"疑似N+1查询: {scope['method']} {route} 在 {call_site} 重复执行 {times} 次: "
+                                   f"{' '.join(statement.split())[:200]}")
+
+
+def _query_headers(stats: RequestStats):
+    values = (stats.queries.count, f"{stats.sql_time * 1000:.2f}", len(stats.queries.repeated()))
+    return [(name.lower().encode(), str(value).encode()) for name, value in zip(QUERY_HEADERS, values)]
+
+
+def route_template(scope) -> str:
+    """
+    请求匹配到的完整路由模板，如/records/{record_id}
+
+    路由匹配后Starlette会把路由对象写入scope，但include_router的路由对象上可能只有不带前缀的路径，
+    这里用实际请求路径减去路由部分的长度得到前缀
+    """
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return UNMATCHED_ROUTE
+    rendered = path_format
+    path_params = scope.get("path_params", {})
+    for name, convertor in getattr(route, "param_convertors", {}).items():
+        if name in path_params:
+            rendered = rendered.replace("{" + name + "}", convertor.to_string(path_params[name]))
+    path = scope["path"]
+    if path.endswith(rendered):
+        return path[:len(path) - len(rendered)] + path_format
+    return path_format
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_request.get()
+    if stats is not None and stats.queries is not None:
+        stats.queries.record(statement)
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+    stats = _current_request.get()
+    if stats is not None:
+        stats.sql_time += elapsed
+
+
+def _handle_error(exception_context):
+    # 语句执行失败时不会触发after_cursor_execute，这里丢弃对应的开始时间
+    if exception_context.connection is not None:
+        _after_cursor_execute(exception_context.connection, None, None, None, None, False)
+
+
+def instrument_engine(engine: Engine):
+    """为引擎注册SQL计时事件，异步引擎传入其sync_engine"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# 全局统计实例
+metrics = MetricsRegistry()
@@ -0,0 +1,66 @@
+"""
+游标（keyset）分页
+
+游标是排序键最后一行取值的JSON经base64编码后的字符串，对客户端不透明。下一页查询直接用
+排序键比较定位起点，不需要OFFSET跳过前面的行，翻到多深的页耗时都基本不变。
+"""
+import base64
+import json
+from datetime import date
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.sql import Select
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """把排序键取值编码为游标，日期按ISO格式保存"""
+    payload = [value.isoformat() if isinstance(value, date) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, types: Sequence[Callable[[Any], Any]]) -> Tuple[Any, ...]:
+    """解析游标，types为每个排序键的转换函数，游标无效时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError):
+        raise ValueError("无效的分页游标")
+
+
+def _after_clause(keys: Sequence[Any], after: Sequence[Any], descending: bool = False):
+    """
+    展开(k1, k2, ...) > (v1, v2, ...)为 k1 > v1 OR (k1 = v1 AND k2 > v2) ...，降序时比较方向相反
+
+    SQLite对行值比较的优化较差，展开后再单独加上k1 >= v1，才能用索引直接定位到游标位置
+    """
+    beyond = keys[0] < after[0] if descending else keys[0] > after[0]
+    if len(keys) == 1:
+        return beyond
+    return or_(beyond, and_(keys[0] == after[0], _after_clause(keys[1:], after[1:], descending)))
+
+
+def keyset_page_stmt(stmt: Select, keys: Sequence[Any], after: Optional[Tuple[Any, ...]], limit: int,
+                     descending: bool = False) -> Select:
+    """按keys排序（descending为True时全部降序）并从after之后开始取limit+1行，多取的一行用于判断是否还有下一页"""
+    if after is not None:
+        start = keys[0] <= after[0] if descending else keys[0] >= after[0]
+        stmt = stmt.where(start, _after_clause(keys, after, descending))
+    return stmt.order_by(*[key.desc() if descending else key for key in keys]).limit(limit + 1)
+
+
+def split_page(rows: List[Any], limit: int, key: Callable[[Any], Sequence[Any]]) -> Tuple[List[Any], Optional[str]]:
+    """去掉多取的一行，返回本页数据和下一页游标（没有下一页时为None）"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
+
+
+def count_stmt(stmt: Select) -> Select:
+    """统计筛选结果总数的查询"""
+    return select(func.count()).select_from(stmt.order_by(None).subquery())
@@ -0,0 +1,26 @@
+"""
+SQL端透视
+
+汇总接口需要每个学生一行、每个学科或日期一列。SQLite的json_group_object在按学生分组时把
+(学科/日期, 数值)聚合成一个JSON对象，每个学生只返回一行，Python端解析JSON即可得到各列，
+不再逐行拼装嵌套字典。
+
+没有采用为每个透视值生成一列 SUM(CASE WHEN date = ? ...) 的写法：SQLite会对每一行计算所有
+CASE表达式，耗时随日期列数成倍增长，按学期汇总时比逐行汇总还慢。
+"""
+import json
+from typing import Any, Dict, Optional, Union
+
+from sqlalchemy import func
+
+
+def pivot_object(key_column, value):
+    """按key_column聚合成JSON对象的列，同一分组内键重复时保留最后一个值"""
+    return func.json_group_object(key_column, value)
+
+
+def load_pivot(value: Union[str, Dict[str, Any], None]) -> Dict[str, Any]:
+    """解析pivot_object列的结果，成绩索引生成的数据行已经是字典，直接返回"""
+    if isinstance(value, dict):
+        return value
+    return json.loads(value) if value else {}
@@ -0,0 +1,123 @@
+"""
+SQL语句计数与N+1查询检测
+
+QueryLog记录执行过的语句，同一条SQL（参数不同也算同一条）执行次数达到N_PLUS_ONE_THRESHOLD时
+记下app代码中发起它的位置，通常是循环里逐条查询或序列化ORM对象时触发了relationship的延迟加载。
+
+开启QUERY_DEBUG后MetricsMiddleware为每个请求创建QueryLog，在响应头中返回语句数和SQL耗时，
+并把重复执行的语句写入日志。测试中用assert_max_queries限制一段代码的语句数：
+
+    with assert_max_queries(3):
+        client.post("/records/records", json=payload)
+"""
+import os
+import threading
+import traceback
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import N_PLUS_ONE_THRESHOLD
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+# 调用位置只取app目录下的业务代码，跳过统计代码本身
+_SKIP_FILES = {os.path.join(_UTILS_DIR, name) for name in ("query_debug.py", "metrics.py")}
+
+
+def _call_site() -> str:
+    """当前调用栈中最内层的app代码位置"""
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(_APP_DIR) and filename not in _SKIP_FILES:
+            return f"{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:{frame.lineno} {frame.name}"
+    return "<unknown>"
+
+
+class QueryLog:
+    """一段时间内执行的SQL语句，可以被多个线程同时写入"""
+
+    def __init__(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.threshold = threshold
+        self.count = 0
+        self._lock = threading.Lock()
+        self._statements: Dict[str, int] = {}
+        self._call_sites: Dict[str, str] = {}
+
+    def record(self, statement: str):
+        with self._lock:
+            self.count += 1
+            times = self._statements[statement] = self._statements.get(statement, 0) + 1
+        if times == self.threshold:
+            call_site = _call_site()
+            with self._lock:
+                self._call_sites[statement] = call_site
+
+    def statements(self) -> List[Tuple[str, int]]:
+        """按执行次数从多到少排列的(语句, 次数)"""
+        with self._lock:
+            return sorted(self._statements.items(), key=lambda item: -item[1])
+
+    def repeated(self) -> List[Tuple[str, int, str]]:
+        """执行次数达到阈值的(语句, 次数, 调用位置)，即疑似N+1的查询"""
+        with self._lock:
+            return [
+                (statement, times, self._call_sites.get(statement, "<unknown>"))
+                for statement, times in sorted(self._statements.items(), key=lambda item: -item[1])
+                if times >= self.threshold
+            ]
+
+    def report(self) -> str:
+        lines = [f"共执行 {self.count} 条SQL语句"]
+        for statement, times in self.statements():
+            lines.append(f"  {times:>4} 次  {' '.join(statement.split())[:200]}")
+        for statement, times, call_site in self.repeated():
+            lines.append(f"疑似N+1查询：{call_site} 重复执行 {times} 次  {' '.join(statement.split())[:200]}")
+        return "\n".join(lines)
+
+
+def _default_engines() -> List[Engine]:
+    # 运行时再读取，测试中替换了database.engine时同样生效
+    from app.core import database
+    return [database.engine, database.async_engine.sync_engine]
+
+
+@contextmanager
+def count_queries(engines: Optional[Sequence[Engine]] = None,
+                  threshold: int = N_PLUS_ONE_THRESHOLD) -> Iterator[QueryLog]:
+    """
+    统计代码块中在engines上执行的全部语句，默认统计应用的同步和异步引擎
+
+    不区分线程和请求，TestClient在其他线程中执行的接口也会被统计
+    """
+    log = QueryLog(threshold)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        log.record(statement)
+
+    engines = list(engines) if engines is not None else _default_engines()
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield log
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, engines: Optional[Sequence[Engine]] = None,
+                       allow_repeated: bool = True) -> Iterator[QueryLog]:
+    """
+    代码块执行的语句数超过max_queries时抛出AssertionError，供测试使用
+
+    allow_repeated为False时，出现疑似N+1的重复语句同样视为失败
+    """
+    with count_queries(engines) as log:
+        yield log
+    if log.count > max_queries:
+        raise AssertionError(f"SQL语句数 {log.count} 超过上限 {max_queries}\n{log.report()}")
+    if not allow_repeated and log.repeated():
+        raise AssertionError(f"存在重复执行的SQL语句\n{log.report()}")
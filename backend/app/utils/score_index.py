@@ -0,0 +1,380 @@
+"""
+按年级的成绩前缀和索引
+
+成绩汇总接口每次都要按用户选择的日期范围重新聚合日汇总表，拖动日期滑块时同一个年级会被反复查询。
+这里为每个(学生, 学科)保存按日期排序的每日分数之和、有分数的记录数和记录总数，以及它们的前缀和
+（NumPy数组），任意日期范围的合计只需两次二分查找和一次相减。
+
+索引在第一次查询某个年级时于后台线程中整体构建，最多保留SCORE_INDEX_MAX_GRADES个年级；构建完成之前
+（一个年级的学生较多时需要数秒）查询返回None，由调用方直接查询数据库，不让触发构建的请求等待。是否过期由
+data_versions中日汇总表的版本号判断：apply_stats_deltas会把增量记在会话上，事务提交前版本号加1，提交后
+本进程的索引直接应用这些增量（savepoint回滚的增量已去掉）；其他进程写入或重建汇总表后版本号对不上，
+索引在下次查询时于后台重新构建。
+学生信息（年级、班级、小组）变化时同样按students的版本号重新构建。
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from itertools import groupby
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import String, event, select, type_coerce
+from sqlalchemy.orm import Session, SessionTransaction
+
+from app.core.config import SCORE_INDEX_ENABLED, SCORE_INDEX_MAX_GRADES
+from app.models.models import COMMITTED_VERSIONS_KEY, STATS_VERSION, DataVersion, RecordDailyStat, Student, mark_written
+
+logger = logging.getLogger(__name__)
+
+STUDENTS = Student.__tablename__
+
+# 会话上记录的待应用增量：[(记录时所在的savepoint, 增量列表)]，以及汇总表是否被整体重建
+PENDING_KEY = "score_index_pending"
+REBUILT_KEY = "score_index_rebuilt"
+
+
+def _day(value) -> int:
+    """日期（date、datetime或YYYY-MM-DD字符串）转换为1970-01-01起的天数，索引中的日期都用天数表示"""
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+class ScoreSeries:
+    """一个学生一个学科的每日分数及其前缀和，数组只整体替换，读取时不需要加锁"""
+    __slots__ = ("dates", "sums", "counts", "records", "sum_prefix", "count_prefix", "record_prefix")
+
+    def __init__(self, dates: np.ndarray, sums: np.ndarray, counts: np.ndarray, records: np.ndarray):
+        self.dates = dates
+        self.sums = sums
+        self.counts = counts
+        self.records = records
+        # 前缀和比数据多一个0，区间[lo, hi)的合计为prefix[hi] - prefix[lo]
+        self.sum_prefix = np.concatenate(([0.0], np.cumsum(sums)))
+        self.count_prefix = np.concatenate(([0], np.cumsum(counts)))
+        self.record_prefix = np.concatenate(([0], np.cumsum(records)))
+
+    def bounds(self, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        """日期范围[start, end]（天数，None表示不限）对应的下标区间[lo, hi)"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, start, side="left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, end, side="right"))
+        return lo, hi
+
+    def totals(self, lo: int, hi: int) -> Tuple[float, int, int]:
+        """下标区间内的(分数之和, 有分数的记录数, 记录总数)"""
+        return (
+            float(self.sum_prefix[hi] - self.sum_prefix[lo]),
+            int(self.count_prefix[hi] - self.count_prefix[lo]),
+            int(self.record_prefix[hi] - self.record_prefix[lo])
+        )
+
+    def patched(self, day: int, score_sum: float, score_count: int, record_count: int) -> Optional["ScoreSeries"]:
+        """返回累加了一天增量的新序列，记录数归零的日期被删除，序列为空时返回None"""
+        dates, sums, counts, records = self.dates, self.sums, self.counts, self.records
+        i = int(np.searchsorted(dates, day))
+        if i < len(dates) and dates[i] == day:
+            sums, counts, records = sums.copy(), counts.copy(), records.copy()
+            sums[i] += score_sum
+            counts[i] += score_count
+            records[i] += record_count
+            if records[i] <= 0:
+                dates, sums, counts, records = (np.delete(a, i) for a in (dates, sums, counts, records))
+        elif record_count > 0:
+            dates, sums, counts, records = (
+                np.insert(a, i, v) for a, v in ((dates, day), (sums, score_sum), (counts, score_count), (records, record_count))
+            )
+        return ScoreSeries(dates, sums, counts, records) if len(dates) else None
+
+    @classmethod
+    def empty(cls) -> "ScoreSeries":
+        return cls(np.empty(0, np.int64), np.empty(0, np.float64), np.empty(0, np.int64), np.empty(0, np.int64))
+
+
+class GradeScoreIndex:
+    """
+    一个年级的索引：学生信息和各(学生, 学科)的序列，均按学号、学科排序
+
+    构建后不再修改，应用增量时生成新的索引整体替换，正在读取旧索引的请求不加锁也能看到一致的数据
+    """
+
+    def __init__(self, grade: str, versions: Tuple[int, int],
+                 students: Dict[str, Tuple[str, str, Optional[str]]], series: Dict[str, Dict[str, ScoreSeries]]):
+        self.grade = grade
+        self.versions = versions  # (日汇总表版本号, 学生表版本号)
+        self.students = students
+        self.series = series
+
+    @classmethod
+    def build(cls, db: Session, grade: str, versions: Tuple[int, int]) -> "GradeScoreIndex":
+        # 按年级索引查找学生，在Python中按学号排序，避免为ORDER BY扫描整个学号索引
+        students = dict(sorted(
+            (student_id, (name, class_name, group))
+            for student_id, name, class_name, group in db.execute(
+                select(Student.student_id, Student.name, Student.class_name, Student.group)
+                .where(Student.grade == grade)
+            )
+        ))
+        # 用IN子查询而不是JOIN，按汇总表主键顺序读取，不需要临时排序；日期读取为字符串后由NumPy整列转换
+        rows = db.execute(
+            select(
+                RecordDailyStat.student_id, RecordDailyStat.subject, type_coerce(RecordDailyStat.date, String),
+                RecordDailyStat.score_sum, RecordDailyStat.score_count, RecordDailyStat.record_count
+            )
+            .where(RecordDailyStat.student_id.in_(select(Student.student_id).where(Student.grade == grade)))
+            .order_by(RecordDailyStat.student_id, RecordDailyStat.subject, RecordDailyStat.date)
+        ).all()
+        series: Dict[str, Dict[str, ScoreSeries]] = defaultdict(dict)
+        if rows:
+            student_ids, subjects, days, sums, counts, records = zip(*rows)
+            days = np.array(days, dtype="datetime64[D]").astype(np.int64)
+            sums, counts, records = np.array(sums, np.float64), np.array(counts, np.int64), np.array(records, np.int64)
+            start = 0
+            for (student_id, subject), group in groupby(zip(student_ids, subjects)):
+                end = start + sum(1 for _ in group)
+                series[student_id][subject] = ScoreSeries(
+                    days[start:end], sums[start:end], counts[start:end], records[start:end])
+                start = end
+        return cls(grade, versions, students, dict(series))
+
+    def _students(self, filter) -> Iterable[Tuple[str, Tuple[str, str, Optional[str]]]]:
+        for student_id, info in self.students.items():
+            if filter.class_name and info[1] != filter.class_name:
+                continue
+            if filter.group and info[2] != filter.group:
+                continue
+            yield student_id, info
+
+    @staticmethod
+    def _range(filter) -> Tuple[Optional[int], Optional[int]]:
+        return (
+            _day(filter.start_date) if filter.start_date else None,
+            _day(filter.end_date) if filter.end_date else None
+        )
+
+    def student_summary_rows(self, filter) -> List[SimpleNamespace]:
+        """与学生成绩汇总透视查询结果相同的数据行（按学号排序），scores为{学科: [分数之和, 次数]}"""
+        start, end = self._range(filter)
+        rows = []
+        for student_id, (name, class_name, group) in self._students(filter):
+            scores, total = {}, 0.0
+            for subject, series in self.series.get(student_id, {}).items():
+                if filter.subject and subject != filter.subject:
+                    continue
+                score_sum, score_count, record_count = series.totals(*series.bounds(start, end))
+                if record_count:
+                    scores[subject] = [score_sum, score_count]
+                    if score_count:
+                        total += score_sum / score_count
+            if scores:
+                rows.append(SimpleNamespace(
+                    student_id=student_id, name=name, grade=self.grade, class_name=class_name, group=group,
+                    scores=scores, total_score=total
+                ))
+        return rows
+
+    def subject_summary_rows(self, filter) -> List[SimpleNamespace]:
+        """与学科日期汇总透视查询结果相同的数据行（按学号排序），scores为{日期: 当天分数之和或None}"""
+        start, end = self._range(filter)
+        rows = []
+        for student_id, (name, class_name, group) in self._students(filter):
+            series = self.series.get(student_id, {}).get(filter.subject)
+            if series is None:
+                continue
+            lo, hi = series.bounds(start, end)
+            if lo == hi:
+                continue
+            score_sum, score_count, _ = series.totals(lo, hi)
+            scores = {
+                day: day_sum if day_count else None
+                for day, day_sum, day_count in zip(
+                    np.datetime_as_string(series.dates[lo:hi].astype("datetime64[D]")).tolist(),
+                    series.sums[lo:hi].tolist(), series.counts[lo:hi].tolist()
+                )
+            }
+            rows.append(SimpleNamespace(
+                student_id=student_id, name=name, grade=self.grade, class_name=class_name, group=group,
+                scores=scores, total_score=score_sum, count=score_count
+            ))
+        return rows
+
+    def patched(self, deltas: Iterable[Mapping[str, Any]], version: int) -> "GradeScoreIndex":
+        """
+        返回应用了日汇总表增量的新索引，version为新的日汇总表版本号
+
+        只处理本年级的学生；复制学号到学科字典的映射和有变化学生的学科字典，未变化的序列与旧索引共用
+        """
+        series = dict(self.series)
+        copied = set()
+        for delta in deltas:
+            student_id = delta["student_id"]
+            if student_id not in self.students:
+                continue
+            if student_id not in copied:
+                series[student_id] = dict(series.get(student_id, {}))
+                copied.add(student_id)
+            subjects = series[student_id]
+            current = subjects.get(delta["subject"]) or ScoreSeries.empty()
+            current = current.patched(_day(delta["date"]), delta["score_sum"], delta["score_count"], delta["record_count"])
+            if current is None:
+                subjects.pop(delta["subject"], None)
+            else:
+                subjects[delta["subject"]] = current
+        return GradeScoreIndex(self.grade, (version, self.versions[1]), self.students, series)
+
+
+class ScoreIndex:
+    """各年级索引的LRU容器，进程内共享"""
+
+    def __init__(self, max_grades: int = SCORE_INDEX_MAX_GRADES, enabled: bool = SCORE_INDEX_ENABLED):
+        self.max_grades = max_grades
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._grades: "OrderedDict[str, GradeScoreIndex]" = OrderedDict()
+        # 正在后台构建的年级及其线程
+        self._building: Dict[str, threading.Thread] = {}
+        # clear()时加1，之前开始的构建结果不再保存
+        self._generation = 0
+        self.hits = 0
+        self.builds = 0
+        self.patches = 0
+
+    def get(self, db: Session, grade: Optional[str], versions: Mapping[str, int]) -> Optional[GradeScoreIndex]:
+        """
+        返回与versions（查询前读取的data_versions）一致的年级索引
+
+        未启用、未指定年级、缺少版本号，或索引不存在、已过期时返回None，调用方改为直接查询数据库；
+        后两种情况同时在后台线程中（重新）构建该年级的索引，构建完成后的查询才会使用
+        """
+        key = (versions.get(STATS_VERSION), versions.get(STUDENTS))
+        if not self.enabled or not grade or None in key:
+            return None
+        with self._lock:
+            index = self._grades.get(grade)
+            if index is not None and index.versions == key:
+                self._grades.move_to_end(grade)
+                self.hits += 1
+                return index
+            if grade not in self._building:
+                bind = db.get_bind()
+                thread = threading.Thread(
+                    target=self._build, args=(getattr(bind, "engine", bind), grade, self._generation),
+                    name=f"score-index-{grade}", daemon=True
+                )
+                self._building[grade] = thread
+                thread.start()
+        return None
+
+    def _build(self, engine, grade: str, generation: int):
+        """在后台线程中用独立的会话构建年级索引，构建期间有其他写入提交时不保存，由下次查询重新触发"""
+        try:
+            with Session(bind=engine) as db:
+                def current_versions() -> Tuple[Optional[int], Optional[int]]:
+                    rows = dict(db.execute(
+                        select(DataVersion.name, DataVersion.version)
+                        .where(DataVersion.name.in_([STATS_VERSION, STUDENTS]))
+                    ).all())
+                    return rows.get(STATS_VERSION), rows.get(STUDENTS)
+
+                key = current_versions()
+                start = time.perf_counter()
+                index = GradeScoreIndex.build(db, grade, key)
+                unchanged = current_versions() == key
+            with self._lock:
+                self.builds += 1
+                if unchanged and generation == self._generation:
+                    self._grades[grade] = index
+                    self._grades.move_to_end(grade)
+                    while len(self._grades) > self.max_grades:
+                        self._grades.popitem(last=False)
+            logger.info(f"构建成绩索引: 年级={grade}，学生 {len(index.students)} 人，"
+                        f"耗时 {time.perf_counter() - start:.2f}s{'' if unchanged else '，构建期间数据有变化，未保存'}")
+        except Exception as e:
+            logger.error(f"构建成绩索引失败: 年级={grade}: {str(e)}")
+        finally:
+            with self._lock:
+                self._building.pop(grade, None)
+
+    def wait(self, timeout: Optional[float] = None):
+        """等待正在后台构建的索引完成，供测试和性能测试使用"""
+        with self._lock:
+            threads = list(self._building.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    def apply(self, deltas: List[Mapping[str, Any]], version: Optional[int]):
+        """应用一次已提交事务的增量，version为该事务提交后日汇总表的版本号"""
+        with self._lock:
+            for grade, index in list(self._grades.items()):
+                if version is None or index.versions[0] != version - 1:
+                    # 中间有其他进程的写入或无法确定版本，下次查询时重新构建
+                    del self._grades[grade]
+                    continue
+                self._grades[grade] = index.patched(deltas, version)
+            self.patches += 1
+
+    def clear(self):
+        """丢弃全部年级的索引；版本号只在同一个数据库内有意义，切换数据库（如测试）时也需要调用"""
+        with self._lock:
+            self._grades.clear()
+            self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "grades": list(self._grades),
+                "building": list(self._building),
+                "hits": self.hits,
+                "builds": self.builds,
+                "patches": self.patches,
+                "series": sum(len(subjects) for index in self._grades.values() for subjects in index.series.values())
+            }
+
+
+# 全局索引实例
+score_index = ScoreIndex()
+
+
+def record_index_deltas(db: Session, deltas: List[Mapping[str, Any]]):
+    """记录本事务写入日汇总表的增量，提交后应用到索引；由apply_stats_deltas调用"""
+    db.info.setdefault(PENDING_KEY, []).append((db.get_nested_transaction(), deltas))
+    mark_written(db, STATS_VERSION)
+
+
+def record_index_rebuilt(db: Session):
+    """汇总表被整体重建，提交后丢弃全部索引；由rebuild_stats调用"""
+    db.info[REBUILT_KEY] = True
+    mark_written(db, STATS_VERSION)
+
+
+def _within(transaction: Optional[SessionTransaction], ancestor: SessionTransaction) -> bool:
+    while transaction is not None:
+        if transaction is ancestor:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session):
+    pending = session.info.pop(PENDING_KEY, None)
+    rebuilt = session.info.pop(REBUILT_KEY, False)
+    # 写入日汇总表的事务提交前，models中的before_commit已把它的版本号加1
+    version = session.info.get(COMMITTED_VERSIONS_KEY, {}).get(STATS_VERSION)
+    if rebuilt:
+        score_index.clear()
+    elif pending:
+        score_index.apply([delta for _, deltas in pending for delta in deltas], version)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session: Session, previous_transaction: SessionTransaction):
+    if not previous_transaction.nested:
+        for key in (PENDING_KEY, REBUILT_KEY):
+            session.info.pop(key, None)
+        return
+    # savepoint回滚：其中写入的增量已经撤销
+    pending = session.info.get(PENDING_KEY)
+    if pending:
+        session.info[PENDING_KEY] = [item for item in pending if not _within(item[0], previous_transaction)]
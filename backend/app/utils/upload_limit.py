@@ -0,0 +1,60 @@
+"""
+上传大小限制
+
+UploadFile参数在调用接口函数之前就已经由Starlette把整个请求体写入临时文件，在接口中检查大小时
+超大的文件已经占用了相应的磁盘空间和传输时间。UploadLimitMiddleware在读取请求体之前检查
+Content-Length，超过上限直接返回413；没有Content-Length（分块传输）或声明不实时，在读取过程中
+累计已接收的字节数，超过上限即停止读取并返回413。
+"""
+from typing import Dict
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+def upload_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"导入文件不能超过 {max_bytes // (1024 * 1024)}MB")
+
+
+class UploadLimitMiddleware:
+    """limits为{路径: 请求体字节数上限}，只检查这些路径上的请求"""
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        max_bytes = self.limits.get(path)
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            error = upload_too_large(max_bytes)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # 在解析表单时抛出，由FastAPI的异常处理返回413
+                    raise upload_too_large(max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
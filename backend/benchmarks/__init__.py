@@ -0,0 +1 @@
+# 初始化benchmarks包
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+同步与异步接口的负载测试
+
+在一次性数据库上启动uvicorn，用200个并发客户端分别请求同步接口和/async下的异步版本，
+统计每秒请求数和p99延迟。需要先安装benchmarks/requirements.txt中的依赖。
+
+用法（在backend目录下执行）：
+    python -m benchmarks.bench_async_load
+    python -m benchmarks.bench_async_load --clients 200 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import create_db_engine
+from app.core.migrations import run_migrations
+from app.utils.bulk_import import bulk_import_records
+from benchmarks.bench_concurrency import percentile
+from benchmarks.bench_import import build_import_frame
+from benchmarks.common import seed_people
+
+# (方法, 路径, 参数)，异步版本在路径前加/async
+SCENARIOS = [
+    ("GET", "/records/", {"params": {"grade": "高一", "start_date": "2024-09-01", "end_date": "2024-09-07"}}),
+    ("POST", "/records/summary", {"json": {"grade": "高一", "class_name": "高一1班"}}),
+    ("GET", "/students/", {"params": {"grade": "高一", "page": 3}}),
+    ("GET", "/students/grades/all", {}),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare_database(path: str, rows: int):
+    engine = create_db_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    session_factory = sessionmaker(bind=engine)
+    people = seed_people(session_factory, student_count=600)
+    with session_factory() as db:
+        bulk_import_records(db, build_import_frame(rows, people["students"], people["teachers"], invalid_ratio=0))
+        db.commit()
+    engine.dispose()
+
+
+async def wait_until_ready(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get("/students/grades/all")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("服务启动超时")
+
+
+async def load(base_url: str, method: str, path: str, kwargs, clients: int, requests_per_client: int):
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal errors
+            for _ in range(requests_per_client):
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, **kwargs)
+                    errors += response.status_code >= 400
+                except httpx.TransportError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(clients)])
+        elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, percentile(latencies, 99), errors
+
+
+async def run(base_url: str, clients: int, requests_per_client: int):
+    await wait_until_ready(base_url)
+    print(f"{'接口':<24}{'版本':<6}{'请求/秒':>10}{'p99(ms)':>10}{'错误':>6}")
+    for method, path, kwargs in SCENARIOS:
+        for label, prefix in (("同步", ""), ("异步", "/async")):
+            rps, p99, errors = await load(base_url, method, prefix + path, kwargs, clients, requests_per_client)
+            print(f"{path:<24}{label:<6}{rps:>10.1f}{p99:>10.1f}{errors:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200, help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=10, help="每个客户端的请求数")
+    parser.add_argument("--rows", type=int, default=50000, help="作业记录行数")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    port = free_port()
+    server = None
+    try:
+        prepare_database(path, args.rows)
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            env=env
+        )
+        asyncio.run(run(f"http://127.0.0.1:{port}", args.clients, args.requests))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+并发读写性能测试：批量导入进行时汇总查询的延迟
+
+分别在关闭和开启SQLite性能配置（WAL等）的数据库上运行：一个线程持续分批导入作业记录，
+多个线程同时请求学生成绩汇总，统计读请求延迟和"database is locked"错误数。
+
+用法（在backend目录下执行）：
+    python -m benchmarks.bench_concurrency
+    python -m benchmarks.bench_concurrency --readers 8 --rows 200000
+"""
+import argparse
+import statistics
+import threading
+import time
+from datetime import date
+
+from fastapi import Response
+from sqlalchemy.exc import OperationalError
+
+from app.api.records import get_student_score_summary
+from app.schemas.schemas import RecordFilter, SummaryPage
+from app.utils.bulk_import import bulk_import_records
+from benchmarks.bench_import import build_import_frame
+from benchmarks.common import endpoint_request, seed_people, temp_database
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_once(performance_profile: bool, readers: int, rows: int, batch_rows: int):
+    with temp_database(performance_profile=performance_profile) as session_factory:
+        people = seed_people(session_factory, student_count=600)
+        frame = build_import_frame(rows, people["students"], people["teachers"], invalid_ratio=0)
+        filter = RecordFilter(grade="高一", start_date=date(2024, 9, 1), end_date=date(2025, 3, 1))
+
+        writing = threading.Event()
+        writing.set()
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def writer():
+            try:
+                for start in range(0, rows, batch_rows):
+                    with session_factory() as db:
+                        bulk_import_records(db, frame.iloc[start:start + batch_rows])
+                        db.commit()
+            finally:
+                writing.clear()
+
+        def reader():
+            while writing.is_set():
+                start = time.perf_counter()
+                try:
+                    with session_factory() as db:
+                        get_student_score_summary(filter, endpoint_request("POST", "/records/summary"), Response(), db, page=SummaryPage())
+                except OperationalError as e:
+                    with lock:
+                        errors.append(str(e.orig))
+                    continue
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    label = "开启性能配置" if performance_profile else "默认配置"
+    print(f"{label}: 导入 {rows} 行耗时 {elapsed:.2f}s, 读请求 {len(latencies)} 次, 错误 {len(errors)} 次")
+    if latencies:
+        print(f"    延迟(ms) p50={statistics.median(latencies):.1f} p95={percentile(latencies, 95):.1f} "
+              f"p99={percentile(latencies, 99):.1f} max={max(latencies):.1f}")
+    for message in sorted(set(errors))[:3]:
+        print(f"    错误: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=4, help="并发读线程数")
+    parser.add_argument("--rows", type=int, default=100000, help="导入总行数")
+    parser.add_argument("--batch-rows", type=int, default=5000, help="每次提交的行数")
+    args = parser.parse_args()
+    for performance_profile in (False, True):
+        run_once(performance_profile, args.readers, args.rows, args.batch_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+导出格式吞吐量测试：同一份学科日期汇总分别生成xlsx、csv、jsonl、parquet，再读回
+
+行数据按学科日期汇总的结构生成（每个学生一行，每天一列分数），不经过数据库，只比较各格式的
+编码和读取速度以及文件大小。读取使用pandas（xlsx为openpyxl引擎）。
+
+用法（在backend目录下执行）：
+    python -m benchmarks.bench_export_formats
+    python -m benchmarks.bench_export_formats --students 20000 --days 200
+"""
+import argparse
+import io
+import random
+
+import pandas as pd
+
+from app.utils.export_formats import EXPORT_FORMATS, iter_export, negotiate_format
+from benchmarks.common import date_range, timed
+
+
+def build_sheet(students: int, days: int):
+    rng = random.Random(0)
+    dates = date_range(days)
+    header = ["ID", "学号", "姓名", "年级", "班级", *[d.strftime("%Y-%m-%d") for d in dates], "总分", "次数"]
+    rows = []
+    for i in range(students):
+        scores = [float(rng.randint(0, 10)) if rng.random() > 0.1 else None for _ in dates]
+        rows.append([
+            i + 1, str(10001 + i), f"学生{10001 + i}", "高一", f"高一{i % 10 + 1}班",
+            *scores, sum(score or 0 for score in scores), sum(score is not None for score in scores)
+        ])
+    return header, rows
+
+
+def write(export_format: str, header, rows) -> bytes:
+    return b"".join(iter_export(export_format, "Sheet1", header, iter(rows)))
+
+
+def read(export_format: str, data: bytes) -> pd.DataFrame:
+    buffer = io.BytesIO(data)
+    if export_format == "xlsx":
+        return pd.read_excel(buffer, engine="openpyxl")
+    if export_format == "csv":
+        return pd.read_csv(buffer)
+    if export_format == "jsonl":
+        return pd.read_json(buffer, lines=True)
+    return pd.read_parquet(buffer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=5000, help="行数（学生人数）")
+    parser.add_argument("--days", type=int, default=100, help="日期列数")
+    args = parser.parse_args()
+
+    header, rows = build_sheet(args.students, args.days)
+    cells = len(rows) * len(header)
+    print(f"{len(rows)} 行 x {len(header)} 列")
+    for export_format in EXPORT_FORMATS:
+        try:
+            negotiate_format(export_format)
+        except ValueError as e:
+            print(f"{export_format:<8} 跳过: {e}")
+            continue
+        data, write_elapsed = timed(write, export_format, header, rows)
+        frame, read_elapsed = timed(read, export_format, data)
+        assert len(frame) == len(rows)
+        print(f"{export_format:<8} 大小 {len(data) / 1024 / 1024:7.2f}MB  "
+              f"写入 {write_elapsed:6.2f}s ({len(rows) / write_elapsed:9.0f} 行/s, {cells / write_elapsed / 1e6:5.2f}M 单元格/s)  "
+              f"读取 {read_elapsed:6.2f}s ({len(rows) / read_elapsed:9.0f} 行/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+等级计算性能测试：逐个调用calculate_grade与批量calculate_grades的对比
+
+用法（在backend目录下执行）：
+    python -m benchmarks.bench_grading
+    python -m benchmarks.bench_grading 10000 100000 1000000
+"""
+import sys
+
+import numpy as np
+
+from app.utils.grade_calculator import GradeCalculator
+from benchmarks.common import timed
+
+DEFAULT_SIZES = [100000]
+
+
+def grade_one_by_one(totals):
+    grades = [GradeCalculator.calculate_grade(total) for total in totals]
+    return grades, [GradeCalculator.get_grade_color(grade) for grade in grades]
+
+
+def run(sizes):
+    rng = np.random.default_rng(0)
+    max_total = GradeCalculator.calculate_total_max_score()
+    for count in sizes:
+        totals = rng.uniform(0, max_total, count)
+        (loop_grades, loop_colors), loop_elapsed = timed(grade_one_by_one, totals.tolist())
+        (grades, colors), batch_elapsed = timed(GradeCalculator.calculate_grades, totals)
+        same = list(grades) == loop_grades and list(colors) == loop_colors
+        print(f"{count:>9} 名学生  逐个 {loop_elapsed * 1000:9.2f}ms  批量 {batch_elapsed * 1000:8.2f}ms  "
+              f"加速 {loop_elapsed / batch_elapsed:6.1f}x  结果一致: {same}")
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
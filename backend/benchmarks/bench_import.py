@@ -0,0 +1,92 @@
+"""
+导入性能测试：整张表一次校验写入（Excel路径），以及CSV按块读取、每块单独提交的导入
+
+用法（在backend目录下执行）：
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import 1000 10000
+"""
+import random
+import sys
+import tempfile
+
+import pandas as pd
+
+from app.utils.bulk_import import bulk_import_records, import_record_chunks, read_csv_chunks, validate_records_frame
+from benchmarks.common import SUBJECTS, date_range, seed_people, temp_database, timed
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def build_import_frame(rows: int, student_ids, teacher_ids, invalid_ratio: float = 0.01) -> pd.DataFrame:
+    """构造与导入模板列名一致的DataFrame，按比例混入不存在的学号"""
+    rng = random.Random(rows)
+    dates = date_range(200)
+    data = []
+    for i in range(rows):
+        student_id = rng.choice(student_ids)
+        if rng.random() < invalid_ratio:
+            student_id = "99999999"
+        subject_index = rng.randrange(len(SUBJECTS))
+        record_date = rng.choice(dates)
+        data.append({
+            "学号": student_id,
+            "姓名": f"学生{student_id}",
+            "学科": SUBJECTS[subject_index],
+            "分数": rng.randint(0, 10),
+            "类型": "日常作业",
+            "日期": record_date,
+            "批次": f"批次{record_date.strftime('%Y%m%d')}",
+            "教师ID": teacher_ids[subject_index]
+        })
+    return pd.DataFrame(data)
+
+
+def check_mixed_dates():
+    """同一列中混用多种日期格式时每一行都应解析成功，不能按第一行推断格式"""
+    formats = [
+        lambda d: d.isoformat(),
+        lambda d: d.strftime('%Y/%m/%d'),
+        lambda d: f"{d.year}/{d.month}/{d.day}",
+        lambda d: d.strftime('%Y.%m.%d'),
+        lambda d: d
+    ]
+    frame = build_import_frame(100, ["10001"], [f"T{i}" for i in range(len(SUBJECTS))], invalid_ratio=0)
+    expected = list(frame["日期"])
+    frame["日期"] = [formats[i % len(formats)](d) for i, d in enumerate(frame["日期"])]
+    valid, failed = validate_records_frame(frame, {"10001"}, set(frame["教师ID"]))
+    assert not failed, f"日期解析失败: {failed[:3]}"
+    assert list(valid["date"]) == expected, "日期解析结果与原日期不一致"
+    print("混合格式的日期列解析 OK")
+
+
+def import_csv(db, path: str, mode: str = 'insert'):
+    with open(path, 'rb') as f:
+        return import_record_chunks(db, read_csv_chunks(f), mode=mode)
+
+
+def run(sizes):
+    check_mixed_dates()
+    for rows in sizes:
+        with temp_database() as session_factory:
+            people = seed_people(session_factory, student_count=600)
+            df = build_import_frame(rows, people["students"], people["teachers"])
+            with session_factory() as db:
+                (imported, failed), elapsed = timed(bulk_import_records, db, df)
+                db.commit()
+            print(f"{rows:>8} 行  导入 {imported:>8}  失败 {len(failed):>6}  "
+                  f"耗时 {elapsed:8.3f}s  {rows / elapsed:>12,.0f} 行/秒")
+
+        with temp_database() as session_factory, tempfile.NamedTemporaryFile(suffix='.csv') as csv_file:
+            people = seed_people(session_factory, student_count=600)
+            build_import_frame(rows, people["students"], people["teachers"]).to_csv(csv_file.name, index=False)
+            # 第二次按upsert模式导入同一文件时全部记录内容未变化，只有查询没有写入
+            for label, mode in (("CSV分块", "insert"), ("CSV重复导入", "upsert")):
+                with session_factory() as db:
+                    result, elapsed = timed(import_csv, db, csv_file.name, mode)
+                print(f"{rows:>8} 行  导入 {result['imported_count']:>8}  失败 {len(result['failed_records']):>6}  "
+                      f"耗时 {elapsed:8.3f}s  {rows / elapsed:>12,.0f} 行/秒  ({label}，新增 {result['inserted_count']}，"
+                      f"更新 {result['updated_count']}，未变化 {result['unchanged_count']})")
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
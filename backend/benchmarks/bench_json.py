@@ -0,0 +1,114 @@
+"""
+列表接口序列化性能测试：ORM对象 + response_model与Core数据行 + orjson的对比
+
+每种方式都从数据库读取全部作业记录并编码为JSON字节串，每次使用新的会话：
+    ORM + response_model   原来的做法：select(Record)得到ORM对象，按response_model逐个从属性校验后编码
+    Core + orjson          当前接口的做法：select()读取数据行，转换为字典后用orjson编码
+    Core + 整批校验         同上，编码前用TypeAdapter整批校验（FAST_JSON_VALIDATE=1）
+    Core + 标准库json       同上，用标准库json编码，对比orjson的收益
+
+用法（在backend目录下执行）：
+    python -m benchmarks.bench_json
+    python -m benchmarks.bench_json 1000 10000 100000 --repeat 5
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from app.models.models import Record
+from app.schemas.schemas import Record as RecordSchema
+from app.utils.fast_json import dumps, serialize_rows
+from benchmarks.common import SUBJECTS, date_range, seed_people, temp_database
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def seed_records(session_factory, count: int, student_ids, teacher_ids):
+    """写入count条作业记录，学生轮流使用，学生用完后换到下一天"""
+    rng = random.Random(0)
+    start = date_range(1)[0]
+    rows = [
+        {
+            "student_id": student_ids[i % len(student_ids)],
+            "name": f"学生{student_ids[i % len(student_ids)]}",
+            "subject": SUBJECTS[0],
+            "score": float(rng.randint(0, 10)) if rng.random() >= 0.05 else None,
+            "type": "日常作业",
+            "date": start + timedelta(days=i // len(student_ids)),
+            "batch": None,
+            "teacher_id": teacher_ids[0]
+        }
+        for i in range(count)
+    ]
+    with session_factory() as db:
+        for offset in range(0, len(rows), 50000):
+            db.execute(Record.__table__.insert(), rows[offset:offset + 50000])
+        db.commit()
+
+
+def orm_response_model(db) -> bytes:
+    adapter = TypeAdapter(List[RecordSchema])
+    records = db.execute(select(Record)).scalars().all()
+    return adapter.dump_json(adapter.validate_python(records, from_attributes=True))
+
+
+def core_rows(db, validate: bool) -> bytes:
+    return dumps(serialize_rows(RecordSchema, db.execute(select(*Record.__table__.c)).all(), validate=validate))
+
+
+def core_stdlib_json(db) -> bytes:
+    items = serialize_rows(RecordSchema, db.execute(select(*Record.__table__.c)).all())
+    return json.dumps(items, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+CASES = {
+    "ORM + response_model": orm_response_model,
+    "Core + orjson": lambda db: core_rows(db, validate=False),
+    "Core + 整批校验": lambda db: core_rows(db, validate=True),
+    "Core + 标准库json": core_stdlib_json,
+}
+
+
+def measure(session_factory, func, repeat: int):
+    durations = []
+    for _ in range(repeat):
+        with session_factory() as db:
+            start = time.perf_counter()
+            data = func(db)
+            durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations), data
+
+
+def run(count: int, repeat: int):
+    with temp_database() as session_factory:
+        people = seed_people(session_factory, student_count=1000, classes_per_grade=10)
+        seed_records(session_factory, count, people["students"], people["teachers"])
+        baseline = None
+        for name, func in CASES.items():
+            elapsed, data = measure(session_factory, func, repeat)
+            if baseline is None:
+                baseline, expected = elapsed, json.loads(data)
+            else:
+                assert json.loads(data) == expected, f"{name} 的结果与ORM + response_model不一致"
+            print(f"{count:>7} 条记录  {name:<22} {elapsed:9.1f}ms  {len(data) / 1024 / 1024:6.2f}MB  "
+                  f"加速 {baseline / elapsed:5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="作业记录条数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取中位数")
+    args = parser.parse_args()
+    for count in args.sizes:
+        run(count, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+分页性能测试：OFFSET分页与游标分页在不同翻页深度下的耗时
+
+用法（在backend目录下执行）：
+    python -m benchmarks.bench_pagination
+    python -m benchmarks.bench_pagination --rows 500000 --page-size 100
+"""
+import argparse
+import statistics
+import time
+from datetime import date
+
+from app.api.records import RECORD_PAGE_KEYS, _records_stmt
+from app.core.migrations import run_migrations
+from app.schemas.schemas import RecordFilter
+from app.utils.bulk_import import bulk_import_records
+from app.utils.pagination import keyset_page_stmt
+from benchmarks.bench_import import build_import_frame
+from benchmarks.common import seed_people, temp_database
+
+
+def measure(session_factory, stmt, repeat: int = 5) -> float:
+    """多次执行查询，返回耗时中位数（毫秒）"""
+    durations = []
+    with session_factory() as db:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            db.execute(stmt).scalars().all()
+            durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="作业记录总行数")
+    parser.add_argument("--page-size", type=int, default=100, help="每页条数")
+    args = parser.parse_args()
+
+    with temp_database() as session_factory:
+        run_migrations(session_factory.kw["bind"])
+        people = seed_people(session_factory, student_count=600)
+        frame = build_import_frame(args.rows, people["students"], people["teachers"], invalid_ratio=0)
+        with session_factory() as db:
+            bulk_import_records(db, frame)
+            db.commit()
+
+        stmt = _records_stmt(RecordFilter(grade="高一", start_date=date(2024, 1, 1), end_date=date(2026, 1, 1)))
+        with session_factory() as db:
+            keys = [tuple(row) for row in db.execute(
+                stmt.with_only_columns(*RECORD_PAGE_KEYS).order_by(*RECORD_PAGE_KEYS)
+            )]
+        print(f"{'页码':>8} {'OFFSET(ms)':>12} {'游标(ms)':>10}")
+        page = 1
+        while (page - 1) * args.page_size < len(keys):
+            offset = (page - 1) * args.page_size
+            offset_stmt = stmt.order_by(*RECORD_PAGE_KEYS).offset(offset).limit(args.page_size)
+            after = keys[offset - 1] if offset else None
+            cursor_stmt = keyset_page_stmt(stmt, RECORD_PAGE_KEYS, after, args.page_size)
+            print(f"{page:>8} {measure(session_factory, offset_stmt):>12.2f} "
+                  f"{measure(session_factory, cursor_stmt):>10.2f}")
+            page *= 4
+
+
+if __name__ == "__main__":
+    main()
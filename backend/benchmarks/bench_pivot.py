@@ -0,0 +1,153 @@
+"""
+汇总透视性能测试：逐行拼装字典与SQL端透视的对比
+
+对学生成绩汇总（学科为列）和学科日期汇总（日期为列）两个接口，分别计时原来的逐行汇总
+（build_student_summary_rows / build_subject_summary_rows）和当前接口使用的json_group_object透视。
+
+用法（在backend目录下执行）：
+    python -m benchmarks.bench_pivot
+    python -m benchmarks.bench_pivot 60 600 6000 --days 60
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+from fastapi import Response
+
+from app.api import records
+from app.models.models import RecordDailyStat
+from app.schemas.schemas import RecordFilter, SummaryPage
+from app.utils.aggregates import stats_table
+from benchmarks.common import SUBJECTS, date_range, endpoint_request, seed_people, temp_database
+
+DEFAULT_SIZES = [60, 600, 6000]
+
+
+def build_student_summary_rows(results) -> List[Dict[str, Any]]:
+    """原来的逐行汇总：把按学生、学科分组的平均分整理成每个学生一行"""
+    student_scores = {}
+    for r in results:
+        if r.student_id not in student_scores:
+            student_scores[r.student_id] = {
+                "student_id": r.student_id,
+                "name": r.name,
+                "grade": r.grade,
+                "class_name": r.class_name,
+                "group": r.group,
+                "total_score": 0
+            }
+        student_scores[r.student_id][r.subject] = r.avg_score
+        student_scores[r.student_id]["total_score"] += r.avg_score or 0
+
+    # 批量计算等级并添加颜色
+    return records._add_grades(list(student_scores.values()))
+
+
+def build_subject_summary_rows(results) -> List[Dict[str, Any]]:
+    """原来的逐行汇总：把每个学生每天的分数整理成每个学生一行，日期作为列"""
+    # 如果没有记录，返回空列表
+    if not results:
+        return []
+
+    # 按学生ID分组结果
+    student_scores = {}
+    for r in results:
+        if r.student_id not in student_scores:
+            student_scores[r.student_id] = {
+                "student_id": r.student_id,
+                "name": r.name,
+                "grade": r.grade,
+                "class_name": r.class_name,
+                "total_score": 0,
+                "count": 0
+            }
+
+        # 添加日期分数
+        date_str = r.date.strftime("%Y-%m-%d")
+        student_scores[r.student_id][date_str] = r.score
+
+        # 更新总分和计数
+        if r.score is not None:
+            student_scores[r.student_id]["total_score"] += r.score
+            student_scores[r.student_id]["count"] += r.score_count
+
+    # 转换为列表并添加ID
+    summary = []
+    for i, (_, score) in enumerate(student_scores.items(), 1):
+        score["id"] = i
+        summary.append(score)
+
+    return summary
+
+
+def seed_stats(session_factory, student_ids, subjects, days):
+    """直接写入日汇总表，每个学生每个学科每天一行，约5%的行没有分数"""
+    rng = random.Random(len(student_ids))
+    rows = []
+    for student_id in student_ids:
+        for subject in subjects:
+            for day in days:
+                scored = rng.random() >= 0.05
+                rows.append({
+                    "student_id": student_id, "subject": subject, "date": day,
+                    "score_sum": float(rng.randint(0, 10)) if scored else 0.0,
+                    "score_count": int(scored), "record_count": 1
+                })
+    with session_factory() as db:
+        for start in range(0, len(rows), 50000):
+            db.execute(stats_table.insert(), rows[start:start + 50000])
+        db.commit()
+
+
+def measure(func, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def run(student_count: int, days: int, repeat: int):
+    day_list = date_range(days)
+    with temp_database() as session_factory:
+        people = seed_people(session_factory, student_count=student_count, classes_per_grade=10)
+        seed_stats(session_factory, people["students"], SUBJECTS[:3], day_list)
+        summary_filter = RecordFilter(start_date=day_list[0], end_date=day_list[-1])
+        subject_filter = RecordFilter(subject=SUBJECTS[0], start_date=day_list[0], end_date=day_list[-1])
+        with session_factory() as db:
+            cases = {
+                "学生成绩汇总": (
+                    lambda: build_student_summary_rows(
+                        db.execute(records._student_summary_stmt(summary_filter)).all()),
+                    lambda: records.get_student_score_summary(
+                        summary_filter, endpoint_request("POST", "/records/summary"), Response(), db, page=SummaryPage())
+                ),
+                "学科日期汇总": (
+                    lambda: build_subject_summary_rows(
+                        db.execute(records._subject_summary_stmt(subject_filter)
+                                   .order_by(RecordDailyStat.student_id)).all()),
+                    lambda: records.get_subject_score_summary_by_date(
+                        subject_filter, endpoint_request("POST", "/records/subject-summary"), Response(), db, page=SummaryPage())
+                ),
+            }
+            for name, (loop, pivot) in cases.items():
+                loop_ms, pivot_ms = measure(loop, repeat), measure(pivot, repeat)
+                print(f"{student_count:>6} 名学生  {name}  逐行 {loop_ms:9.1f}ms  透视 {pivot_ms:9.1f}ms  "
+                      f"加速 {loop_ms / pivot_ms:5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="学生人数")
+    parser.add_argument("--days", type=int, default=60, help="日期数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取中位数")
+    args = parser.parse_args()
+    for student_count in args.sizes:
+        run(student_count, args.days, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+成绩索引性能测试：拖动日期滑块时的汇总查询
+
+模拟在一个年级上反复选择随机日期范围，分别计时直接聚合日汇总表（SQL透视）和从成绩前缀和索引计算
+的学生成绩汇总、学科日期汇总，并给出索引的构建耗时和应用一次写入增量的耗时。两种方式的结果会
+逐项比较，浮点误差在1e-9以内视为一致。
+
+用法（在backend目录下执行）：
+    python -m benchmarks.bench_score_index
+    python -m benchmarks.bench_score_index 600 6000 --days 120 --ranges 20
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import date
+
+from fastapi import Response
+
+from app.api import records
+from app.core.database import begin_write_transaction
+from app.models.models import STATS_VERSION
+from app.schemas.schemas import RecordFilter, SummaryPage
+from app.utils.aggregates import apply_stats_deltas
+from app.utils.etag import RECORDS, STUDENTS, data_versions
+from app.utils.score_index import GradeScoreIndex, score_index
+from benchmarks.bench_pivot import seed_stats
+from benchmarks.common import SUBJECTS, date_range, endpoint_request, seed_people, temp_database, timed
+
+DEFAULT_SIZES = [600, 6000]
+GRADE = "高一"
+
+
+def close(a, b) -> bool:
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(close(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(close(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return a is not None and b is not None and abs(a - b) <= 1e-9
+    return a == b
+
+
+def random_filters(days, count: int, rng: random.Random):
+    filters = []
+    for _ in range(count):
+        start, end = sorted(rng.sample(range(len(days)), 2))
+        filters.append(RecordFilter(grade=GRADE, start_date=days[start], end_date=days[end]))
+    return filters
+
+
+def call(db, endpoint, filter: RecordFilter, path: str) -> bytes:
+    return endpoint(filter, endpoint_request("POST", path), Response(), db, page=SummaryPage()).body
+
+
+def measure(db, endpoint, filters, path: str, use_index: bool):
+    score_index.enabled = use_index
+    durations, bodies = [], []
+    for filter in filters:
+        start = time.perf_counter()
+        bodies.append(call(db, endpoint, filter, path))
+        durations.append((time.perf_counter() - start) * 1000)
+    score_index.enabled = True
+    return statistics.median(durations), bodies
+
+
+def run(student_count: int, days: int, range_count: int):
+    day_list = date_range(days)
+    rng = random.Random(student_count)
+    score_index.clear()
+    with temp_database() as session_factory:
+        people = seed_people(session_factory, student_count=student_count, classes_per_grade=10)
+        seed_stats(session_factory, people["students"], SUBJECTS[:3], day_list)
+        with session_factory() as db:
+            versions = data_versions(db, RECORDS, STUDENTS, STATS_VERSION)
+            start = time.perf_counter()
+            index = GradeScoreIndex.build(db, GRADE, (versions[STATS_VERSION], versions[STUDENTS]))
+            build_ms = (time.perf_counter() - start) * 1000
+            print(f"{student_count:>6} 名学生 {days} 天  构建年级索引 {build_ms:8.1f}ms  "
+                  f"{sum(len(subjects) for subjects in index.series.values())} 个序列")
+
+            filters = random_filters(day_list, range_count, rng)
+            subject_filters = [f.model_copy(update={"subject": SUBJECTS[0]}) for f in filters]
+            # 先查询一次，触发后台构建接口使用的索引；这次查询不等待构建，直接查询数据库
+            _, first_ms = timed(call, db, records.get_student_score_summary, filters[0], "/records/summary")
+            score_index.wait()
+            print(f"{student_count:>6} 名学生  触发构建的首次查询 {first_ms * 1000:8.1f}ms")
+            cases = {
+                "学生成绩汇总": (records.get_student_score_summary, filters, "/records/summary"),
+                "学科日期汇总": (records.get_subject_score_summary_by_date, subject_filters, "/records/subject-summary"),
+            }
+            for name, (endpoint, case_filters, path) in cases.items():
+                sql_ms, expected = measure(db, endpoint, case_filters, path, use_index=False)
+                index_ms, actual = measure(db, endpoint, case_filters, path, use_index=True)
+                assert all(close(json.loads(a), json.loads(e)) for a, e in zip(actual, expected)), f"{name} 的结果不一致"
+                print(f"{student_count:>6} 名学生  {name}  SQL {sql_ms:8.1f}ms  索引 {index_ms:8.1f}ms  "
+                      f"加速 {sql_ms / index_ms:6.2f}x")
+
+            # 一次写入：每个学生一条新记录，提交后应用到索引
+            student_ids = [student_id for student_id in people["students"] if student_id in index.students]
+            deltas = [
+                {"student_id": student_id, "subject": SUBJECTS[0], "date": date(2025, 1, 1),
+                 "score_sum": 5.0, "score_count": 1, "record_count": 1}
+                for student_id in student_ids
+            ]
+            begin_write_transaction(db)
+            apply_stats_deltas(db, deltas)
+            start = time.perf_counter()
+            db.commit()
+            patch_ms = (time.perf_counter() - start) * 1000
+            builds = score_index.stats()["builds"]
+            call(db, records.get_student_score_summary, filters[0], "/records/summary")
+            assert score_index.stats()["builds"] == builds, "写入后索引被重新构建，而不是应用增量"
+            print(f"{student_count:>6} 名学生  提交并应用 {len(deltas)} 条增量 {patch_ms:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="学生人数")
+    parser.add_argument("--days", type=int, default=120, help="日期数")
+    parser.add_argument("--ranges", type=int, default=20, help="随机日期范围的个数，取耗时的中位数")
+    args = parser.parse_args()
+    for student_count in args.sizes:
+        run(student_count, args.days, args.ranges)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+写入路径的正确性检查，并依次运行SQL执行计划和语句数检查
+
+在一次性的SQLite数据库上通过TestClient调用接口，检查：
+    - 按自然键写入：默认插入时已有记录计为失败，upsert模式下新增、更新、未变化的行数正确
+    - 导入时每块单独提交，块与块之间其他连接可以写入，中途出错时已提交的块保留
+    - 导入、批量新增、批量修改（PATCH）和批量删除（DELETE）后，日汇总表与records的实时统计一致（check_stats）
+    - 条件请求：带If-None-Match的请求返回304，写入后同一请求返回200和新的ETag
+任何一项失败时以非0状态码退出，可在CI中使用。
+
+用法（在backend目录下执行）：
+    python -m benchmarks.check_all
+    python -m benchmarks.check_all --only writes    # 只运行写入路径的检查
+"""
+import argparse
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.database import create_async_db_engine, get_async_db, get_db
+from app.core.migrations import run_migrations
+from app.main import app
+from app.models.models import Record
+from app.utils.aggregates import check_stats
+from app.utils.bulk_import import import_record_chunks, iter_frame_chunks
+from app.utils.score_index import score_index
+from benchmarks import check_query_counts, check_query_plans
+from benchmarks.bench_import import build_import_frame
+from benchmarks.common import seed_people, temp_database
+
+
+class CheckFailed(AssertionError):
+    pass
+
+
+def expect(condition: bool, message: str):
+    if not condition:
+        raise CheckFailed(message)
+
+
+def expect_status(response, status: int):
+    expect(response.status_code == status, f"状态码 {response.status_code}，期望 {status}: {response.text[:200]}")
+
+
+def check_upsert_counts(client: TestClient, session_factory, people) -> str:
+    """同一个CSV先按默认模式导入两次，再按upsert模式修改后导入"""
+    frame = build_import_frame(300, people["students"], people["teachers"], invalid_ratio=0)
+    frame = frame.drop_duplicates(["学号", "学科", "日期", "批次"])
+    rows = len(frame)
+
+    def import_csv(data, **params):
+        response = client.post("/records/import", params=params, files={"file": ("records.csv", data, "text/csv")})
+        expect_status(response, 200)
+        return response.json()
+
+    csv = frame.to_csv(index=False).encode()
+    result = import_csv(csv)
+    expect((result["inserted_count"], result["updated_count"], result["unchanged_count"]) == (rows, 0, 0),
+           f"首次导入: {result['message']}")
+    result = import_csv(csv)
+    expect(result["imported_count"] == 0 and len(result["failed_records"]) == rows,
+           f"默认模式重复导入应全部计为失败: {result['message']}")
+
+    changed = frame.copy()
+    changed.loc[changed.index[:10], "分数"] = changed["分数"].iloc[:10] + 100
+    result = import_csv(changed.to_csv(index=False).encode(), mode="upsert")
+    expect((result["inserted_count"], result["updated_count"], result["unchanged_count"]) == (0, 10, rows - 10),
+           f"upsert重复导入: {result['message']}")
+
+    # 第一行已在upsert导入中改为原分数+100，这里改回原分数，应为updated
+    first = frame.iloc[0]
+    record = {
+        "student_id": first["学号"], "name": first["姓名"], "subject": first["学科"], "score": int(first["分数"]),
+        "type": first["类型"], "date": first["日期"].isoformat(), "batch": first["批次"], "teacher_id": first["教师ID"]
+    }
+    new_record = {**record, "batch": "检查新增"}
+    response = client.post("/records/bulk", params={"mode": "upsert"},
+                           json={"records": [record, {**new_record, "score": 1}, {**new_record, "score": 2}]})
+    expect_status(response, 200)
+    statuses = [result["status"] or result["error"] for result in response.json()["results"]]
+    expect(statuses[0] == "updated" and statuses[2] == "inserted" and not response.json()["results"][1]["success"],
+           f"批量upsert的逐行结果: {statuses}")
+    expect_status(client.post("/records/records", json=new_record), 409)
+
+    with session_factory() as db:
+        mismatches = check_stats(db)
+    expect(not mismatches, f"导入后日汇总表不一致: {mismatches[:3]}")
+    return f"导入 {rows} 行，upsert 更新 10 行"
+
+
+def check_import_commits(client: TestClient, session_factory, people) -> str:
+    """导入时每块单独提交：块与块之间其他连接可以写入，中途出错时已提交的块保留"""
+    frame = build_import_frame(200, people["students"], people["teachers"], invalid_ratio=0)
+    frame = frame.assign(批次="检查分块提交").drop_duplicates(["学号", "学科", "日期"])
+    chunk_rows = 20
+
+    def write_between_chunks(result):
+        with session_factory() as other:
+            other.connection().exec_driver_sql("PRAGMA busy_timeout=200")
+            other.execute(Record.__table__.update().where(Record.id == -1).values(score=0))
+            other.commit()
+
+    def interrupted():
+        chunks = iter_frame_chunks(frame, chunk_rows)
+        yield next(chunks)
+        yield next(chunks)
+        raise RuntimeError("导入中断")
+
+    with session_factory() as db:
+        try:
+            import_record_chunks(db, interrupted(), write_between_chunks)
+        except RuntimeError:
+            pass
+        else:
+            raise CheckFailed("导入没有中断")
+    with session_factory() as db:
+        saved = db.scalar(select(func.count()).select_from(Record).where(Record.batch == "检查分块提交"))
+        mismatches = check_stats(db)
+    expect(saved == 2 * chunk_rows, f"中断前提交的 {2 * chunk_rows} 行只保留了 {saved} 行")
+    expect(not mismatches, f"中断导入后日汇总表不一致: {mismatches[:3]}")
+    return f"中断前提交 {saved} 行"
+
+
+def check_bulk_stats(client: TestClient, session_factory, people) -> str:
+    """批量修改分数、学科、日期和批量删除后比较日汇总表"""
+    with session_factory() as db:
+        ids = db.execute(select(Record.id).order_by(Record.id).limit(60)).scalars().all()
+    expect(len(ids) == 60, f"记录数不足: {len(ids)}")
+
+    patches = [{"id": id, "score": 7.5} for id in ids[:20]]
+    patches += [{"id": id, "subject": "检查学科", "date": "2030-01-01", "batch": f"检查{id}"} for id in ids[20:30]]
+    patches += [{"id": id, "score": None} for id in ids[30:40]]
+    response = client.patch("/records/bulk", json={"records": patches})
+    expect_status(response, 200)
+    expect(response.json()["succeeded"] == len(patches), response.json()["message"])
+    with session_factory() as db:
+        mismatches = check_stats(db)
+    expect(not mismatches, f"批量修改后日汇总表不一致: {mismatches[:3]}")
+
+    response = client.request("DELETE", "/records/bulk", json={"ids": ids[15:45]})
+    expect_status(response, 200)
+    expect(response.json()["succeeded"] == 30, response.json()["message"])
+    response = client.request("DELETE", "/records/bulk", json={"filter": {"subject": "检查学科"}})
+    expect_status(response, 200)
+    with session_factory() as db:
+        mismatches = check_stats(db)
+    expect(not mismatches, f"批量删除后日汇总表不一致: {mismatches[:3]}")
+    return f"修改 {len(patches)} 条，删除 {30 + response.json()['succeeded']} 条"
+
+
+def check_etag_cycle(client: TestClient, session_factory, people) -> str:
+    """每个接口：取得ETag -> 带If-None-Match返回304 -> 写入一条记录 -> 同一请求返回200和新ETag"""
+    grade = client.get(f"/students/{people['students'][0]}").json()["grade"]
+    summary = {"grade": grade, "start_date": "2000-01-01", "end_date": "2099-12-31"}
+    requests: Dict[str, Callable[[Dict[str, str]], Any]] = {
+        "GET /records/": lambda headers: client.get("/records/", params=summary, headers=headers),
+        "POST /records/summary": lambda headers: client.post("/records/summary", json=summary, headers=headers),
+        "POST /records/subject-summary": lambda headers: client.post(
+            "/records/subject-summary", json={**summary, "subject": "语文"}, headers=headers),
+        "POST /records/ranking": lambda headers: client.post("/records/ranking", json=summary, headers=headers),
+        "POST /async/records/summary": lambda headers: client.post(
+            "/async/records/summary", json=summary, headers=headers),
+        "POST /async/records/ranking": lambda headers: client.post(
+            "/async/records/ranking", json=summary, headers=headers),
+    }
+    etags = {}
+    for name, call in requests.items():
+        response = call({})
+        expect_status(response, 200)
+        expect("ETag" in response.headers, f"{name} 没有返回ETag")
+        etags[name] = response.headers["ETag"]
+        response = call({"If-None-Match": etags[name]})
+        expect(response.status_code == 304, f"{name} 数据未变化时状态码为 {response.status_code}")
+
+    record = {
+        "student_id": people["students"][0], "name": "学生", "subject": "语文", "score": 9,
+        "type": "日常作业", "date": "2031-01-01", "batch": "检查ETag", "teacher_id": people["teachers"][0]
+    }
+    expect_status(client.post("/records/records", json=record), 200)
+    for name, call in requests.items():
+        response = call({"If-None-Match": etags[name]})
+        expect(response.status_code == 200, f"{name} 写入后状态码为 {response.status_code}")
+        expect(response.headers["ETag"] != etags[name], f"{name} 写入后ETag没有变化")
+    return f"{len(requests)} 个接口"
+
+
+WRITE_CHECKS: List[Tuple[str, Callable[[TestClient, Any, Dict[str, List[str]]], str]]] = [
+    ("按自然键写入", check_upsert_counts),
+    ("导入分块提交", check_import_commits),
+    ("批量修改和删除后的日汇总表", check_bulk_stats),
+    ("ETag -> 304 -> 写入 -> 200", check_etag_cycle),
+]
+
+
+def check_writes() -> int:
+    failures = 0
+    score_index.clear()
+    with temp_database() as session_factory:
+        engine = session_factory.kw["bind"]
+        run_migrations(engine)
+        people = seed_people(session_factory, student_count=60)
+
+        async_engine = create_async_db_engine(str(engine.url))
+        async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+        def override_get_db():
+            with session_factory() as db:
+                yield db
+
+        async def override_get_async_db():
+            async with async_session_factory() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        try:
+            client = TestClient(app)
+            for name, check in WRITE_CHECKS:
+                try:
+                    print(f"{name:<28} OK  {check(client, session_factory, people)}")
+                except CheckFailed as e:
+                    failures += 1
+                    print(f"{name:<28} 失败\n    {e}")
+        finally:
+            app.dependency_overrides.clear()
+            # 汇总查询会在后台构建成绩索引，删除临时数据库之前等待构建结束
+            score_index.wait()
+            score_index.clear()
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=["writes", "plans", "counts"], help="只运行指定的检查")
+    args = parser.parse_args()
+    selected = set(args.only or ["writes", "plans", "counts"])
+
+    failed = []
+    if "writes" in selected:
+        print("== 写入路径")
+        if check_writes():
+            failed.append("writes")
+    if "plans" in selected:
+        print("== SQL执行计划")
+        if check_query_plans.main():
+            failed.append("plans")
+    if "counts" in selected:
+        print("== 接口SQL语句数")
+        if check_query_counts.main([]):
+            failed.append("counts")
+    print(f"失败: {', '.join(failed)}" if failed else "全部通过")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+检查各接口执行的SQL语句数，防止新增逐条查询或延迟加载（N+1）
+
+通过TestClient调用接口，用assert_max_queries统计每个请求的语句数，超过预算或出现重复执行的
+同一条SQL时以非0状态码退出，可在CI中使用。接口有意增加查询时同步调整QUERY_BUDGETS。
+
+用法（在backend目录下执行）：
+    python -m benchmarks.check_query_counts
+    python -m benchmarks.check_query_counts -v    # 打印每个接口执行的语句
+"""
+import io
+import sys
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.database import create_async_db_engine, get_async_db, get_db
+from app.core.migrations import run_migrations
+from app.main import app
+from app.utils.query_debug import assert_max_queries
+from app.utils.score_index import score_index
+from benchmarks.bench_import import build_import_frame
+from benchmarks.check_query_plans import seed_records
+from benchmarks.common import seed_people, temp_database
+
+# 每个接口允许执行的最多语句数。写入作业记录的接口在提交前多执行一条语句，递增日汇总表的版本号（成绩索引用）
+QUERY_BUDGETS: Dict[str, int] = {
+    "GET /records/": 2,
+    "GET /records/ (cursor)": 3,
+    "GET /records/{record_id}": 1,
+    "POST /records/records": 8,
+    "PUT /records/{record_id}": 8,
+    "DELETE /records/{record_id}": 5,
+    "POST /records/summary": 2,
+    "POST /records/subject-summary": 2,
+    "POST /records/summary (page)": 3,
+    "POST /records/ranking": 2,
+    # 带If-None-Match且数据未变化时只读取版本号
+    "GET /records/ (304)": 1,
+    "POST /records/summary (304)": 1,
+    "GET /students/ (304)": 1,
+    "POST /records/import": 10,
+    "POST /records/import (csv)": 10,
+    "POST /records/bulk": 6,
+    "PATCH /records/bulk": 5,
+    "DELETE /records/bulk": 5,
+    "GET /students/": 3,
+    "GET /students/{student_id}": 1,
+    "GET /teachers/": 3,
+    "GET /async/records/": 2,
+    "POST /async/records/summary": 2,
+}
+
+
+def endpoint_calls(client: TestClient, people) -> Dict[str, Tuple[Callable[[], Any], int]]:
+    """需要检查的接口调用及期望的状态码，按顺序执行，写接口放在最后"""
+    params = {"grade": "高一", "start_date": "2024-09-01", "end_date": "2024-09-30"}
+    record = {
+        "student_id": people["students"][0], "name": "学生", "subject": "语文", "score": 8,
+        "type": "日常作业", "date": "2024-09-15", "batch": "批次20240915", "teacher_id": people["teachers"][0]
+    }
+    summary_etag = client.post("/records/summary", json=params).headers["ETag"]
+    records_etag = client.get("/records/", params=params).headers["ETag"]
+    students_etag = client.get("/students/", params={"grade": "高一"}).headers["ETag"]
+    frame = build_import_frame(200, people["students"], people["teachers"])
+    workbook = io.BytesIO()
+    frame.to_excel(workbook, index=False)
+    return {
+        "GET /records/": (lambda: client.get("/records/", params=params), 200),
+        "GET /records/ (304)": (lambda: client.get(
+            "/records/", params=params, headers={"If-None-Match": records_etag}), 304),
+        "POST /records/summary (304)": (lambda: client.post(
+            "/records/summary", json=params, headers={"If-None-Match": summary_etag}), 304),
+        "GET /students/ (304)": (lambda: client.get(
+            "/students/", params={"grade": "高一"}, headers={"If-None-Match": students_etag}), 304),
+        "GET /records/ (cursor)": (
+            lambda: client.get("/records/", params={**params, "limit": 50, "with_total": True}), 200),
+        "GET /records/{record_id}": (lambda: client.get("/records/1"), 200),
+        # 同一条记录会提交多次，按upsert模式更新已有记录
+        "POST /records/records": (lambda: client.post("/records/records", params={"mode": "upsert"}, json=record), 200),
+        "PUT /records/{record_id}": (lambda: client.put("/records/1", json={**record, "batch": "批次修改"}), 200),
+        "DELETE /records/{record_id}": (lambda: client.delete("/records/2"), 200),
+        "POST /records/summary": (lambda: client.post("/records/summary", json=params), 200),
+        "POST /records/summary (page)": (lambda: client.post("/records/summary", json=params, params={
+            "sort_by": "total_score", "order": "desc", "limit": 50, "with_total": True}), 200),
+        "POST /records/subject-summary": (lambda: client.post(
+            "/records/subject-summary", json={**params, "class_name": "高一1班", "subject": "语文"}), 200),
+        "POST /records/ranking": (lambda: client.post("/records/ranking", json={**params, "class_name": "高一1班"}), 200),
+        "POST /records/import": (lambda: client.post(
+            "/records/import", files={"file": ("records.xlsx", workbook.getvalue(), "application/octet-stream")}), 200),
+        "POST /records/import (csv)": (lambda: client.post(
+            "/records/import", files={"file": ("records.csv", frame.to_csv(index=False).encode(), "text/csv")}), 200),
+        "POST /records/bulk": (lambda: client.post("/records/bulk", json={"records": [{**record, "batch": f"批次{i}"} for i in range(100)]}), 200),
+        "PATCH /records/bulk": (lambda: client.patch(
+            "/records/bulk", json={"records": [{"id": id, "score": 5} for id in range(10, 110)]}), 200),
+        "DELETE /records/bulk": (lambda: client.request(
+            "DELETE", "/records/bulk", json={"ids": list(range(110, 210))}), 200),
+        "GET /students/": (lambda: client.get("/students/", params={"grade": "高一"}), 200),
+        "GET /students/{student_id}": (lambda: client.get(f"/students/{people['students'][0]}"), 200),
+        "GET /teachers/": (lambda: client.get("/teachers/"), 200),
+        "GET /async/records/": (lambda: client.get("/async/records/", params=params), 200),
+        "POST /async/records/summary": (lambda: client.post("/async/records/summary", json=params), 200),
+    }
+
+
+def main(argv) -> int:
+    verbose = "-v" in argv
+    failures = 0
+    with temp_database() as session_factory:
+        engine = session_factory.kw["bind"]
+        run_migrations(engine)
+        people = seed_people(session_factory, student_count=600, classes_per_grade=10)
+        seed_records(session_factory, people["students"], people["teachers"])
+
+        async_engine = create_async_db_engine(str(engine.url))
+        async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+        def override_get_db():
+            with session_factory() as db:
+                yield db
+
+        async def override_get_async_db():
+            async with async_session_factory() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        # 成绩索引在后台线程中构建，其语句会被计入同时执行的接口；这里只统计直接查询数据库的语句数
+        index_enabled, score_index.enabled = score_index.enabled, False
+        try:
+            client = TestClient(app)
+            for name, (call, expected_status) in endpoint_calls(client, people).items():
+                budget = QUERY_BUDGETS[name]
+                try:
+                    with assert_max_queries(budget, [engine, async_engine.sync_engine], allow_repeated=False) as log:
+                        response = call()
+                    if response.status_code != expected_status:
+                        raise AssertionError(f"状态码 {response.status_code}: {response.text[:200]}")
+                    print(f"{name:<32} {log.count:>3} / {budget:<3} OK")
+                except AssertionError as e:
+                    failures += 1
+                    print(f"{name:<32} 失败\n    " + str(e).replace("\n", "\n    "))
+                    continue
+                if verbose:
+                    print("    " + log.report().replace("\n", "\n    "))
+        finally:
+            app.dependency_overrides.clear()
+            score_index.enabled = index_enabled
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,125 @@
+"""
+检查汇总接口的SQL执行计划，确认没有对数据表做全表扫描
+
+直接调用接口函数并捕获其执行的SELECT语句，再对每条语句执行EXPLAIN QUERY PLAN。
+存在全表扫描时以非0状态码退出，可在CI中使用。
+
+用法（在backend目录下执行）：
+    python -m benchmarks.check_query_plans
+"""
+import random
+import re
+import sys
+from datetime import date
+
+from fastapi import Response
+from sqlalchemy import event
+
+from app.api import records
+from app.core.migrations import run_migrations
+from app.models.models import Record
+from app.schemas.schemas import RecordFilter, SummaryPage
+from app.utils.pagination import encode_cursor
+from app.utils.score_index import GradeScoreIndex, score_index
+from benchmarks.common import SUBJECTS, date_range, endpoint_request, seed_people, temp_database
+
+# "SCAN records" 是全表扫描，"SCAN records USING INDEX ..." 是索引扫描
+FULL_SCAN = re.compile(r'\bSCAN (\S+)(?!.*\bUSING (COVERING )?INDEX\b)')
+SUBQUERY = re.compile(r'(CO-ROUTINE|MATERIALIZE) (\S+)')
+# 只有几行的表，全表扫描不影响性能
+SMALL_TABLES = {"data_versions"}
+
+
+def seed_records(session_factory, student_ids, teacher_ids, days: int = 60):
+    rng = random.Random(0)
+    rows = [
+        {
+            "student_id": student_id,
+            "name": f"学生{student_id}",
+            "subject": subject,
+            "score": float(rng.randint(0, 10)),
+            "type": "日常作业",
+            "date": record_date,
+            "batch": f"批次{record_date.strftime('%Y%m%d')}",
+            "teacher_id": teacher_id
+        }
+        for student_id in student_ids
+        for subject, teacher_id in zip(SUBJECTS[:3], teacher_ids)
+        for record_date in date_range(days)
+    ]
+    with session_factory() as db:
+        db.execute(Record.__table__.insert(), rows)
+        db.commit()
+
+
+def endpoint_calls(db):
+    """需要检查的接口及其典型参数"""
+    start, end = date(2024, 9, 1), date(2024, 9, 30)
+    return {
+        "/records/summary": lambda: records.get_student_score_summary(
+            RecordFilter(grade="高一", start_date=start, end_date=end),
+            endpoint_request("POST", "/records/summary"), Response(), db, page=SummaryPage()),
+        "/records/summary (subject)": lambda: records.get_student_score_summary(
+            RecordFilter(grade="高一", subject="语文", start_date=start, end_date=end),
+            endpoint_request("POST", "/records/summary"), Response(), db, page=SummaryPage()),
+        "/records/summary (total_score)": lambda: records.get_student_score_summary(
+            RecordFilter(grade="高一", start_date=start, end_date=end),
+            endpoint_request("POST", "/records/summary"), Response(), db,
+            page=SummaryPage(sort_by="total_score", order="desc", limit=50, with_total=True)),
+        "/records/subject-summary": lambda: records.get_subject_score_summary_by_date(
+            RecordFilter(grade="高一", class_name="高一1班", subject="语文", start_date=start, end_date=end),
+            endpoint_request("POST", "/records/subject-summary"), Response(), db, page=SummaryPage()),
+        "/records/ranking": lambda: records.get_student_ranking(
+            RecordFilter(grade="高一", class_name="高一1班", start_date=start, end_date=end),
+            endpoint_request("POST", "/records/ranking"), Response(), db),
+        "成绩索引构建": lambda: GradeScoreIndex.build(db, "高一", (0, 0)),
+        "/records/grades": lambda: records.get_grades_by_date_range(start, end, db),
+        "/records/classes": lambda: records.get_classes_by_grade_and_date("高一", start, end, db),
+        "/records/ (cursor)": lambda: records.read_records(
+            endpoint_request("GET", "/records/"), Response(), "高一", None, None, None, start, end, 100, encode_cursor([date(2024, 9, 15), 0]), False, db),
+    }
+
+
+def main() -> int:
+    failures = 0
+    with temp_database() as session_factory:
+        engine = session_factory.kw["bind"]
+        run_migrations(engine)
+        people = seed_people(session_factory, student_count=600, classes_per_grade=10)
+        seed_records(session_factory, people["students"], people["teachers"])
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+        captured = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                captured.append((statement, parameters))
+
+        # 检查汇总接口自身的SQL，成绩索引的构建查询单独检查
+        score_index.enabled = False
+        with session_factory() as db:
+            for name, call in endpoint_calls(db).items():
+                captured.clear()
+                call()
+                plans = []
+                for statement, parameters in list(captured):
+                    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+                    plans.extend(row[-1] for row in rows)
+                # 子查询（CO-ROUTINE/MATERIALIZE）的结果集本来就要完整读取，不算全表扫描
+                subqueries = {match.group(2) for match in map(SUBQUERY.match, plans) if match}
+                scans = [
+                    detail for detail in plans
+                    if (match := FULL_SCAN.search(detail)) and match.group(1) not in subqueries | SMALL_TABLES
+                ]
+                status = "全表扫描" if scans else "OK"
+                print(f"{name:<28} {status}")
+                for detail in plans:
+                    print(f"    {detail}")
+                failures += bool(scans)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, List
+
+from fastapi import Request
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, create_db_engine
+from app.models.models import Student, Teacher
+
+SUBJECTS = ["语文", "数学", "英语", "物理", "化学", "生物", "政治", "历史", "地理"]
+
+
+@contextmanager
+def temp_database(performance_profile: bool = True):
+    """创建一次性的SQLite数据库，返回会话类"""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    engine = create_db_engine(f"sqlite:///{path}", performance_profile=performance_profile)
+    Base.metadata.create_all(engine)
+    try:
+        yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    finally:
+        engine.dispose()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+
+def seed_people(session_factory, student_count: int = 60, classes_per_grade: int = 2) -> Dict[str, List[str]]:
+    """写入学生和教师基础数据，返回学号和教师ID列表"""
+    grades = ["高一", "高二", "高三"]
+    groups = ["第一组", "第二组", "第三组", "第四组"]
+    students = []
+    for i in range(student_count):
+        grade = grades[i % len(grades)]
+        students.append({
+            "student_id": str(10001 + i),
+            "name": f"学生{10001 + i}",
+            "grade": grade,
+            "class_name": f"{grade}{i // len(grades) % classes_per_grade + 1}班",
+            "group": groups[i % len(groups)],
+            "subjects": ",".join(SUBJECTS[:3])
+        })
+    teachers = [
+        {"teacher_id": str(1001 + i), "name": f"{subject}教师", "subject": subject}
+        for i, subject in enumerate(SUBJECTS)
+    ]
+    with session_factory() as db:
+        db.execute(Student.__table__.insert(), students)
+        db.execute(Teacher.__table__.insert(), teachers)
+        db.commit()
+    return {
+        "students": [s["student_id"] for s in students],
+        "teachers": [t["teacher_id"] for t in teachers]
+    }
+
+
+def date_range(days: int, start: date = date(2024, 9, 1)) -> List[date]:
+    """生成连续的日期列表"""
+    return [start + timedelta(days=i) for i in range(days)]
+
+
+def random_score(rng: random.Random) -> float:
+    return float(rng.randint(0, 10))
+
+
+def endpoint_request(method: str, path: str) -> Request:
+    """直接调用接口函数时传入的请求对象，不带If-None-Match，接口总是执行查询"""
+    return Request({"type": "http", "method": method, "path": path, "query_string": b"", "headers": []})
+
+
+def timed(func, *args, **kwargs):
+    """执行函数并返回(结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
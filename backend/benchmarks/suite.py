@@ -0,0 +1,278 @@
+"""
+接口级性能测试套件
+
+在一次性的SQLite数据库上通过TestClient调用各接口，统计每项耗时并保存为JSON，
+可以与之前提交的结果比较，发现性能回退。
+
+数据规模：
+    small   60名学生 x 3个学科 x 60天（示例数据规模）
+    medium  1000名学生 x 9个学科 x 100天
+    large   10000名学生 x 9个学科 x 200天（1800万条记录，准备数据需要较长时间）
+也可以用 --students/--subjects/--days 覆盖。
+
+用法（在backend目录下执行）：
+    python -m benchmarks.suite
+    python -m benchmarks.suite --scale medium --repeat 5
+    python -m benchmarks.suite --compare benchmarks/results/small-abc1234.json
+    python -m benchmarks.suite --only summary export
+"""
+import os
+import tempfile
+
+# 接口内部（包括导出线程和导出进程）直接使用app.core.database中的引擎，必须在导入app之前指定数据库；
+# 导出进程以spawn方式启动时会重新导入本模块，环境变量已由父进程设置，不会再创建新数据库
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="homework_bench_"), "bench.db")
+
+import argparse
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+SCALES = {
+    "small": {"students": 60, "subjects": 3, "days": 60},
+    "medium": {"students": 1000, "subjects": 9, "days": 100},
+    "large": {"students": 10000, "subjects": 9, "days": 200},
+}
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# 与基准结果相比，中位数耗时超过该倍数视为性能回退
+DEFAULT_THRESHOLD = 1.2
+
+
+def seed_records(session_factory, people, subjects: List[str], days, chunk_size: int = 50000) -> int:
+    """每个学生每个学科每天一条记录，分批写入后重建日汇总表"""
+    from app.models.models import Record
+    from app.utils.aggregates import rebuild_stats
+
+    rng = random.Random(0)
+    teacher_of = dict(zip(subjects, people["teachers"]))
+
+    def rows():
+        for student_id in people["students"]:
+            for subject in subjects:
+                for day in days:
+                    yield {
+                        "student_id": student_id,
+                        "name": f"学生{student_id}",
+                        "subject": subject,
+                        "score": float(rng.randint(0, 10)),
+                        "type": "日常作业",
+                        "date": day,
+                        "batch": f"批次{day.strftime('%Y%m%d')}",
+                        "teacher_id": teacher_of[subject]
+                    }
+
+    total = 0
+    with session_factory() as db:
+        chunk = []
+        for row in rows():
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                db.execute(Record.__table__.insert(), chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            db.execute(Record.__table__.insert(), chunk)
+            total += len(chunk)
+        rebuild_stats(db)
+        db.commit()
+    return total
+
+
+def import_workbook(people, rows: int) -> bytes:
+    """生成导入接口使用的Excel文件"""
+    from benchmarks.bench_import import build_import_frame
+
+    buffer = io.BytesIO()
+    build_import_frame(rows, people["students"], people["teachers"]).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def build_cases(client, people, days, import_rows: int) -> Dict[str, Callable[[], Any]]:
+    """需要计时的接口调用，按执行顺序排列；导入会写入数据，放在最后"""
+    from app.utils.cache import lookup_cache
+    from app.utils.export_formats import EXPORT_FORMATS
+    from app.utils.grade_calculator import GradeCalculator
+
+    start, end = days[0].isoformat(), days[-1].isoformat()
+    grade_filter = {"grade": "高一", "start_date": start, "end_date": end}
+    class_filter = {**grade_filter, "class_name": "高一1班", "subject": "语文"}
+    workbook = import_workbook(people, import_rows)
+    totals = np.random.default_rng(0).uniform(
+        0, GradeCalculator.calculate_total_max_score(), len(people["students"]) * len(days))
+
+    def call(method: str, path: str, **kwargs):
+        response = client.request(method, path, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} 返回 {response.status_code}: {response.text[:200]}")
+        return response
+
+    def background_export(path: str, body: Dict[str, Any]):
+        # 使数据版本变化，避免命中已完成的相同任务
+        lookup_cache.invalidate('records')
+        job = call("POST", path, json=body).json()
+        while job["status"] in ("pending", "running"):
+            time.sleep(0.01)
+            job = call("GET", f"/exports/{job['id']}").json()
+        if job["status"] != "done":
+            raise RuntimeError(f"导出任务失败: {job['error']}")
+        return call("GET", job["download_url"])
+
+    return {
+        "read_records": lambda: call("GET", "/records/", params=grade_filter),
+        "read_records_page": lambda: call("GET", "/records/", params={**grade_filter, "limit": 100}),
+        "summary": lambda: call("POST", "/records/summary", json=grade_filter),
+        "subject_summary": lambda: call("POST", "/records/subject-summary", json=class_filter),
+        "export_template": lambda: call("POST", "/records/export-template", json={"grade": "高一"}),
+        **{
+            f"export_summary_{export_format}": partial(
+                call, "POST", "/records/export-summary", params={"format": export_format}, json=grade_filter)
+            for export_format in EXPORT_FORMATS
+        },
+        **{
+            f"export_subject_summary_{export_format}": partial(
+                call, "POST", "/records/export-subject-summary", params={"format": export_format}, json=class_filter)
+            for export_format in EXPORT_FORMATS
+        },
+        "export_job_summary": lambda: background_export("/exports/summary", grade_filter),
+        "export_job_subject_summary": lambda: background_export("/exports/subject-summary", class_filter),
+        "grade_calculator_batch": lambda: GradeCalculator.calculate_grades(totals),
+        "grade_calculator_loop": lambda: [GradeCalculator.calculate_grade(total) for total in totals.tolist()],
+        "import_records": lambda: call(
+            "POST", "/records/import",
+            files={"file": ("records.xlsx", workbook, "application/octet-stream")}),
+    }
+
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": min(durations),
+        "median_ms": statistics.median(durations),
+        "mean_ms": statistics.mean(durations),
+        "max_ms": max(durations),
+        "stdev_ms": statistics.stdev(durations) if len(durations) > 1 else 0.0,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, threshold: float) -> int:
+    """打印与基准结果的对比，返回回退的项数"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\n对比 {baseline_path}（提交 {baseline['meta'].get('commit')}，阈值 {threshold}x）")
+    regressions = 0
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"  {name:<32} 新增")
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        regressed = ratio > threshold
+        regressions += regressed
+        print(f"  {name:<32} {before['median_ms']:10.2f}ms -> {result['median_ms']:10.2f}ms  "
+              f"{ratio:6.2f}x{'  回退' if regressed else ''}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small", help="数据规模")
+    parser.add_argument("--students", type=int, help="学生人数，覆盖--scale")
+    parser.add_argument("--subjects", type=int, help="学科数，覆盖--scale")
+    parser.add_argument("--days", type=int, help="天数，覆盖--scale")
+    parser.add_argument("--import-rows", type=int, default=1000, help="导入接口每次导入的行数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项计时次数")
+    parser.add_argument("--warmup", type=int, default=1, help="计时前的预热次数")
+    parser.add_argument("--only", nargs="*", help="只运行名称包含这些关键字的项")
+    parser.add_argument("--output", help="结果JSON路径，默认写入benchmarks/results/")
+    parser.add_argument("--compare", help="用于比较的历史结果JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="判定为回退的倍数")
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    from app.core.database import SessionLocal, engine
+    from app.main import app
+    from benchmarks.common import SUBJECTS, date_range, seed_people
+
+    scale = {**SCALES[args.scale]}
+    for key in scale:
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+    subjects = SUBJECTS[:scale["subjects"]]
+    days = date_range(scale["days"])
+
+    database_dir = os.path.dirname(engine.url.database)
+    try:
+        with TestClient(app) as client:
+            start = time.perf_counter()
+            people = seed_people(SessionLocal, scale["students"], classes_per_grade=max(2, scale["students"] // 150))
+            record_count = seed_records(SessionLocal, people, subjects, days)
+            print(f"准备数据: {scale['students']} 名学生, {len(subjects)} 个学科, {len(days)} 天, "
+                  f"{record_count} 条记录, 耗时 {time.perf_counter() - start:.1f}s")
+
+            results = {}
+            for name, func in build_cases(client, people, days, args.import_rows).items():
+                if args.only and not any(keyword in name for keyword in args.only):
+                    continue
+                results[name] = measure(func, args.repeat, args.warmup)
+                print(f"  {name:<32} 中位数 {results[name]['median_ms']:10.2f}ms  "
+                      f"最小 {results[name]['min_ms']:10.2f}ms  最大 {results[name]['max_ms']:10.2f}ms")
+    finally:
+        engine.dispose()
+        if database_dir.startswith(tempfile.gettempdir()):
+            shutil.rmtree(database_dir, ignore_errors=True)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": {**scale, "name": args.scale, "records": record_count, "import_rows": args.import_rows},
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.scale}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
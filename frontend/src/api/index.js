@@ -7,4 +7,46 @@ const apiClient = axios.create({
   },
 });
 
-export default apiClient;
\ No newline at end of file
+// 列表和汇总接口返回ETag，再次请求时带上If-None-Match，数据未变化时服务端返回304，直接使用缓存的结果
+const ETAG_CACHE_SIZE = 50;
+const etagCache = new Map();
+
+const cacheKey = (config) =>
+  [config.method, apiClient.getUri(config), typeof config.data === 'string' ? config.data : JSON.stringify(config.data ?? null)].join(' ');
+
+apiClient.interceptors.request.use((config) => {
+  const cached = etagCache.get(cacheKey(config));
+  if (cached) {
+    config.headers['If-None-Match'] = cached.etag;
+    config.validateStatus = (status) => (status >= 200 && status < 300) || status === 304;
+  }
+  return config;
+});
+
+apiClient.interceptors.response.use((response) => {
+  const key = cacheKey(response.config);
+  if (response.status === 304) {
+    const cached = etagCache.get(key);
+    if (cached) {
+      response.data = cached.data;
+      response.status = 200;
+    }
+    return response;
+  }
+  const etag = response.headers.etag;
+  if (etag) {
+    // Map按插入顺序遍历，超出上限时删除最早的缓存
+    etagCache.delete(key);
+    etagCache.set(key, { etag, data: response.data });
+    if (etagCache.size > ETAG_CACHE_SIZE) {
+      etagCache.delete(etagCache.keys().next().value);
+    }
+  }
+  return response;
+});
+
+// 汇总接口layout=table时返回{ columns, rows }，还原为每行一个对象
+export const fromTable = ({ columns, rows }) =>
+  rows.map((row) => Object.fromEntries(columns.map((column, i) => [column, row[i]])));
+
+export default apiClient;